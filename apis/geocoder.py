@@ -0,0 +1,79 @@
+import contextvars
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+from apis.places_api import GooglePlacesClient
+from core.cache import PersistentTTLCache
+from core.singleflight import SingleFlight
+
+# Only ask Places for what a geocode needs, not every field.
+GEOCODE_FIELD_MASK = "places.id,places.location"
+
+GEOCODE_TTL_SECONDS = 30 * 24 * 3600
+
+_PUNCT_RE = re.compile(r"[^\w]+", flags=re.UNICODE)
+
+
+def normalize_address(address: str) -> str:
+    """Cache key for an address or place name: case, punctuation and spacing insensitive."""
+    text = unicodedata.normalize("NFKC", address).lower()
+    return " ".join(_PUNCT_RE.sub(" ", text).split())
+
+
+class Geocoder:
+    """
+    Geocodes addresses and place names through Places text search.
+
+    - Results (including "not found") are cached by normalized address in a persistent TTL cache.
+    - Concurrent lookups of the same address share one in-flight API call.
+    - geocode_many resolves a batch of addresses concurrently.
+    """
+
+    def __init__(self, places_client: GooglePlacesClient, cache: Optional[PersistentTTLCache] = None, max_workers: int = 8):
+        self.places_client = places_client
+        self.cache = cache or PersistentTTLCache("geocode", GEOCODE_TTL_SECONDS)
+        self.max_workers = max_workers
+        self._flight = SingleFlight()
+
+    def _lookup(self, address: str) -> Optional[Tuple[float, float]]:
+        results = self.places_client.text_search(address, field_mask=GEOCODE_FIELD_MASK)
+        if not results:
+            return None
+        location = results[0].get("location") or {}
+        lat, lon = location.get("latitude"), location.get("longitude")
+        if lat is None or lon is None:
+            return None
+        return (lat, lon)
+
+    def geocode(self, address: str, refresh: bool = False) -> Optional[Tuple[float, float]]:
+        """
+        (lat, lon) for an address or place name, or None if nothing matches.
+        refresh=True skips the cache lookup and fetches again.
+
+        Raises:
+            ValueError: If the address is empty.
+        """
+        key = normalize_address(address or "")
+        if not key:
+            raise ValueError("address cannot be empty")
+
+        cached = None if refresh else self.cache.get(key)
+        if cached is not None:
+            return tuple(cached) if cached else None
+        return self._flight.do(key, self._lookup_and_cache, key, address)
+
+    def _lookup_and_cache(self, key: str, address: str) -> Optional[Tuple[float, float]]:
+        coords = self._lookup(address)
+        self.cache.set(key, list(coords) if coords else [])
+        return coords
+
+    def geocode_many(self, addresses: Iterable[str]) -> List[Optional[Tuple[float, float]]]:
+        """Geocode a batch concurrently. Results are in input order, None where nothing matched."""
+        addresses = list(addresses)
+        if not addresses:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(addresses))) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, self.geocode, a) for a in addresses]
+            return [f.result() for f in futures]
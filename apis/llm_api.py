@@ -1,44 +1,246 @@
-from openai import OpenAI
+from openai import BadRequestError
 import os
+import re
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from core.tracing import current_span
+from core.deadline import request_timeout
+from core.json_stream import IncrementalJSONParser
+from apis.llm_backends import HEDGE_AFTER_S, HedgedStream, LLMBackend, backends_from_env, rank_backends
+
+# LLM_BASE_URL points the client at another OpenAI-compatible endpoint (e.g. benchmarks.mock_services)
+DEFAULT_BASE_URL = "https://integrate.api.nvidia.com/v1"
+
+DEFAULT_MODEL = "deepseek-ai/deepseek-v3.1"
+# Used when a request is short on time, see core.deadline.fit_llm_call
+FAST_MODEL = os.getenv("LLM_FAST_MODEL", "meta/llama-3.1-8b-instruct")
+DEFAULT_MAX_TOKENS = 8192
+# Reply length assumed when ranking backends by speed
+EXPECTED_REPLY_TOKENS = 500
+
+# A prompt is either plain text (sent as one user message) or chat messages, see prompter.get_messages
+Prompt = Union[str, List[Dict[str, str]]]
+
+
+def to_messages(prompt: Prompt) -> List[Dict[str, str]]:
+    return [{"role": "user", "content": prompt}] if isinstance(prompt, str) else list(prompt)
+
+
+def prompt_chars(prompt: Prompt) -> int:
+    return len(prompt) if isinstance(prompt, str) else sum(len(m.get("content") or "") for m in prompt)
+
+
+def cached_prompt_tokens(usage) -> Optional[int]:
+    """Prompt tokens served from the backend's prefix cache, when its usage reports them."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    if details is None:
+        return None
+    return details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", None)
+
+
+@dataclass(frozen=True)
+class LLMProfile:
+    """Generation settings for one kind of call. Pick one by name with LLMClient.query(profile=...)."""
+    model: str = DEFAULT_MODEL
+    thinking: bool = True
+    max_tokens: int = DEFAULT_MAX_TOKENS
+    temperature: float = 0.2
+    top_p: float = 0.7
+    stop: Optional[Tuple[str, ...]] = None
+
+
+# Reasoning only pays off for the final answer; routing and extraction are short,
+# deterministic outputs where it just adds seconds of hidden tokens
+LLM_PROFILES = {
+    # QueryAnalyzer: one task name (no "\n" stop, a reply that opens with a newline would come back empty)
+    "router": LLMProfile(thinking=False, max_tokens=16, temperature=0.0),
+    # Decomposer and follow-up parsing: one JSON object
+    "extractor": LLMProfile(thinking=False, max_tokens=2048, temperature=0.0),
+    # Final user-facing answers
+    "narrator": LLMProfile(),
+}
+DEFAULT_PROFILE = "narrator"
+
+
+def get_profile(name: str = DEFAULT_PROFILE) -> LLMProfile:
+    """
+    A named profile. LLM_<NAME>_MODEL in the environment overrides its model,
+    e.g. LLM_ROUTER_MODEL=meta/llama-3.1-8b-instruct.
+
+    Raises:
+        ValueError: If there is no profile with that name.
+    """
+    profile = LLM_PROFILES.get(name)
+    if profile is None:
+        raise ValueError(f"Unknown LLM profile '{name}'. Choose from {', '.join(LLM_PROFILES)}.")
+    model = os.getenv(f"LLM_{name.upper()}_MODEL")
+    return replace(profile, model=model) if model else profile
+
+
 def initialize_llm_client(api_key: str = None):
-    return LLMClient(api_key=os.getenv("LLM_API_KEY"))
+    return LLMClient(api_key=api_key or os.getenv("LLM_API_KEY"))
+
+# Words a 400 about structured output mentions (OpenAI, vLLM, llama.cpp and NIM error messages)
+_RESPONSE_FORMAT_ERROR_RE = re.compile(r"response_format|json_schema|guided_json|structured output|grammar", re.I)
 
-class LLMClient:
-    def __init__(self, base_url: str = "https://integrate.api.nvidia.com/v1",api_key: str = None):
-        if not api_key:
-            raise ValueError("LLM_API_KEY not found in environment. Check your .env file.")
 
+def rejects_response_format(error: BadRequestError) -> bool:
+    """True if a 400 is the backend refusing response_format / json_schema, not some other bad request."""
+    if getattr(error, "param", None) == "response_format":
+        return True
+    return bool(_RESPONSE_FORMAT_ERROR_RE.search(f"{getattr(error, 'message', '')} {getattr(error, 'body', '')}"))
+
+
+class LLMClient:
+    def __init__(self, base_url: str = None, api_key: str = None, backends: Optional[List[LLMBackend]] = None,
+                 hedge_after_s: float = HEDGE_AFTER_S):
+        """
+        Args:
+            base_url, api_key: The single backend to use when LLM_BACKENDS is not set.
+            backends: Use these instead of the environment's, see apis.llm_backends.
+            hedge_after_s: Upper bound of the wait for a first token before hedging, 0 to never hedge.
+        """
         print("[LLMClient] Initializing client.")
-        self.client = OpenAI(
-            base_url=base_url,
-            api_key=api_key
-        )
-        print("[LLMClient] Client initialized successfully.")
+        self.backends = backends or backends_from_env(base_url, api_key, DEFAULT_BASE_URL)
+        self.hedge_after_s = hedge_after_s
+        # Set to False the first time a backend rejects response_format, then plain prompting is used
+        self.structured_output = os.getenv("LLM_STRUCTURED_OUTPUT", "1") != "0"
+        print(f"[LLMClient] Client initialized successfully ({', '.join(b.name for b in self.backends)}).")
 
+    def backend_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {backend.name: backend.stats.snapshot() for backend in self.backends}
 
-    def query(self, user_input: str, model: str = "deepseek-ai/deepseek-v3.1") -> str:
+
+    def query(self, user_input: Prompt, profile: str = DEFAULT_PROFILE, json_schema: Optional[Dict[str, Any]] = None,
+              parser: Optional[IncrementalJSONParser] = None, **overrides) -> str:
+        """
+        Args:
+            user_input: Prompt text, or chat messages with the fixed instructions as the system
+                message (reused from the backend's prefix cache when it has one).
+            profile: Name of the LLMProfile to use, see LLM_PROFILES.
+            json_schema: Ask the backend for JSON matching this schema (response_format).
+            parser: Fed the streamed content; reading stops as soon as it has a complete object.
+            overrides: Profile fields to change for this call (e.g. model, max_tokens, thinking).
+        """
+        settings = replace(get_profile(profile), **overrides)
+        optional = {"stop": list(settings.stop)} if settings.stop else {}
+        if json_schema is not None and self.structured_output:
+            optional["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": json_schema.get("title", "response"), "schema": json_schema},
+            }
         # print(f"[LLMClient] Query started: '{user_input}'")
         print(f"[LLMClient] Query sent to model.")
-        completion = self.client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": user_input}],
-            temperature=0.2,
-            top_p=0.7,
-            max_tokens=8192,
-            extra_body={"chat_template_kwargs": {"thinking": True}},
-            stream=True
-        )
+        started = time.perf_counter()
+        try:
+            completion = self._stream(settings, to_messages(user_input), optional)
+        except BadRequestError as e:
+            if "response_format" not in optional or not rejects_response_format(e):
+                raise
+            print("[LLMClient] Backend rejected response_format, falling back to prompt-only JSON.")
+            self.structured_output = False
+            optional.pop("response_format")
+            completion = self._stream(settings, to_messages(user_input), optional)
 
         response_text = ""
         reasoning_text = ""
+        first_token_at = None
+        content_chunks = reasoning_chunks = 0
+        usage = None
+        stopped_early = False
 
         print("[LLMClient] Receiving streamed response.")
-        for chunk in completion:
-            reasoning = getattr(chunk.choices[0].delta, "reasoning_content", None)
-            if reasoning:
-                reasoning_text += reasoning
-            if chunk.choices[0].delta.content is not None:
-                response_text += chunk.choices[0].delta.content
+        stream = iter(completion)
+        try:
+            for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                reasoning = getattr(chunk.choices[0].delta, "reasoning_content", None)
+                if reasoning:
+                    reasoning_text += reasoning
+                    reasoning_chunks += 1
+                content = chunk.choices[0].delta.content
+                if content is not None:
+                    response_text += content
+                    content_chunks += 1
+                if first_token_at is None and (reasoning or content):
+                    first_token_at = time.perf_counter()
+                if parser is not None and content and parser.feed(content):
+                    # The object is complete: whatever follows is prose we would throw away
+                    stopped_early = True
+                    break
+        finally:
+            # Closes the backend's stream if we stopped early or failed
+            stream.close()
+
+        # Token counts: from usage when the backend sends it, else one streamed chunk ~ one token
+        completion_tokens = getattr(usage, "completion_tokens", None) or content_chunks + reasoning_chunks
+        if first_token_at is not None and completion.ttft_s is not None:
+            generation_s = time.perf_counter() - first_token_at
+            completion.backend.stats.record(
+                completion.ttft_s,
+                completion_tokens / generation_s if generation_s > 0 and not stopped_early else None,
+                hedge_win=completion.hedged,
+            )
+        span = current_span()
+        span.set_attributes(
+            profile=profile,
+            backend=completion.backend.name,
+            hedged=completion.hedged or None,
+            model=completion.backend.model or settings.model,
+            thinking=settings.thinking,
+            max_tokens=settings.max_tokens,
+            structured="response_format" in optional or None,
+            stopped_early=stopped_early or None,
+            ttft_ms=round(1000 * (first_token_at - started), 1) if first_token_at else None,
+            total_ms=round(1000 * (time.perf_counter() - started), 1),
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            cached_tokens=cached_prompt_tokens(usage),
+            completion_tokens=completion_tokens,
+            reasoning_chunks=reasoning_chunks,
+        )
 
         print("[LLMClient] Query completed.")
         return response_text.strip()
+
+    def _stream(self, settings: LLMProfile, messages: List[Dict[str, str]], optional: Dict[str, Any]) -> HedgedStream:
+        """Start the call on the fastest backend, hedging to the next one if it is slow to answer."""
+        def open_stream(backend: LLMBackend):
+            return backend.create(
+                settings.model,
+                messages=messages,
+                temperature=settings.temperature,
+                top_p=settings.top_p,
+                max_tokens=settings.max_tokens,
+                extra_body={"chat_template_kwargs": {"thinking": settings.thinking}},
+                stream=True,
+                # Token counts (and cached prompt tokens) arrive in a last chunk
+                stream_options={"include_usage": True},
+                # Never wait on the backend past the request's deadline
+                timeout=request_timeout(),
+                **optional,
+            )
+        ranked = rank_backends(self.backends, min(settings.max_tokens, EXPECTED_REPLY_TOKENS))
+        return HedgedStream(ranked, open_stream, self.hedge_after_s)
+
+    def query_json(self, user_input: Prompt, json_schema: Dict[str, Any], profile: str = "extractor",
+                   on_member: Optional[Callable[[Dict[str, Any]], None]] = None, **overrides) -> Tuple[Any, str]:
+        """
+        Structured output: the first JSON object of the reply, read only up to its closing brace.
+        on_member gets the object so far each time a top-level member has streamed in.
+
+        Returns:
+            (parsed object, raw reply text)
+
+        Raises:
+            ValueError: If the reply contains no complete JSON object.
+        """
+        parser = IncrementalJSONParser(on_member)
+        text = self.query(user_input, profile, json_schema=json_schema, parser=parser, **overrides)
+        if not parser.done:
+            raise ValueError(f"Cannot parse JSON from LLM response: {text[:500]}")
+        return parser.value, text
@@ -0,0 +1,336 @@
+"""
+OpenAI-compatible LLM backends with latency-based routing and hedged requests.
+
+LLMClient can talk to several endpoints serving the same kind of model (the hosted
+NVIDIA API, a second provider, a local llama.cpp / vLLM server, or
+benchmarks.mock_services in tests). For every call:
+
+    - Backends are ranked by expected latency for the call (rolling median TTFT plus
+      the tokens it may generate at the rolling median throughput). Backends with
+      too few samples go first, so new ones get measured.
+    - The call starts on the best one. If no token has arrived after the hedge delay
+      (that backend's p90 TTFT, at most LLM_HEDGE_AFTER_S), the next backend is tried
+      too, and whichever streams first wins; the other stream is closed.
+    - A backend that errors is failed over to the next. After MAX_CONSECUTIVE_ERRORS it
+      is skipped for COOLDOWN_S seconds.
+
+Configured by environment:
+
+    LLM_BACKENDS=nvidia=https://integrate.api.nvidia.com/v1,local=http://127.0.0.1:8080/v1
+    LLM_BACKEND_<NAME>_API_KEY   falls back to LLM_API_KEY ("EMPTY" for keyless local servers)
+    LLM_BACKEND_<NAME>_MODEL     serve every profile with this model (a local server has one)
+    LLM_HEDGE_AFTER_S            upper bound of the hedge delay, 0 turns hedging off
+
+Without LLM_BACKENDS there is one backend, LLM_BASE_URL with LLM_API_KEY, as before.
+"""
+import contextvars
+import os
+import queue
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from openai import OpenAI, BadRequestError
+
+from core.rate_limit import get_limiter
+
+DEFAULT_BACKEND = "default"
+LOCAL_API_KEY = "EMPTY"     # what keyless OpenAI-compatible servers (vLLM, llama.cpp) expect
+
+STATS_WINDOW = 50           # calls kept per backend for the rolling stats
+MIN_SAMPLES = 5             # fewer than this and a backend is still being measured
+HEDGE_AFTER_S = float(os.getenv("LLM_HEDGE_AFTER_S", "3.0"))
+HEDGE_MIN_S = 0.3
+MAX_CONSECUTIVE_ERRORS = 3
+COOLDOWN_S = 30.0
+
+_END = object()
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class BackendStats:
+    """Rolling TTFT / throughput and health of one backend. Thread-safe."""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self.ttft_s: deque = deque(maxlen=window)
+        self.tokens_per_s: deque = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.hedges_won = 0
+        self.consecutive_errors = 0
+        self.down_until = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, ttft_s: float, tokens_per_s: Optional[float] = None, hedge_win: bool = False):
+        with self._lock:
+            self.requests += 1
+            self.consecutive_errors = 0
+            self.ttft_s.append(ttft_s)
+            if tokens_per_s:
+                self.tokens_per_s.append(tokens_per_s)
+            if hedge_win:
+                self.hedges_won += 1
+
+    def record_slow(self, waited_s: float):
+        """
+        A hedged call this backend lost before its first token: its TTFT was at least waited_s.
+        That is a lower bound, not a sample, so it only counts when it is already above the
+        backend's p90 (a real "slow" signal); a shorter wait would drag its median down.
+        """
+        with self._lock:
+            if len(self.ttft_s) >= MIN_SAMPLES and waited_s > _percentile(list(self.ttft_s), 0.9):
+                self.ttft_s.append(waited_s)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+            self.consecutive_errors += 1
+            if self.consecutive_errors >= MAX_CONSECUTIVE_ERRORS:
+                self.down_until = time.monotonic() + COOLDOWN_S
+
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def expected_s(self, tokens: int) -> Optional[float]:
+        """Expected seconds for a reply of `tokens` tokens, None while still being measured."""
+        with self._lock:
+            if len(self.ttft_s) < MIN_SAMPLES:
+                return None
+            ttft = statistics.median(self.ttft_s)
+            rate = statistics.median(self.tokens_per_s) if self.tokens_per_s else None
+        return ttft + (tokens / rate if rate else 0.0)
+
+    def hedge_delay(self, upper_s: float) -> float:
+        with self._lock:
+            if len(self.ttft_s) < MIN_SAMPLES:
+                return upper_s
+            return min(upper_s, max(HEDGE_MIN_S, _percentile(list(self.ttft_s), 0.9)))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            ttft = list(self.ttft_s)
+            rate = list(self.tokens_per_s)
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "hedges_won": self.hedges_won,
+                "healthy": time.monotonic() >= self.down_until,
+                "ttft_p50_ms": round(1000 * statistics.median(ttft), 1) if ttft else None,
+                "ttft_p90_ms": round(1000 * _percentile(ttft, 0.9), 1) if ttft else None,
+                "tokens_per_s": round(statistics.median(rate), 1) if rate else None,
+            }
+
+
+class LLMBackend:
+    """One OpenAI-compatible endpoint, with its own rate limiter and stats."""
+
+    def __init__(self, name: str, base_url: str, api_key: Optional[str] = None, model: Optional[str] = None):
+        self.name = name
+        self.base_url = base_url
+        # A local server usually serves one model whatever the profile asks for
+        self.model = model
+        # Retries (429 with Retry-After, connection errors and 5xx with backoff) are done by the shared rate limiter
+        self.client = OpenAI(base_url=base_url, api_key=api_key or LOCAL_API_KEY, max_retries=0)
+        self.limiter = get_limiter("llm" if name == DEFAULT_BACKEND else f"llm_{name}")
+        self.stats = BackendStats()
+
+    def create(self, model: str, **params):
+        """Open a streamed chat completion, through this backend's rate limiter."""
+        return self.limiter.call(self.client.chat.completions.create, model=self.model or model, **params)
+
+
+def backends_from_env(base_url: Optional[str] = None, api_key: Optional[str] = None,
+                      default_base_url: Optional[str] = None) -> List[LLMBackend]:
+    """
+    Backends named in LLM_BACKENDS, or the single default one.
+
+    Raises:
+        ValueError: If no API key is configured for the default backend.
+    """
+    api_key = api_key or os.getenv("LLM_API_KEY")
+    spec = os.getenv("LLM_BACKENDS", "").strip()
+    if not spec:
+        if not api_key:
+            raise ValueError("LLM_API_KEY not found in environment. Check your .env file.")
+        return [LLMBackend(DEFAULT_BACKEND, base_url or os.getenv("LLM_BASE_URL", default_base_url), api_key)]
+
+    backends = []
+    for item in spec.split(","):
+        name, _, url = item.strip().partition("=")
+        if not url:
+            raise ValueError(f"LLM_BACKENDS entry '{item}' is not name=url")
+        prefix = f"LLM_BACKEND_{name.upper()}"
+        backends.append(LLMBackend(
+            name, url, os.getenv(f"{prefix}_API_KEY") or api_key, os.getenv(f"{prefix}_MODEL")
+        ))
+    return backends
+
+
+def _has_token(chunk) -> bool:
+    if not chunk.choices:
+        return False
+    delta = chunk.choices[0].delta
+    return bool(delta.content or getattr(delta, "reasoning_content", None))
+
+
+class _Attempt:
+    """One backend's stream, read on its own thread into the shared event queue."""
+
+    def __init__(self, backend: LLMBackend, open_stream: Callable, events: queue.Queue):
+        self.backend = backend
+        self.stream = None
+        self.cancelled = False
+        self.finished = False
+        self.started = time.perf_counter()
+        self._events = events
+        # copy_context carries the trace span, deadline and priority onto the thread
+        self._thread = threading.Thread(target=contextvars.copy_context().run, args=(self._run, open_stream),
+                                        name=f"llm-{backend.name}", daemon=True)
+        self._thread.start()
+
+    def _run(self, open_stream: Callable):
+        try:
+            self.stream = open_stream(self.backend)
+            for chunk in self.stream:
+                if self.cancelled:
+                    break
+                self._events.put((self, chunk))
+            self._events.put((self, _END))
+        except Exception as e:
+            self._events.put((self, e))
+        finally:
+            if self.cancelled:
+                self._close()
+
+    def _close(self):
+        try:
+            if self.stream is not None:
+                self.stream.close()
+        except Exception:
+            pass
+
+    def cancel(self):
+        self.cancelled = True
+        self._close()
+
+
+class HedgedStream:
+    """
+    Chunks of one chat completion, from whichever backend streams first.
+
+    After iteration (or close()), .backend is the winner, .ttft_s its time to first
+    token and .hedged whether a second backend was tried.
+    """
+
+    def __init__(self, backends: List[LLMBackend], open_stream: Callable, hedge_after_s: float):
+        self._pending = list(backends)
+        self._open_stream = open_stream
+        self._hedge_after_s = hedge_after_s
+        self._events: queue.Queue = queue.Queue()
+        self._attempts: List[_Attempt] = []
+        self.backend: Optional[LLMBackend] = None
+        self.ttft_s: Optional[float] = None
+        self.hedged = False
+        self._winner: Optional[_Attempt] = None
+        self._buffered: List[Any] = []
+        self._race()
+
+    def _start_next(self) -> float:
+        """Start the next backend. Returns when to hedge to the one after it (monotonic)."""
+        backend = self._pending.pop(0)
+        self._attempts.append(_Attempt(backend, self._open_stream, self._events))
+        if self._hedge_after_s <= 0 or not self._pending:
+            return float("inf")
+        return time.monotonic() + backend.stats.hedge_delay(self._hedge_after_s)
+
+    def _race(self):
+        """Block until some backend produced its first token (or finished), failing over on errors."""
+        buffered: Dict[_Attempt, List[Any]] = {}
+        last_error: Optional[Exception] = None
+        hedge_at = self._start_next()
+        while self._winner is None:
+            if not any(not a.finished for a in self._attempts):
+                if not self._pending:
+                    raise last_error
+                hedge_at = self._start_next()
+                continue
+            try:
+                wait = None if hedge_at == float("inf") else max(0.0, hedge_at - time.monotonic())
+                attempt, item = self._events.get(timeout=wait)
+            except queue.Empty:
+                self.hedged = True
+                print(f"[LLMClient] No token from '{self._attempts[-1].backend.name}' yet, hedging to "
+                      f"'{self._pending[0].name}'.")
+                hedge_at = self._start_next()
+                continue
+            if attempt.cancelled:
+                continue
+            if isinstance(item, BadRequestError):
+                # The request itself is wrong, another backend would reject it too
+                self._cancel_all()
+                raise item
+            if isinstance(item, Exception):
+                attempt.finished = True
+                attempt.backend.stats.record_error()
+                last_error = item
+                print(f"[LLMClient] Backend '{attempt.backend.name}' failed: {item!r}")
+                continue
+            if item is _END:
+                attempt.finished = True
+                self._winner = attempt
+            else:
+                buffered.setdefault(attempt, []).append(item)
+                if _has_token(item):
+                    self._winner = attempt
+                    self.ttft_s = time.perf_counter() - attempt.started
+
+        self.backend = self._winner.backend
+        self._buffered = buffered.get(self._winner, [])
+        now = time.perf_counter()
+        for attempt in self._attempts:
+            if attempt is not self._winner and not attempt.finished:
+                attempt.cancel()
+                attempt.backend.stats.record_slow(now - attempt.started)
+
+    def _cancel_all(self):
+        for attempt in self._attempts:
+            attempt.cancel()
+
+    def __iter__(self) -> Iterator[Any]:
+        winner = self._winner
+        try:
+            yield from self._buffered
+            while not winner.finished:
+                attempt, item = self._events.get()
+                if attempt is not winner:
+                    continue
+                if item is _END:
+                    winner.finished = True
+                elif isinstance(item, Exception):
+                    winner.finished = True
+                    winner.backend.stats.record_error()
+                    raise item
+                else:
+                    yield item
+        finally:
+            if not winner.finished:
+                winner.cancel()
+
+    def close(self):
+        if self._winner is not None and not self._winner.finished:
+            self._winner.cancel()
+
+
+def rank_backends(backends: List[LLMBackend], expected_tokens: int) -> List[LLMBackend]:
+    """Healthy backends fastest first (unmeasured ones before all), then the ones cooling down."""
+    def key(item: Tuple[int, LLMBackend]):
+        index, backend = item
+        expected = backend.stats.expected_s(expected_tokens)
+        return (not backend.stats.healthy(), expected is not None, expected or 0.0, index)
+    return [backend for _, backend in sorted(enumerate(backends), key=key)]
@@ -1,16 +1,21 @@
+import os
 import requests
 import logging
 
+from core.rate_limit import get_limiter
+from core.deadline import request_timeout
+
 class OSMOverpassClient:
     """
     Client class to interact with OpenStreetMap data using the Overpass API.
     """
 
-    def __init__(self, base_url: str = "https://overpass-api.de/api/interpreter"):
+    def __init__(self, base_url: str = None):
         """
-        Initialize the OSMOverpassClient with a base Overpass API endpoint.
+        Initialize the OSMOverpassClient with a base Overpass API endpoint (OVERPASS_URL, else the public one).
         """
-        self.base_url = base_url
+        self.base_url = base_url or os.getenv("OVERPASS_URL", "https://overpass-api.de/api/interpreter")
+        self.limiter = get_limiter("overpass")
         logging.info(f"[OSMOverpassClient] Initialized with base URL: {self.base_url}")
 
     def query(self, overpass_query: str) -> dict:
@@ -18,7 +23,10 @@ class OSMOverpassClient:
         Executes an Overpass QL query and returns the JSON result.
         """
         logging.info("[OSMOverpassClient] Executing query...")
-        response = requests.post(self.base_url, data={"data": overpass_query})
+        return self.limiter.call(self._post, overpass_query)
+
+    def _post(self, overpass_query: str) -> dict:
+        response = requests.post(self.base_url, data={"data": overpass_query}, timeout=request_timeout())
 
         if response.status_code == 200:
             logging.info("[OSMOverpassClient] Query successful.")
@@ -1,6 +1,15 @@
+import os
 import requests
+from requests.adapters import HTTPAdapter
 from typing import List, Optional
 
+from core.singleflight import SingleFlight
+from core.rate_limit import get_limiter
+from core.deadline import request_timeout
+
+# Keep-alive connections shared by all threads using one client
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+
 
 class GooglePlacesClient:
     """
@@ -10,16 +19,30 @@ class GooglePlacesClient:
 
     def __init__(self,api_key: str = None):
         self.api_key = api_key
-        self.base_url = "https://places.googleapis.com/v1"
+        self.base_url = os.getenv("PLACES_BASE_URL", "https://places.googleapis.com/v1")
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=HTTP_POOL_SIZE))
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=HTTP_POOL_SIZE))
+        self._flight = SingleFlight()
+        self.limiter = get_limiter("places")
 
-    def _headers(self) -> dict:
-        """Return headers required by Google Places API."""
+    def _headers(self, field_mask: str = "*") -> dict:
+        """Return headers required by Google Places API. Default field mask requests all available fields."""
         return {
             "Content-Type": "application/json",
             "X-Goog-Api-Key": self.api_key,
-            "X-Goog-FieldMask": "*",  # request all available fields
+            "X-Goog-FieldMask": field_mask,
         }
 
+    def _send(self, method: str, url: str, field_mask: str = "*", payload: Optional[dict] = None) -> dict:
+        """One rate-limited API request, retried on 429. Returns the JSON body."""
+        def send():
+            response = self.session.request(method, url, headers=self._headers(field_mask), json=payload,
+                                            timeout=request_timeout())
+            response.raise_for_status()
+            return response.json()
+        return self.limiter.call(send)
+
     def search_nearby(self, lat: float, lon: float, radius: int, place_type: Optional[str] = None) -> List[dict]:
         """
         Search nearby places by coordinates and radius.
@@ -38,20 +61,21 @@ class GooglePlacesClient:
         if place_type:
             payload["includedTypes"] = [place_type]
 
-        response = requests.post(url, headers=self._headers(), json=payload)
-        response.raise_for_status()
-        return response.json().get("places", [])
+        return self._send("POST", url, payload=payload).get("places", [])
 
-    def text_search(self, query: str) -> List[dict]:
+    def text_search(self, query: str, field_mask: str = "*") -> List[dict]:
         """
         Search for places by text query (e.g., 'best pizza in New York').
+        Pass a narrower field_mask (e.g. "places.id,places.location") to fetch less.
+        Concurrent identical searches share one request; treat the result as read-only.
         """
+        return self._flight.do((query, field_mask), self._text_search, query, field_mask)
+
+    def _text_search(self, query: str, field_mask: str) -> List[dict]:
         url = f"{self.base_url}/places:searchText"
         payload = {"textQuery": query}
 
-        response = requests.post(url, headers=self._headers(), json=payload)
-        response.raise_for_status()
-        return response.json().get("places", [])
+        return self._send("POST", url, field_mask, payload).get("places", [])
 
     def get_place_details(self, place_id: str) -> dict:
         """
@@ -59,7 +83,5 @@ class GooglePlacesClient:
         """
         # url = f"{self.base_url}/places/{place_id}"
         url = f"{self.base_url}/places/ChIJ49OFXeTjDDkRjpYCSUGTE2k"
-        response = requests.get(url, headers=self._headers())
-        response.raise_for_status()
-        return response.json()
+        return self._send("GET", url)
 
@@ -1,5 +1,87 @@
+import os
 import requests
 import json
+from requests.adapters import HTTPAdapter
+from typing import List, Optional
+
+import numpy as np
+
+from apis.places_api import HTTP_POOL_SIZE
+from core.singleflight import SingleFlight
+from core.rate_limit import get_limiter
+from core.deadline import request_timeout
+from core.polyline import decode_polyline, encode_polyline, simplify_polyline, parse_duration
+
+
+class RouteLeg:
+    """Duration and distance of one leg between consecutive waypoints."""
+    __slots__ = ("duration_s", "distance_m")
+
+    def __init__(self, duration_s: int, distance_m: int):
+        self.duration_s = duration_s
+        self.distance_m = distance_m
+
+    def __repr__(self) -> str:
+        return f"RouteLeg(duration_s={self.duration_s}, distance_m={self.distance_m})"
+
+
+class ParsedRoute:
+    """
+    Compact representation of one route from the Routes API.
+
+    Keeps totals, per-leg summaries and the geometry as an (N, 2) lat/lon array
+    instead of the raw leg/step JSON.
+    """
+    __slots__ = ("duration_s", "distance_m", "legs", "coords")
+
+    def __init__(self, duration_s: int, distance_m: int, legs: List[RouteLeg], coords: np.ndarray):
+        self.duration_s = duration_s
+        self.distance_m = distance_m
+        self.legs = legs
+        self.coords = coords
+
+    @classmethod
+    def from_response(cls, response: dict, tolerance_m: Optional[float] = None) -> Optional["ParsedRoute"]:
+        """
+        Build from a computeRoutes response, using its first route.
+
+        Args:
+            response: JSON dict returned by GoogleRoutesClient.get_route.
+            tolerance_m: If set, simplify the geometry to this tolerance in metres.
+
+        Returns:
+            ParsedRoute, or None if the response has no routes.
+        """
+        routes = response.get("routes") or []
+        if not routes:
+            return None
+        route = routes[0]
+        coords = decode_polyline(route.get("polyline", {}).get("encodedPolyline", ""))
+        if tolerance_m:
+            coords = simplify_polyline(coords, tolerance_m)
+        legs = [
+            RouteLeg(parse_duration(leg.get("duration")), int(leg.get("distanceMeters", 0)))
+            for leg in route.get("legs", [])
+        ]
+        return cls(parse_duration(route.get("duration")), int(route.get("distanceMeters", 0)), legs, coords)
+
+    def to_dict(self) -> dict:
+        """Small JSON-serializable form, geometry re-encoded as a polyline string."""
+        return {
+            "duration_s": self.duration_s,
+            "distance_m": self.distance_m,
+            "legs": [[leg.duration_s, leg.distance_m] for leg in self.legs],
+            "polyline": encode_polyline(self.coords),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ParsedRoute":
+        legs = [RouteLeg(duration_s, distance_m) for duration_s, distance_m in data.get("legs", [])]
+        return cls(data["duration_s"], data["distance_m"], legs, decode_polyline(data.get("polyline", "")))
+
+    def __repr__(self) -> str:
+        return (f"ParsedRoute(duration_s={self.duration_s}, distance_m={self.distance_m}, "
+                f"legs={len(self.legs)}, points={len(self.coords)})")
 
 
 class GoogleRoutesClient:
@@ -16,7 +98,12 @@ class GoogleRoutesClient:
         if not self.api_key:
             raise ValueError("MAPS_API_KEY not found in environment. Check your .env file.")
         
-        self.base_url = "https://routes.googleapis.com/directions/v2:computeRoutes"
+        self.base_url = os.getenv("ROUTES_BASE_URL", "https://routes.googleapis.com") + "/directions/v2:computeRoutes"
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=HTTP_POOL_SIZE))
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=HTTP_POOL_SIZE))
+        self._flight = SingleFlight()
+        self.limiter = get_limiter("routes")
 
     def get_route(self, origin: dict, destination: dict, travel_mode: str = "DRIVE", intermediates: list = None) -> dict:
         """
@@ -46,8 +133,25 @@ class GoogleRoutesClient:
         if intermediates:
             payload["intermediates"] = intermediates
 
-        response = requests.post(self.base_url, headers=headers, data=json.dumps(payload))
+        # Concurrent identical route requests share one API call
+        body = json.dumps(payload, sort_keys=True)
+        return self._flight.do(body, self.limiter.call, self._post, headers, body)
+
+    def _post(self, headers: dict, body: str) -> dict:
+        response = self.session.post(self.base_url, headers=headers, data=body, timeout=request_timeout())
         if response.status_code != 200:
-            raise Exception(f"Routes API Error: {response.status_code}, {response.text}")
+            # HTTPError carries the response, so the rate limiter can honour Retry-After on 429
+            raise requests.HTTPError(f"Routes API Error: {response.status_code}, {response.text}", response=response)
 
         return response.json()
+
+    def get_parsed_route(self, origin: dict, destination: dict, travel_mode: str = "DRIVE",
+                         intermediates: list = None, tolerance_m: Optional[float] = None) -> Optional[ParsedRoute]:
+        """
+        Same as get_route, but returns a compact ParsedRoute instead of the raw JSON.
+
+        Args:
+            tolerance_m: Optional Douglas-Peucker tolerance in metres for the route geometry.
+        """
+        response = self.get_route(origin, destination, travel_mode=travel_mode, intermediates=intermediates)
+        return ParsedRoute.from_response(response, tolerance_m=tolerance_m)
@@ -1,6 +1,8 @@
 import streamlit as st
 import time
+import uuid
 from main import main
+from core.tracing import span
 
 def display_markdown(md_content: str):
     """
@@ -18,14 +20,18 @@ def run_app():
     st.set_page_config(page_title="Map Mentor", page_icon="🗺️", layout="wide")
     st.title("🗺️ Map Mentor - LLM Output Viewer")
 
+    # One session per browser tab, so follow-ups refine the previous answer
+    session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+
     # Input field
     query = st.text_area("Enter your query:", height=100)
 
     # Button to submit
     if st.button("Submit Query") and query.strip():
-        with st.spinner("Processing your query..."):
-            response_md = main(query)
-            display_markdown(response_md)
+        with span("request", source="streamlit"), st.spinner("Processing your query..."):
+            response_md = main(query, session_id=session_id)
+            with span("render", chars=len(response_md or "")):
+                display_markdown(response_md)
 
 
 # --------------------------
@@ -0,0 +1,244 @@
+"""
+Offline batch routing and decomposition of historical queries.
+
+Runs QueryAnalyzer.select_task and, for tasks with a context model, Decomposer.run over
+every query in a JSONL (or plain text, one query per line) file, with bounded concurrency.
+Each result is appended to the output JSONL as soon as it is done:
+
+    {"id", "query", "task", "context", "elapsed_s", "error"}
+
+The output file doubles as the checkpoint: on restart, ids that already have a
+successful record are skipped, so an interrupted run resumes where it stopped. Failed
+ids are tried again (their new record is appended, the last record per id wins).
+
+    python batch_extract.py queries.jsonl --out extracted.jsonl
+    python batch_extract.py requests.jsonl --field body --id-field request_id --concurrency 16
+
+Calls go through the shared LLM rate limiter at BACKGROUND priority, so with
+RATE_LIMIT_LLM set throughput is bounded by it (and by LLM_BACKENDS, see
+apis.llm_backends), not by --concurrency alone.
+"""
+import argparse
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from query_manager import QueryAnalyzer
+from decomp import CONTEXT_MAPPING, Decomposer
+from steps import get_llm_client
+from core.rate_limit import BACKGROUND, priority
+from core.tracing import configure_from_env, span
+
+DEFAULT_CONCURRENCY = 8
+REPORT_EVERY_S = 30
+QUERY_FIELDS = ("query", "body", "text")
+ID_FIELDS = ("id", "request_id")
+
+
+def iter_queries(path: str, field: Optional[str] = None, id_field: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+    """
+    (id, query) pairs from a JSONL file, or from a text file with one query per line.
+    Without field / id_field the first of QUERY_FIELDS / ID_FIELDS present is used, and
+    the line number stands in for a missing id.
+    """
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith("{"):
+                yield str(number), line
+                continue
+            record = json.loads(line)
+            query = record.get(field) if field else next((record[k] for k in QUERY_FIELDS if k in record), None)
+            item_id = record.get(id_field) if id_field else next((record[k] for k in ID_FIELDS if k in record), None)
+            if query:
+                yield str(item_id if item_id is not None else number), query
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """Ids with a successful record in an earlier run's output."""
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue    # a line cut short when the last run was killed
+            if record.get("error") is None:
+                done.add(record["id"])
+            else:
+                done.discard(record["id"])
+    return done
+
+
+def extract_one(item_id: str, query: str) -> Dict[str, Any]:
+    """Route and decompose one query. Never raises: failures are returned in "error"."""
+    started = time.perf_counter()
+    record: Dict[str, Any] = {"id": item_id, "query": query, "task": None, "context": None, "error": None}
+    with span("batch.item", item_id=item_id) as item_span:
+        try:
+            record["task"] = QueryAnalyzer().select_task(query)
+            if record["task"] in CONTEXT_MAPPING:
+                context = Decomposer(query=query, task=record["task"]).run()
+                record["context"] = context.model_dump(mode="json", exclude={"poi_candidates"})
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            item_span.set_attribute("error", record["error"])
+    record["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+class BatchStats:
+    def __init__(self, skipped: int = 0):
+        self.started = time.perf_counter()
+        self.skipped = skipped
+        self.done = 0
+        self.failed = 0
+        self.errors: Counter = Counter()
+        self.tasks: Counter = Counter()
+        self.latencies: list = []
+        self._lock = threading.Lock()
+
+    def skip(self):
+        with self._lock:
+            self.skipped += 1
+
+    def add(self, record: Dict[str, Any]):
+        with self._lock:
+            self.done += 1
+            self.latencies.append(record["elapsed_s"])
+            if record["error"]:
+                self.failed += 1
+                self.errors[record["error"].split(":", 1)[0]] += 1
+            else:
+                self.tasks[record["task"]] += 1
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            latencies = sorted(self.latencies)
+
+            def pct(q):
+                return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else None
+
+            return {
+                "processed": self.done,
+                "skipped_from_checkpoint": self.skipped,
+                "failed": self.failed,
+                "failure_rate": round(self.failed / self.done, 4) if self.done else 0.0,
+                "per_minute": round(60 * self.done / elapsed, 1) if elapsed > 0 else 0.0,
+                "p50_s": pct(0.5),
+                "p95_s": pct(0.95),
+                "elapsed_s": round(elapsed, 1),
+                "tasks": dict(self.tasks),
+                "errors": dict(self.errors),
+            }
+
+
+def print_report(report: Dict[str, Any], final: bool = False):
+    def seconds(value):
+        return "-" if value is None else f"{value}s"
+
+    print(f"[Batch] {'Done' if final else 'Progress'}: {report['processed']} processed "
+          f"({report['skipped_from_checkpoint']} skipped from checkpoint), {report['failed']} failed "
+          f"({report['failure_rate']:.1%}), {report['per_minute']}/min, "
+          f"p50 {seconds(report['p50_s'])}, p95 {seconds(report['p95_s'])}")
+    if final:
+        print(f"[Batch] Tasks: {report['tasks']}")
+        if report["errors"]:
+            print(f"[Batch] Errors: {report['errors']}")
+
+
+def run_batch(items: Iterable[Tuple[str, str]], out_path: str, concurrency: int = DEFAULT_CONCURRENCY,
+              limit: Optional[int] = None, report_every_s: float = REPORT_EVERY_S) -> Dict[str, Any]:
+    """
+    Extract every item not already done in out_path, appending records to it.
+    At most `concurrency` items are in flight, so the input is read lazily.
+
+    Returns:
+        The final report (see BatchStats.report).
+    """
+    done_ids = load_checkpoint(out_path)
+    # One shared client (and backend stats) before the workers start, not one per racing thread
+    get_llm_client()
+    stats = BatchStats()
+    running: Set[Future] = set()
+    submitted = 0
+    next_report = time.monotonic() + report_every_s
+
+    def todo():
+        # Only input items found in the checkpoint count as skipped, not every id it holds
+        for item_id, query in items:
+            if item_id in done_ids:
+                stats.skip()
+            else:
+                yield item_id, query
+
+    def wait_for_one():
+        """Collect at least one finished item, printing progress every report_every_s meanwhile."""
+        nonlocal running, next_report
+        while True:
+            finished, running = wait(running, timeout=max(0.0, next_report - time.monotonic()),
+                                     return_when=FIRST_COMPLETED)
+            collect(finished)
+            if time.monotonic() >= next_report:
+                print_report(stats.report())
+                next_report = time.monotonic() + report_every_s
+            if finished:
+                return
+
+    with open(out_path, "a", encoding="utf-8") as out, priority(BACKGROUND), \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as pool:
+
+        def collect(finished):
+            for future in finished:
+                record = future.result()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                stats.add(record)
+            out.flush()
+
+        for item_id, query in todo():
+            if limit is not None and submitted >= limit:
+                break
+            if len(running) >= concurrency:
+                wait_for_one()
+            # copy_context carries the BACKGROUND priority (and trace) into the worker
+            running.add(pool.submit(contextvars.copy_context().run, extract_one, item_id, query))
+            submitted += 1
+
+        while running:
+            wait_for_one()
+
+    report = stats.report()
+    print_report(report, final=True)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Route and decompose a file of queries offline.")
+    parser.add_argument("input", help="JSONL (one object per line) or text file (one query per line).")
+    parser.add_argument("--out", default="extracted.jsonl", help="Output JSONL, also the resume checkpoint.")
+    parser.add_argument("--field", help=f"JSON field with the query (default: first of {', '.join(QUERY_FIELDS)}).")
+    parser.add_argument("--id-field", help=f"JSON field with the id (default: first of {', '.join(ID_FIELDS)}).")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--limit", type=int, help="Process at most this many new queries.")
+    parser.add_argument("--report", help="Also write the final report to this JSON file.")
+    args = parser.parse_args()
+
+    configure_from_env()
+    try:
+        final = run_batch(iter_queries(args.input, args.field, args.id_field), args.out, args.concurrency, args.limit)
+    except KeyboardInterrupt:
+        print(f"\n[Batch] Interrupted. Run again with the same --out to resume.")
+        raise SystemExit(130)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(final, f, indent=2)
@@ -0,0 +1,133 @@
+"""
+Before/after microbenchmark of the task context models.
+
+Builds an ItineraryPlannerContext holding --pois POIs (the recorded Jaipur Places
+results, parsed again for every 20 so each POI has its own strings, with distinct place
+ids) two ways:
+
+    - dicts:    poi_candidates as a list of POI dicts, as before context.POIRecord
+    - records:  poi_candidates as POIRecords (what steps.search_places returns now)
+
+and reports the median cost per context of what a request does with it: building it,
+model_dump / model_dump_json, model_copy(deep=True) (follow-ups copy the context) and the
+key a memoized step is cached under (json of model_dump before, ContextModel.cache_key
+now), plus the memory the POIs take.
+
+Run from the repo root:
+    python -m benchmarks.bench_context
+    python -m benchmarks.bench_context --pois 1000 --repeat 50
+"""
+import argparse
+import hashlib
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from pydantic import Field
+
+from benchmarks.mock_services import PLACES_FIXTURE, load_fixture
+from context import ItineraryPlannerContext, POIRecord
+
+
+class DictPOIContext(ItineraryPlannerContext):
+    """The context with POI dicts, as before."""
+    poi_candidates: Optional[List[Dict[str, Any]]] = Field(default_factory=list)
+
+
+def load_places(count: int) -> List[Dict[str, Any]]:
+    """`count` Places API results, each set of 20 parsed separately as separate searches would be."""
+    with open(PLACES_FIXTURE, encoding="utf-8") as f:
+        text = f.read()
+    places: List[Dict[str, Any]] = []
+    while len(places) < count:
+        places.extend(json.loads(text))
+    for i, place in enumerate(places[:count]):
+        place["id"] = f"{place['id']}-{i}"
+    return places[:count]
+
+
+def poi_dict(place: Dict[str, Any]) -> Dict[str, Any]:
+    """The POI dict steps.extract_data_from_api_response returned before POIRecord."""
+    review = place.get("reviewSummary", {}).get("text", "No reviews available")
+    if isinstance(review, dict):
+        review = review.get("text", "No reviews available")
+    return {
+        "name": place.get("displayName", {}).get("text", "Unknown Place"),
+        "address": place.get("shortFormattedAddress", "Address not available"),
+        "place_id": place.get("id", ""),
+        "types": place.get("types", []),
+        "location": place.get("location", {"latitude": None, "longitude": None}),
+        "review": review,
+        "rating": place.get("rating", 0.0),
+        "rating_count": place.get("userRatingCount", 0),
+    }
+
+
+def median_ms(fn: Callable[[], Any], repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - started)
+    return round(statistics.median(durations) * 1000, 3)
+
+
+def allocated_kb(build: Callable[[], Any]) -> float:
+    tracemalloc.start()
+    kept = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return round(current / 1024, 1)
+
+
+def dump_key(context) -> str:
+    encoded = json.dumps(context.model_dump(), sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode()).hexdigest()
+
+
+def measure(model, pois: List[Any], fields: Dict[str, Any], key: Callable[[Any], str], repeat: int) -> Dict[str, float]:
+    context = model.model_validate(dict(fields, poi_candidates=pois))
+    return {
+        "build_ms": median_ms(lambda: model.model_validate(dict(fields, poi_candidates=pois)), repeat),
+        "dump_ms": median_ms(context.model_dump, repeat),
+        "dump_json_ms": median_ms(context.model_dump_json, repeat),
+        "deep_copy_ms": median_ms(lambda: context.model_copy(deep=True), repeat),
+        "cache_key_ms": median_ms(lambda: key(context), repeat),
+    }
+
+
+def main(args) -> int:
+    fields = load_fixture("llm_scenarios.json")["scenarios"]["ItineraryPlanner"]["decomposed"]
+    dicts = [poi_dict(p) for p in load_places(args.pois)]
+    records = [POIRecord.from_place(p) for p in load_places(args.pois)]
+
+    results = {
+        "dicts": measure(DictPOIContext, dicts, fields, dump_key, args.repeat),
+        "records": measure(ItineraryPlannerContext, records, fields, lambda c: c.cache_key(), args.repeat),
+    }
+    # What the POIs keep alive once the parsed API response is gone
+    results["dicts"]["poi_kb"] = allocated_kb(lambda: [poi_dict(p) for p in load_places(args.pois)])
+    results["records"]["poi_kb"] = allocated_kb(lambda: [POIRecord.from_place(p) for p in load_places(args.pois)])
+
+    columns = ("build_ms", "dump_ms", "dump_json_ms", "deep_copy_ms", "cache_key_ms", "poi_kb")
+    print(f"\n{args.pois} POIs per context, median of {args.repeat}")
+    print(f"{'':<9}" + "".join(f"{c:>14}" for c in columns))
+    for name, row in results.items():
+        print(f"{name:<9}" + "".join(f"{row[c]:>14}" for c in columns))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"pois": args.pois, "results": results}, f, indent=2)
+        print(f"[Bench] Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare context construction and serialization with POI dicts and POIRecords.")
+    parser.add_argument("--pois", type=int, default=300, help="POIs per context.")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--json", help="Write results to this file.")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,234 @@
+"""
+End-to-end benchmark of main.main against local stand-in services.
+
+Starts benchmarks.mock_services (recorded LLM streams, Places, Routes and Overpass
+fixtures with simulated latency), points every client at it through the *_BASE_URL
+environment variables, swaps the Postgres client for an in-memory one, then drives
+main.main for each task at several concurrency levels. Reports p50/p95/p99 latency,
+throughput, errors and peak RSS.
+
+Run from the repo root:
+    python -m benchmarks.bench_e2e
+    python -m benchmarks.bench_e2e --tasks ItineraryPlanner --concurrency 1,8,32 --latency-scale 0.5
+    python -m benchmarks.bench_e2e --json results.json
+    python -m benchmarks.bench_e2e --compare results.json   # exit 1 if p95 regressed
+
+A fresh cache directory is used per run, so the first requests pay for Places searches and
+geocoding and later ones hit the caches, as in a long-running process.
+"""
+import argparse
+import functools
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.mock_services import DEFAULT_LATENCY_MS, MockServices, load_fixture
+
+DEFAULT_CONCURRENCY = [1, 4, 8]
+DB_LATENCY_MS = 20
+P95_TOLERANCE = 0.20
+
+
+class InMemoryDB:
+    """
+    Stand-in for db.baseDB.PostgresDB with the calls the pipeline makes, each taking DB_LATENCY_MS.
+    Instances created from one `users` dict see the same data, like connections to one database.
+    """
+
+    def __init__(self, latency_ms: float = DB_LATENCY_MS, users: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.latency_s = latency_ms / 1000
+        self.users = users if users is not None else {}
+        self._lock = threading.Lock()
+
+    def _wait(self):
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+    def clear_all(self):
+        self._wait()
+        with self._lock:
+            self.users.clear()
+
+    def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        self._wait()
+        with self._lock:
+            return next((u["user"] for u in self.users.values() if u["user"].get("email") == email), None)
+
+    def add_user(self, **fields) -> Dict[str, Any]:
+        self._wait()
+        user = dict(fields, user_id=str(uuid.uuid4()))
+        with self._lock:
+            self.users[user["user_id"]] = {"user": user, "details": {}, "preferences": {}, "interests": []}
+        return user
+
+    def add_user_details(self, user_id: str, **fields):
+        self._wait()
+        self.users[user_id]["details"] = dict(fields, user_id=user_id)
+
+    def add_travel_preference(self, user_id: str, **fields):
+        self._wait()
+        self.users[user_id]["preferences"] = dict(fields, user_id=user_id)
+
+    def add_user_interest(self, user_id: str, **fields):
+        self._wait()
+        self.users[user_id]["interests"].append(dict(fields, user_id=user_id))
+
+    def get_full_profile(self, user_id: str) -> Dict[str, Any]:
+        self._wait()
+        return self.users.get(user_id, {})
+
+    def close(self):
+        pass
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {"p50": float("nan"), "p95": float("nan"), "p99": float("nan")}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is KB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_level(main_fn, query: str, concurrency: int, requests: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: Counter = Counter()
+    lock = threading.Lock()
+
+    def one():
+        started = time.perf_counter()
+        try:
+            main_fn(query)
+        except Exception as e:
+            with lock:
+                errors[type(e).__name__] += 1
+            return
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(one) for _ in range(requests)]:
+            future.result()
+    wall = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": len(latencies),
+        "errors": dict(errors),
+        **percentiles(latencies),
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+        "max_rss_mb": max_rss_mb(),
+    }
+
+
+def print_report(results: Dict[str, List[Dict[str, Any]]], upstream_calls: Dict[str, int]):
+    print(f"\n{'task':<22}{'conc':>5}{'ok/req':>9}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'req/s':>8}{'RSS MB':>8}  errors")
+    for task, levels in results.items():
+        for r in levels:
+            errors = ", ".join(f"{k} x{v}" for k, v in r["errors"].items()) or "-"
+            print(f"{task:<22}{r['concurrency']:>5}{r['ok']:>5}/{r['requests']:<3}"
+                  f"{r['p50']:>8.2f}{r['p95']:>8.2f}{r['p99']:>8.2f}{r['throughput_rps']:>8.2f}{r['max_rss_mb']:>8.0f}  {errors}")
+    print("\nUpstream calls: " + ", ".join(f"{k}={v}" for k, v in sorted(upstream_calls.items())))
+
+
+def compare(results: Dict[str, List[Dict[str, Any]]], baseline_path: str, tolerance: float) -> List[str]:
+    """Regressions against a saved run: p95 slower by more than `tolerance`, or new errors."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for task, levels in results.items():
+        previous = {r["concurrency"]: r for r in baseline.get(task, [])}
+        for r in levels:
+            before = previous.get(r["concurrency"])
+            if before is None:
+                continue
+            if before["p95"] == before["p95"] and r["p95"] > before["p95"] * (1 + tolerance):
+                regressions.append(f"{task} @{r['concurrency']}: p95 {before['p95']:.2f}s -> {r['p95']:.2f}s")
+            if sum(r["errors"].values()) > sum(before["errors"].values()):
+                regressions.append(f"{task} @{r['concurrency']}: errors {before['errors']} -> {r['errors']}")
+    return regressions
+
+
+def run(args) -> int:
+    scenarios = load_fixture("llm_scenarios.json")["scenarios"]
+    tasks = args.tasks.split(",") if args.tasks else list(scenarios)
+    concurrency = [int(c) for c in args.concurrency.split(",")]
+    latency_ms = {k: v * args.latency_scale for k, v in DEFAULT_LATENCY_MS.items()}
+    qps_limits = {name: float(qps) for name, qps in (item.split("=") for item in args.upstream_qps.split(",") if item)}
+
+    with MockServices(latency_ms=latency_ms, qps_limits=qps_limits) as mocks, tempfile.TemporaryDirectory() as cache_dir:
+        # Must be in place before the repo modules are imported: clients and caches read them at import/init
+        os.environ.update(mocks.env())
+        os.environ["CACHE_DIR"] = cache_dir
+        os.environ.setdefault("TRACE_ENABLED", "0")
+
+        import main
+        import steps
+        from core.rate_limit import rate_limit_stats
+
+        users: Dict[str, Dict[str, Any]] = {}
+        steps.connect_db_client = lambda: InMemoryDB(DB_LATENCY_MS * args.latency_scale, users)
+
+        # With --deadline the pipeline degrades (core.deadline) to finish in time
+        main_fn = functools.partial(main.main, deadline_s=args.deadline) if args.deadline else main.main
+
+        print(f"[Bench] Mock services at {mocks.url}, latency x{args.latency_scale}")
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        with open(os.devnull, "w") as devnull:
+            for task in tasks:
+                query = scenarios[task]["query"]
+                results[task] = []
+                for level in concurrency:
+                    requests = max(args.min_requests, level * args.rounds)
+                    print(f"[Bench] {task}: {requests} requests at concurrency {level}", file=sys.stderr)
+                    with redirect_stdout(devnull):
+                        results[task].append(run_level(main_fn, query, level, requests))
+
+        print_report(results, mocks.state.counts)
+        print("Client rate limiters: " + json.dumps(rate_limit_stats()))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"latency_scale": args.latency_scale, "results": results}, f, indent=2)
+        print(f"[Bench] Results written to {args.json}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            return 1
+        print(f"\nNo regressions against {args.compare} (p95 tolerance {args.tolerance:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark against local mock services.")
+    parser.add_argument("--tasks", help="Comma-separated scenarios from fixtures/llm_scenarios.json (default: all).")
+    parser.add_argument("--concurrency", default=",".join(map(str, DEFAULT_CONCURRENCY)))
+    parser.add_argument("--rounds", type=int, default=3, help="Requests per level = concurrency x rounds.")
+    parser.add_argument("--min-requests", type=int, default=5)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiply every simulated latency.")
+    parser.add_argument("--upstream-qps", default="", help="Mock quotas that answer 429 when exceeded, e.g. places=5,llm=2.")
+    parser.add_argument("--deadline", type=float, help="Per-request deadline in seconds passed to main.main.")
+    parser.add_argument("--json", help="Write results to this file.")
+    parser.add_argument("--compare", help="Baseline results file; exit 1 on p95 or error regressions.")
+    parser.add_argument("--tolerance", type=float, default=P95_TOLERANCE)
+    sys.exit(run(parser.parse_args()))
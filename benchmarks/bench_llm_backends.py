@@ -0,0 +1,102 @@
+"""
+Benchmark of LLM backend routing and hedging against two local stand-in backends.
+
+Starts two benchmarks.mock_services LLM endpoints: "primary" is fast but a share of its
+calls stall before the first token (an overloaded provider), "secondary" is steadier but
+slower. The same calls run with hedging off and on, and each run reports TTFT and total
+latency percentiles and which backend answered.
+
+Run from the repo root:
+    python -m benchmarks.bench_llm_backends
+    python -m benchmarks.bench_llm_backends --calls 100 --spike-share 0.2 --spike-ms 3000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.mock_services import MockServices, load_fixture
+
+
+def run(client, prompt: str, calls: int, concurrency: int) -> Dict[str, Any]:
+    from core.tracing import span
+
+    ttfts: List[float] = []
+    totals: List[float] = []
+    winners: Counter = Counter()
+
+    def one():
+        with span("llm.call") as call_span:
+            started = time.perf_counter()
+            client.query(prompt, "router")
+            totals.append(time.perf_counter() - started)
+            attributes = call_span.attributes
+            ttfts.append(attributes["ttft_ms"] / 1000)
+            winners[attributes["backend"] + (" (hedged)" if attributes.get("hedged") else "")] += 1
+
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull), ThreadPoolExecutor(concurrency) as pool:
+        for future in [pool.submit(one) for _ in range(calls)]:
+            future.result()
+
+    def pct(values, q):
+        return round(float(np.percentile(values, q)), 3)
+
+    return {
+        "ttft_p50_s": pct(ttfts, 50), "ttft_p95_s": pct(ttfts, 95), "ttft_p99_s": pct(ttfts, 99),
+        "total_p50_s": pct(totals, 50), "total_p95_s": pct(totals, 95),
+        "answered_by": dict(winners),
+    }
+
+
+def main(args) -> int:
+    primary_latency = {"llm_ttft": args.primary_ttft_ms, "llm_per_token": 1}
+    secondary_latency = {"llm_ttft": args.secondary_ttft_ms, "llm_per_token": 1}
+    with MockServices(latency_ms=primary_latency, ttft_spikes=(args.spike_share, args.spike_ms)) as primary, \
+            MockServices(latency_ms=secondary_latency) as secondary:
+        # Tracing on in memory only, the benchmark reads the llm.call span attributes
+        os.environ.update({"TRACE_ENABLED": "1", "TRACE_EXPORT": "", "LLM_API_KEY": "mock-key",
+                           "RATE_LIMIT_LLM_PRIMARY": "1000:1000", "RATE_LIMIT_LLM_SECONDARY": "1000:1000"})
+        from core.tracing import configure_from_env
+        from apis.llm_api import LLMClient
+        from apis.llm_backends import LLMBackend
+
+        configure_from_env()
+        prompt = "You are a travel assistant task selector. " + load_fixture("llm_scenarios.json")["scenarios"]["ItineraryPlanner"]["query"]
+        results = {}
+        for label, hedge_after_s in (("no hedging", 0.0), ("hedging", args.hedge_after_s)):
+            backends = [LLMBackend("primary", f"{primary.url}/v1", "mock-key"),
+                        LLMBackend("secondary", f"{secondary.url}/v1", "mock-key")]
+            client = LLMClient(backends=backends, hedge_after_s=hedge_after_s)
+            print(f"[Bench] {label}: {args.calls} calls at concurrency {args.concurrency}", file=sys.stderr)
+            results[label] = run(client, prompt, args.calls, args.concurrency)
+            results[label]["backends"] = client.backend_stats()
+
+    print(f"\n{'':<12}{'ttft p50':>10}{'ttft p95':>10}{'ttft p99':>10}{'total p95':>11}  answered by")
+    for label, row in results.items():
+        print(f"{label:<12}{row['ttft_p50_s']:>10}{row['ttft_p95_s']:>10}{row['ttft_p99_s']:>10}"
+              f"{row['total_p95_s']:>11}  {row['answered_by']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"[Bench] Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare LLM calls with and without hedging across two mock backends.")
+    parser.add_argument("--calls", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--primary-ttft-ms", type=float, default=150)
+    parser.add_argument("--secondary-ttft-ms", type=float, default=400)
+    parser.add_argument("--spike-share", type=float, default=0.15, help="Share of primary calls that stall.")
+    parser.add_argument("--spike-ms", type=float, default=2000, help="Extra first-token wait of a stalled call.")
+    parser.add_argument("--hedge-after-s", type=float, default=1.0, help="Upper bound of the hedge delay.")
+    parser.add_argument("--json", help="Write results to this file.")
+    sys.exit(main(parser.parse_args()))
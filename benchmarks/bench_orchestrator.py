@@ -0,0 +1,96 @@
+"""
+Microbenchmark of per-step Orchestrator overhead.
+
+Compares the old per-call binding (inspect.signature on every step, merge through
+__dict__) with the compiled binder and merge plan, and measures the full run()
+overhead per step with no-op steps.
+
+Run from the repo root:
+    python -m benchmarks.bench_orchestrator
+"""
+import inspect
+import io
+import time
+from contextlib import redirect_stdout
+
+from context import ItineraryPlannerContext
+from core.federation import Orchestrator
+
+STEPS = 10
+ITERATIONS = 2000
+
+
+def make_step(i: int):
+    def step(city, travel_duration, pace, interests, must_see, user_query, context):
+        return i
+    step.__name__ = f"step_{i}"
+    return step
+
+
+REGISTRY = {f"step_{i}": make_step(i) for i in range(STEPS)}
+FLOW = [
+    {"step": f"step_{i}", "reads": ["city", "travel_duration", "pace", "interests", "must_see"], "writes": [f"out_{i}"]}
+    for i in range(STEPS)
+]
+
+
+def legacy_call(func, context, user_query, state):
+    """What Orchestrator.run used to do for every step."""
+    kwargs = {}
+    for name, param in inspect.signature(func).parameters.items():
+        if name == "context":
+            kwargs[name] = context
+        elif name == "user_query":
+            kwargs[name] = user_query
+        elif name in state:
+            kwargs[name] = state[name]
+        elif hasattr(context, name):
+            kwargs[name] = getattr(context, name)
+        else:
+            kwargs[name] = None
+    result = func(**kwargs)
+    if hasattr(context, "__dict__"):
+        for k, v in context.__dict__.items():
+            setattr(context, k, v)
+    return result
+
+
+def context():
+    return ItineraryPlannerContext(city="Jaipur", travel_duration=3, interests=["history"], must_see=["Amer Fort"])
+
+
+def run():
+    ctx = context()
+
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        state = {}
+        for i, func in enumerate(REGISTRY.values()):
+            state[f"out_{i}"] = legacy_call(func, ctx, "query", state)
+    legacy_us = 1e6 * (time.perf_counter() - started) / (ITERATIONS * STEPS)
+
+    orchestrator = Orchestrator("Bench", FLOW, ctx, "query")
+    orchestrator.register_steps(REGISTRY)
+    compiled = orchestrator.validate()
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        for step in compiled.steps:
+            orchestrator._merge(step, orchestrator._bind(step)())
+    compiled_us = 1e6 * (time.perf_counter() - started) / (ITERATIONS * STEPS)
+
+    started = time.perf_counter()
+    for _ in range(ITERATIONS // 10):
+        orchestrator = Orchestrator("Bench", FLOW, context(), "query")
+        orchestrator.register_steps(REGISTRY)
+        with redirect_stdout(io.StringIO()):
+            orchestrator.run()
+    run_us = 1e6 * (time.perf_counter() - started) / (ITERATIONS // 10 * STEPS)
+
+    print(f"Per-step overhead over {ITERATIONS} runs of {STEPS} independent steps")
+    print(f"  legacy bind + merge   : {legacy_us:8.2f} us")
+    print(f"  compiled bind + merge : {compiled_us:8.2f} us")
+    print(f"  full run() incl. pool : {run_us:8.2f} us")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,124 @@
+"""
+Benchmark for core.polyline and apis.routes_api.ParsedRoute.
+
+Builds a synthetic multi-waypoint computeRoutes response (legs with per-step
+polylines and instructions, like the real API) and compares:
+  - pure Python vs vectorized polyline decoding
+  - raw JSON vs ParsedRoute size in memory and serialized
+
+Run from the repo root:
+    python -m benchmarks.bench_polyline
+"""
+import json
+import sys
+import time
+
+import numpy as np
+
+from apis.routes_api import ParsedRoute
+from core.polyline import decode_polyline, encode_polyline
+
+POINTS = 20_000
+LEGS = 12
+STEPS_PER_LEG = 40
+REPEAT = 20
+
+
+def decode_polyline_python(encoded: str, precision: int = 5):
+    """Classic per-character decoder, for comparison."""
+    coords, index, lat, lon = [], 0, 0, 0
+    factor = 10 ** precision
+    while index < len(encoded):
+        for axis in range(2):
+            result, shift = 0, 0
+            while True:
+                b = ord(encoded[index]) - 63
+                index += 1
+                result |= (b & 0x1F) << shift
+                shift += 5
+                if b < 0x20:
+                    break
+            delta = ~(result >> 1) if result & 1 else result >> 1
+            if axis == 0:
+                lat += delta
+            else:
+                lon += delta
+        coords.append((lat / factor, lon / factor))
+    return coords
+
+
+def synthetic_response(seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    coords = np.cumsum(rng.normal(0, 0.0002, (POINTS, 2)), axis=0) + [26.9124, 75.7873]
+    per_leg = np.array_split(coords, LEGS)
+    legs = []
+    for leg_coords in per_leg:
+        steps = []
+        for step_coords in np.array_split(leg_coords, STEPS_PER_LEG):
+            steps.append({
+                "distanceMeters": int(rng.integers(50, 2000)),
+                "staticDuration": f"{int(rng.integers(10, 600))}s",
+                "polyline": {"encodedPolyline": encode_polyline(step_coords)},
+                "startLocation": {"latLng": {"latitude": float(step_coords[0, 0]), "longitude": float(step_coords[0, 1])}},
+                "endLocation": {"latLng": {"latitude": float(step_coords[-1, 0]), "longitude": float(step_coords[-1, 1])}},
+                "navigationInstruction": {"maneuver": "TURN_LEFT", "instructions": "Turn left onto Jawahar Lal Nehru Marg"},
+                "localizedValues": {"distance": {"text": "1.2 km"}, "staticDuration": {"text": "4 mins"}},
+                "travelMode": "DRIVE",
+            })
+        legs.append({
+            "distanceMeters": int(rng.integers(1000, 20000)),
+            "duration": f"{int(rng.integers(300, 3600))}s",
+            "polyline": {"encodedPolyline": encode_polyline(leg_coords)},
+            "steps": steps,
+        })
+    return {"routes": [{
+        "distanceMeters": sum(leg["distanceMeters"] for leg in legs),
+        "duration": f"{sum(int(leg['duration'][:-1]) for leg in legs)}s",
+        "polyline": {"encodedPolyline": encode_polyline(coords)},
+        "legs": legs,
+    }]}
+
+
+def deep_sizeof(obj) -> int:
+    """Approximate memory held by nested dicts/lists/strings/arrays."""
+    if isinstance(obj, np.ndarray):
+        return sys.getsizeof(obj) + (0 if obj.base is None else obj.nbytes)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k) + deep_sizeof(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_sizeof(v) for v in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, name)) for name in obj.__slots__)
+    return size
+
+
+def timed(fn, *args) -> float:
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        fn(*args)
+    return 1000 * (time.perf_counter() - started) / REPEAT
+
+
+def run():
+    response = synthetic_response()
+    encoded = response["routes"][0]["polyline"]["encodedPolyline"]
+
+    print(f"Polyline: {POINTS} points, {len(encoded)} chars")
+    print(f"  decode python     : {timed(decode_polyline_python, encoded):8.2f} ms")
+    print(f"  decode vectorized : {timed(decode_polyline, encoded):8.2f} ms")
+    print(f"  parse response    : {timed(ParsedRoute.from_response, response):8.2f} ms")
+
+    raw_mem = deep_sizeof(response)
+    raw_json = len(json.dumps(response))
+    print(f"\n{'representation':<22} {'memory KB':>10} {'json KB':>10}")
+    print(f"{'raw response':<22} {raw_mem / 1024:>10.0f} {raw_json / 1024:>10.0f}")
+    for tolerance in (None, 5.0, 10.0, 25.0):
+        parsed = ParsedRoute.from_response(response, tolerance_m=tolerance)
+        label = f"parsed tol={tolerance}m" if tolerance else "parsed"
+        print(f"{label:<22} {deep_sizeof(parsed) / 1024:>10.0f} {len(json.dumps(parsed.to_dict())) / 1024:>10.0f}"
+              f"   ({len(parsed.coords)} points)")
+
+
+if __name__ == "__main__":
+    run()
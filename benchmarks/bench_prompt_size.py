@@ -0,0 +1,128 @@
+"""
+Before/after benchmark of the final ItineraryPlanner prompt.
+
+Builds the narration prompt for the Jaipur fixture (the recorded Places results scored,
+pruned and pre-planned into days, as Execute does) three ways:
+
+    - repr:      str(context) with every POI dict, as the first version of Execute did
+    - dump:      model_dump() of the context and one format_poi_line per alternative
+    - compact:   core.prompt_format (informative fields only, POI table, review budget)
+
+and reports estimated prompt tokens per section, then the time of the narration call
+for each prompt against benchmarks.mock_services, with prompt processing simulated at
+--prefill-ms-per-token (the reply is the same recorded answer every time).
+
+Run from the repo root:
+    python -m benchmarks.bench_prompt_size
+    python -m benchmarks.bench_prompt_size --calls 10 --prefill-ms-per-token 0.5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from contextlib import redirect_stdout
+from typing import Dict, Tuple
+
+from benchmarks.mock_services import PLACES_FIXTURE, MockServices, load_fixture
+from context import ItineraryPlannerContext
+from core.day_planner import format_day_plan, format_poi_line, plan_days
+from core.poi_scoring import DEFAULT_TOP_K, POI_PROMPT_TOKEN_BUDGET, estimate_tokens, fit_to_token_budget, select_top_pois
+from core.prompt_format import format_compact_day_plan, format_context, format_poi_table, section_tokens
+from prompter import get_prompt
+
+JAIPUR_HOTEL = (26.9157, 75.8053)
+
+
+def build_prompts() -> Tuple[Dict[str, Dict[str, str]], Dict[str, int]]:
+    """
+    Returns:
+        ({variant: {section: text}} with the full prompt under "prompt", {variant: POIs in the prompt})
+    """
+    from steps import extract_data_from_api_response, get_poi_per_day
+
+    scenario = load_fixture("llm_scenarios.json")["scenarios"]["ItineraryPlanner"]
+    with open(PLACES_FIXTURE, encoding="utf-8") as f:
+        candidates = [extract_data_from_api_response(p) for p in json.load(f)]
+    context = ItineraryPlannerContext.model_validate(dict(scenario["decomposed"], poi_candidates=candidates))
+    query = scenario["query"]
+
+    variants = {"repr": {"context": str(context)}}
+    variants["repr"]["prompt"] = ("Plan me a detailed itinerary with the following data:\n" + str(context)
+                                  + "\nUser Query:\n" + query)
+
+    ranked = select_top_pois(candidates, context.interests, context.must_see, origin=JAIPUR_HOTEL, top_k=DEFAULT_TOP_K)
+    pois = [poi for poi, _ in ranked]
+    plan = plan_days(pois, days=context.travel_duration, poi_per_day=get_poi_per_day(context.pace), start=JAIPUR_HOTEL)
+    day_plan = format_day_plan(plan, start_label=context.start_loc)
+    planned = {stop.get("place_id") for day in plan for stop in day["stops"]}
+    alternatives = [p for p in pois if p.get("place_id") not in planned]
+    budget = POI_PROMPT_TOKEN_BUDGET - estimate_tokens(day_plan)
+
+    compact_plan = format_compact_day_plan(plan, start_label=context.start_loc)
+    kept, _ = fit_to_token_budget(alternatives, format_poi_line, budget)
+    table, table_rows = format_poi_table(alternatives, POI_PROMPT_TOKEN_BUDGET - estimate_tokens(compact_plan))
+    sections = {
+        "dump": {"day_plan": day_plan, "alternatives": "\n".join(format_poi_line(p) for p in kept) or "None",
+                 "trip_details": str(context.model_dump(exclude={"poi_candidates"}))},
+        "compact": {"day_plan": compact_plan, "alternatives": table or "None",
+                    "trip_details": format_context(context, exclude={"poi_candidates"})},
+    }
+    pois_sent = {"repr": len(candidates), "dump": len(planned) + len(kept), "compact": len(planned) + table_rows}
+    for name, parts in sections.items():
+        variants[name] = dict(parts, prompt=get_prompt("ItineraryNarration", user_query=query, **parts))
+    return variants, pois_sent
+
+
+def time_calls(client, prompt: str, calls: int) -> float:
+    durations = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        client.query(prompt, "narrator")
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations)
+
+
+def main(args) -> int:
+    variants, pois_sent = build_prompts()
+    tokens = {name: section_tokens({k: v for k, v in parts.items() if k != "prompt"}) for name, parts in variants.items()}
+    for name, parts in variants.items():
+        tokens[name]["prompt"] = estimate_tokens(parts["prompt"])
+
+    latency = {"llm_ttft": args.ttft_ms, "llm_per_token": 1, "llm_per_prompt_token": args.prefill_ms_per_token}
+    with MockServices(latency_ms=latency) as mocks:
+        os.environ.update(mocks.env())
+        os.environ["RATE_LIMIT_LLM"] = "1000:1000"
+        from apis.llm_api import LLMClient
+
+        client = LLMClient(base_url=f"{mocks.url}/v1", api_key="mock-key")
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            client.query("warm up", "narrator")
+            seconds = {name: time_calls(client, parts["prompt"], args.calls) for name, parts in variants.items()}
+
+    baseline = tokens["repr"]["prompt"]
+    print(f"\n{'':<9}{'prompt':>8}{'day plan':>10}{'altern.':>9}{'details':>9}{'vs repr':>9}{'POIs':>6}{'call p50':>10}")
+    for name in variants:
+        row = tokens[name]
+        print(f"{name:<9}{row['prompt']:>8}{row.get('day_plan', '-'):>10}{row.get('alternatives', '-'):>9}"
+              f"{row.get('trip_details', row.get('context', '-')):>9}{row['prompt'] / baseline:>9.0%}{pois_sent[name]:>6}{seconds[name]:>9.3f}s")
+    print(f"\n(tokens estimated at 4 chars/token; prompt processing simulated at {args.prefill_ms_per_token} ms/token)")
+    if args.show:
+        print(f"\n--- compact prompt ---\n{variants['compact']['prompt']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"tokens": tokens, "pois": pois_sent, "call_p50_s": seconds}, f, indent=2)
+        print(f"[Bench] Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare final prompt size and call time before/after compaction.")
+    parser.add_argument("--calls", type=int, default=5, help="Narration calls per prompt variant.")
+    parser.add_argument("--ttft-ms", type=float, default=300)
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.25,
+                        help="Simulated prompt processing time per prompt token.")
+    parser.add_argument("--show", action="store_true", help="Print the compact prompt.")
+    parser.add_argument("--json", help="Write results to this file.")
+    sys.exit(main(parser.parse_args()))
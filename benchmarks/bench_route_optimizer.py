@@ -0,0 +1,93 @@
+"""
+Benchmark for core.route_optimizer on synthetic instances.
+
+Compares the optimized tour against the input order and the plain
+nearest-neighbour tour, and reports solve time per instance.
+
+Run from the repo root:
+    python -m benchmarks.bench_route_optimizer
+"""
+import random
+import time
+from typing import List, Dict
+
+from core.route_optimizer import RouteOptimizer, build_time_matrix, time_windows_for
+
+# Jaipur-sized bounding box around the city centre.
+CENTER = (26.9124, 75.7873)
+SPREAD = 0.12
+WINDOWED_SERVICE_MINUTES = 20
+
+
+def uniform_instance(n: int, seed: int) -> List[Dict]:
+    rng = random.Random(seed)
+    return [
+        {"lat": CENTER[0] + rng.uniform(-SPREAD, SPREAD), "lon": CENTER[1] + rng.uniform(-SPREAD, SPREAD)}
+        for _ in range(n)
+    ]
+
+
+def clustered_instance(n: int, seed: int, clusters: int = 4) -> List[Dict]:
+    rng = random.Random(seed)
+    centres = [
+        (CENTER[0] + rng.uniform(-SPREAD, SPREAD), CENTER[1] + rng.uniform(-SPREAD, SPREAD))
+        for _ in range(clusters)
+    ]
+    out = []
+    for _ in range(n):
+        lat, lon = rng.choice(centres)
+        out.append({"lat": lat + rng.gauss(0, 0.01), "lon": lon + rng.gauss(0, 0.01)})
+    return out
+
+
+def windowed_instance(n: int, seed: int) -> List[Dict]:
+    """Uniform stops where a third of them must be reached inside a 3 hour window."""
+    rng = random.Random(seed)
+    stops = uniform_instance(n, seed)
+    day_minutes = n * (WINDOWED_SERVICE_MINUTES + 12)
+    for stop in stops:
+        if rng.random() < 0.33:
+            start = rng.uniform(0, day_minutes - 180)
+            stop["time_window"] = [start, start + 180]
+    return stops
+
+
+INSTANCES = [
+    ("uniform", uniform_instance),
+    ("clustered", clustered_instance),
+    ("windowed", windowed_instance),
+]
+SIZES = [10, 25, 50, 100]
+SEEDS = [0, 1, 2]
+
+
+def run():
+    origin = (CENTER[0], CENTER[1])
+    print(f"{'instance':<10} {'n':>4} {'given':>9} {'nn':>9} {'opt':>9} {'gain%':>7} {'ms':>8}")
+    for name, make in INSTANCES:
+        for n in SIZES:
+            given_total = nn_total = opt_total = 0.0
+            elapsed = 0.0
+            for seed in SEEDS:
+                stops = make(n, seed)
+                windows = time_windows_for(stops)
+                started = time.perf_counter()
+                matrix = build_time_matrix([origin] + [(s["lat"], s["lon"]) for s in stops])
+                optimizer = RouteOptimizer(matrix, time_windows=windows, service_minutes=WINDOWED_SERVICE_MINUTES if name == "windowed" else 0)
+                order = optimizer.solve(max_seconds=1.0)
+                elapsed += time.perf_counter() - started
+
+                given_total += optimizer.route_cost(list(range(1, n + 1)))
+                nn_total += optimizer.route_cost(optimizer._nearest_neighbour())
+                opt_total += optimizer.route_cost(order)
+
+            runs = len(SEEDS)
+            gain = 100.0 * (nn_total - opt_total) / nn_total if nn_total else 0.0
+            print(
+                f"{name:<10} {n:>4} {given_total / runs:>9.0f} {nn_total / runs:>9.0f} "
+                f"{opt_total / runs:>9.0f} {gain:>7.1f} {1000 * elapsed / runs:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    run()
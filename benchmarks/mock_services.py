@@ -0,0 +1,318 @@
+"""
+Local stand-ins for the external services, serving recorded fixtures with configurable latency.
+
+One HTTP server answers every upstream the pipeline talks to:
+
+    POST /v1/chat/completions               OpenAI-compatible streaming chat (LLM_BASE_URL=<url>/v1)
+    POST /places/v1/places:searchText       Google Places text search      (PLACES_BASE_URL=<url>/places/v1)
+    POST /routes/directions/v2:computeRoutes Google Routes                 (ROUTES_BASE_URL=<url>/routes)
+    POST /overpass/api/interpreter          Overpass                       (OVERPASS_URL=<url>/overpass/api/interpreter)
+
+LLM replies come from fixtures/llm_scenarios.json: the scenario is picked by its "match"
+phrase appearing in the prompt, and the reply by the kind of prompt (task routing,
+JSON extraction, or the final answer), streamed chunk by chunk like a real model.
+Places replies are Readme/places_JSON_output.txt, trimmed to the request's field mask.
+With qps_limits set, a service answers 429 with Retry-After once it gets more requests
+per second than its limit, like the real quotas. With ttft_spikes=(share, ms) that share
+of LLM calls waits ms longer for the first token, like an overloaded provider.
+A system message seen before counts as cached prompt tokens (usage.prompt_tokens_details)
+and skips the per-prompt-token latency, like a provider's prefix cache.
+
+Standalone, e.g. to point the Streamlit app at it:
+    python -m benchmarks.mock_services --port 8765
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(REPO_ROOT, "benchmarks", "fixtures")
+PLACES_FIXTURE = os.path.join(REPO_ROOT, "Readme", "places_JSON_output.txt")
+
+# Simulated upstream latency in milliseconds
+DEFAULT_LATENCY_MS = {
+    "llm_ttft": 400,       # time to first streamed token
+    "llm_per_token": 4,    # per generated token after that
+    "llm_per_prompt_token": 0,  # prompt processing, added to the time to first token
+    "places": 150,
+    "routes": 250,
+    "overpass": 300,
+}
+
+CHARS_PER_TOKEN = 4
+
+
+def load_fixture(name: str):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def mask_place(place: dict, field_mask: str) -> dict:
+    """Keep only the top-level fields named in an X-Goog-FieldMask such as "places.id,places.location"."""
+    if not field_mask or field_mask == "*":
+        return place
+    fields = {f.split(".")[1] for f in field_mask.split(",") if f.startswith("places.")}
+    return {k: v for k, v in place.items() if k in fields}
+
+
+class MockState:
+    """Fixtures, latency settings and request counters shared by all handler threads."""
+
+    def __init__(self, latency_ms: Optional[Dict[str, float]] = None, qps_limits: Optional[Dict[str, float]] = None,
+                 ttft_spikes: Optional[Tuple[float, float]] = None):
+        self.latency_ms = dict(DEFAULT_LATENCY_MS, **(latency_ms or {}))
+        self.qps_limits = qps_limits or {}
+        self.ttft_spikes = ttft_spikes
+        self._windows: Dict[str, list] = {}
+        llm = load_fixture("llm_scenarios.json")
+        self.scenarios = llm["scenarios"]
+        self.reasoning = llm["reasoning"]
+        self.answer = llm["answer"]
+        with open(PLACES_FIXTURE, encoding="utf-8") as f:
+            self.places = json.load(f)
+        self.route = load_fixture("routes_compute_routes.json")
+        self.overpass = load_fixture("overpass_cafes.json")
+        self.counts: Dict[str, int] = {}
+        self._system_prompts: set = set()
+        self._lock = threading.Lock()
+
+    def count(self, service: str) -> bool:
+        """Count a request. False if it is over the service's QPS limit and should get a 429."""
+        with self._lock:
+            self.counts[service] = self.counts.get(service, 0) + 1
+            limit = self.qps_limits.get(service)
+            if not limit:
+                return True
+            second = int(time.time())
+            window = self._windows.setdefault(service, [second, 0])
+            if window[0] != second:
+                window[0], window[1] = second, 0
+            window[1] += 1
+            if window[1] > limit:
+                self.counts[f"{service}_429"] = self.counts.get(f"{service}_429", 0) + 1
+                return False
+            return True
+
+    def cached_tokens(self, messages: list) -> int:
+        """Prompt tokens a prefix cache would serve: the system message, once it was seen before."""
+        if not messages or messages[0].get("role") != "system":
+            return 0
+        system = messages[0].get("content") or ""
+        with self._lock:
+            if system in self._system_prompts:
+                return len(system) // CHARS_PER_TOKEN
+            self._system_prompts.add(system)
+        return 0
+
+    def sleep(self, key: str, factor: float = 1.0):
+        delay = self.latency_ms.get(key, 0) * factor / 1000
+        if delay > 0:
+            time.sleep(delay)
+
+    def sleep_ttft(self, prompt_tokens: int = 0):
+        self.sleep("llm_ttft")
+        self.sleep("llm_per_prompt_token", prompt_tokens)
+        if self.ttft_spikes and random.random() < self.ttft_spikes[0]:
+            time.sleep(self.ttft_spikes[1] / 1000)
+
+    def llm_reply(self, prompt: str):
+        """(reasoning, content) for a prompt, chosen by scenario and prompt kind."""
+        name, scenario = next(
+            ((n, s) for n, s in self.scenarios.items() if s["match"].lower() in prompt.lower()), (None, None)
+        )
+        if "task selector" in prompt:
+            return "", name or "NoneOfThese"
+        if "Return ONLY JSON" in prompt and scenario is not None:
+            return "", json.dumps(scenario["decomposed"])
+        return self.reasoning, self.answer
+
+
+def _stream_pieces(text: str, size: int = 16):
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+class MockServiceHandler(BaseHTTPRequestHandler):
+    state: MockState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+            return {"data": body.decode()}
+        return json.loads(body or b"{}")
+
+    def _send_json(self, payload, status: int = 200, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _throttled(self, service: str) -> bool:
+        if self.state.count(service):
+            return False
+        self._send_json({"error": {"code": 429, "message": f"{service} quota exceeded"}}, 429, {"Retry-After": "1"})
+        return True
+
+    def do_POST(self):
+        request = self._read_json()
+        path = self.path.split("?")[0]
+        if path.endswith("/chat/completions"):
+            if not self._throttled("llm"):
+                self._chat(request)
+        elif path.endswith("/places:searchText"):
+            if self._throttled("places"):
+                return
+            self.state.sleep("places")
+            mask = self.headers.get("X-Goog-FieldMask", "*")
+            self._send_json({"places": [mask_place(p, mask) for p in self.state.places]})
+        elif path.endswith("/directions/v2:computeRoutes"):
+            if self._throttled("routes"):
+                return
+            self.state.sleep("routes")
+            self._send_json(self.state.route)
+        elif path.endswith("/api/interpreter"):
+            if self._throttled("overpass"):
+                return
+            self.state.sleep("overpass")
+            self._send_json(self.state.overpass)
+        else:
+            self._send_json({"error": {"code": 404, "message": f"No mock for {path}"}}, status=404)
+
+    def _chat(self, request: dict):
+        prompt = "\n".join(
+            m["content"] if isinstance(m.get("content"), str) else json.dumps(m.get("content"))
+            for m in request.get("messages", [])
+        )
+        reasoning, content = self.state.llm_reply(prompt)
+        cached = self.state.cached_tokens(request.get("messages", []))
+        uncached = len(prompt) // CHARS_PER_TOKEN - cached
+        model = request.get("model", "mock-model")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        if not request.get("stream"):
+            self.state.sleep_ttft(uncached)
+            self.state.sleep("llm_per_token", len(content) / CHARS_PER_TOKEN)
+            self._send_json({
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+                "usage": self._usage(prompt, reasoning + content, cached),
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def event(delta: Optional[dict] = None, finish_reason: Optional[str] = None, usage: Optional[dict] = None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            if usage:
+                chunk["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+
+        try:
+            self.state.sleep_ttft(uncached)
+            event({"role": "assistant", "content": ""})
+            for field, text in (("reasoning_content", reasoning), ("content", content)):
+                for piece in _stream_pieces(text):
+                    self.state.sleep("llm_per_token", len(piece) / CHARS_PER_TOKEN)
+                    event({field: piece})
+            event({}, finish_reason="stop")
+            if (request.get("stream_options") or {}).get("include_usage"):
+                event(usage=self._usage(prompt, reasoning + content, cached))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading (hedged call lost, or it had what it needed)
+            self.close_connection = True
+
+    @staticmethod
+    def _usage(prompt: str, completion: str, cached: int = 0) -> dict:
+        prompt_tokens = len(prompt) // CHARS_PER_TOKEN
+        completion_tokens = len(completion) // CHARS_PER_TOKEN
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached}}
+
+
+class MockServices:
+    """
+    Runs the mock server on a background thread.
+
+    Usage:
+        with MockServices(latency_ms={"places": 50}) as mocks:
+            os.environ.update(mocks.env())
+            ...
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: Optional[Dict[str, float]] = None,
+                 qps_limits: Optional[Dict[str, float]] = None, ttft_spikes: Optional[Tuple[float, float]] = None):
+        self.state = MockState(latency_ms, qps_limits, ttft_spikes)
+        handler = type("BoundMockServiceHandler", (MockServiceHandler,), {"state": self.state})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> Dict[str, str]:
+        """Environment overrides that point every client at this server."""
+        return {
+            "LLM_BASE_URL": f"{self.url}/v1",
+            "PLACES_BASE_URL": f"{self.url}/places/v1",
+            "ROUTES_BASE_URL": f"{self.url}/routes",
+            "OVERPASS_URL": f"{self.url}/overpass/api/interpreter",
+            "LLM_API_KEY": "mock-key",
+            "MAPS_API_KEY": "mock-key",
+        }
+
+    def start(self) -> "MockServices":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-services", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "MockServices":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded LLM/Places/Routes/Overpass fixtures locally.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiply every simulated latency.")
+    args = parser.parse_args()
+
+    mocks = MockServices(port=args.port, latency_ms={k: v * args.latency_scale for k, v in DEFAULT_LATENCY_MS.items()})
+    print(f"[MockServices] Listening on {mocks.url}. Export these to use it:")
+    for key, value in mocks.env().items():
+        print(f"  export {key}={value}")
+    try:
+        mocks.server.serve_forever()
+    except KeyboardInterrupt:
+        mocks.stop()
@@ -3,18 +3,173 @@
 BaseContext class for managing general context in the application.
 Child Context classes can extend this to add specific context handling.
 
+Task contexts derive from ContextModel, which adds cheap shallow access for hot paths
+(fast_dump, cache_key) next to pydantic's validating model_dump. POIs are POIRecord:
+frozen and slotted, they are shared instead of copied (model_copy(deep=True) keeps the
+same records) and read like the dicts they replace. Their types tuples are interned, so
+hundreds of POIs per request stay small. Reviews are kept whole (they are cached as they
+are); prompts shorten them when rendering. core.poi_batch.POIBatch holds them
+column-wise for vectorized scoring.
+
 """
-from typing import Optional, List, Dict, Any
+import hashlib
+import json
+import sys
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Tuple
 
 try:
     from pydantic import BaseModel, Field
+    from pydantic_core import core_schema
     PydanticBase = BaseModel
 except ImportError:
-    from dataclasses import dataclass
     PydanticBase = object
 
+NO_REVIEW = "No reviews available"
+
+# Places returns the same few type lists over and over: one shared tuple per distinct list
+_TYPES: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+MAX_INTERNED_TYPES = 4096
+
+
+def intern_types(types: Iterable[str]) -> Tuple[str, ...]:
+    """The shared tuple of these type strings (themselves interned)."""
+    key = tuple(sys.intern(t) for t in types)
+    if len(_TYPES) >= MAX_INTERNED_TYPES:
+        return _TYPES.get(key, key)
+    return _TYPES.setdefault(key, key)
+
+# Keys a POIRecord answers to, as in the dicts steps.extract_data_from_api_response used to return
+_POI_KEYS = ("name", "address", "place_id", "types", "location", "review", "rating", "rating_count")
+
+
+@dataclass(frozen=True, slots=True)
+class POIRecord(Mapping):
+    """
+    One Places result. Immutable, so it is shared between contexts, caches and copies.
+    Reads like a dict (poi["name"], poi.get("location"), dict(poi, score=...)), so code
+    written for POI dicts takes either.
+    """
+    name: str
+    address: str = ""
+    place_id: str = ""
+    types: Tuple[str, ...] = ()
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    review: str = NO_REVIEW
+    rating: float = 0.0
+    rating_count: int = 0
+
+    @classmethod
+    def from_place(cls, place: Dict[str, Any]) -> "POIRecord":
+        """From a Places API (New) place object."""
+        # reviewSummary.text is a LocalizedText {"text", "languageCode"}
+        review = place.get("reviewSummary", {}).get("text", NO_REVIEW)
+        if isinstance(review, dict):
+            review = review.get("text", NO_REVIEW)
+        location = place.get("location") or {}
+        return cls(
+            name=place.get("displayName", {}).get("text", "Unknown Place"),
+            address=place.get("shortFormattedAddress", "Address not available"),
+            place_id=place.get("id", ""),
+            types=intern_types(place.get("types", ())),
+            lat=location.get("latitude"),
+            lon=location.get("longitude"),
+            review=review,
+            rating=place.get("rating", 0.0),
+            rating_count=place.get("userRatingCount", 0),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "POIRecord":
+        """From to_dict output (or an older POI dict with extra keys, which are dropped)."""
+        location = data.get("location") or {}
+        return cls(
+            name=data.get("name", "Unknown Place"),
+            address=data.get("address", ""),
+            place_id=data.get("place_id", ""),
+            types=intern_types(data.get("types") or ()),
+            lat=location.get("latitude"),
+            lon=location.get("longitude"),
+            review=data.get("review", NO_REVIEW) or "",
+            rating=data.get("rating", 0.0),
+            rating_count=data.get("rating_count", 0),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "address": self.address,
+            "place_id": self.place_id,
+            "types": list(self.types),
+            "location": {"latitude": self.lat, "longitude": self.lon},
+            "review": self.review,
+            "rating": self.rating,
+            "rating_count": self.rating_count,
+        }
+
+    def cache_key(self) -> str:
+        return self.place_id or self.name
+
+    # Mapping interface
+    def __getitem__(self, key: str) -> Any:
+        if key == "location":
+            return {"latitude": self.lat, "longitude": self.lon}
+        if key in _POI_KEYS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_POI_KEYS)
+
+    def __len__(self) -> int:
+        return len(_POI_KEYS)
+
+    # Immutable: copies are the record itself
+    def __copy__(self) -> "POIRecord":
+        return self
+
+    def __deepcopy__(self, memo) -> "POIRecord":
+        return self
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler):
+        # Records pass through untouched (an isinstance check), dicts are converted;
+        # serialized as to_dict, POIs that scoring turned into dicts as they are.
+        # The JSON schema (what the Decomposer shows the LLM) stays a plain object.
+        return core_schema.no_info_before_validator_function(
+            lambda value: cls.from_dict(value) if isinstance(value, dict) else value,
+            core_schema.is_instance_schema(cls),
+            json_schema_input_schema=core_schema.dict_schema(core_schema.str_schema(), core_schema.any_schema()),
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                lambda value: value.to_dict() if isinstance(value, POIRecord) else dict(value)
+            ),
+        )
+
+
+def _key_default(value: Any) -> Any:
+    cache_key = getattr(value, "cache_key", None)
+    return cache_key() if callable(cache_key) else str(value)
+
+
+class ContextModel(PydanticBase):
+    def fast_dump(self, exclude: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        Field values without model_dump's validation and copying: a shallow dict sharing the
+        model's lists and records, so treat it as read-only.
+        """
+        exclude = set(exclude)
+        return {name: value for name, value in self.__dict__.items() if name not in exclude}
+
+    def cache_key(self, exclude: Iterable[str] = ()) -> str:
+        """Stable hash of the field values, with POIs reduced to their place ids."""
+        encoded = json.dumps(self.fast_dump(exclude), sort_keys=True, default=_key_default)
+        return hashlib.sha1(encoded.encode()).hexdigest()
+
+
 # Base
-class BaseContext(PydanticBase):
+class BaseContext(ContextModel):
     request_id: Optional[str] = None
     user_id: Optional[str] = None
     name: Optional[str] = None
@@ -23,20 +178,20 @@ class BaseContext(PydanticBase):
 class TripSuggestionContext(BaseContext):
     city: Optional[str]
     days: Optional[int] = 1
-    interests: Optional[List[str]] = []
+    interests: Optional[List[str]] = Field(default_factory=list)
     pace: Optional[str] = "moderate"
     budget: Optional[str] = None
 
-class ItineraryPlannerContext(BaseModel):
+class ItineraryPlannerContext(ContextModel):
     # --- Core trip info ---
     city: str   #Query
     travel_duration: int  # Query
     pace: Optional[str] = "moderate"  # Query : relaxed | moderate | fast
 
     # --- User preferences ---
-    interests: Optional[List[str]] = [] #Query, else DB
-    dietary_preferences: Optional[List[str]] = [] # DB
-    special_needs: Optional[List[str]] = [] # DB
+    interests: Optional[List[str]] = Field(default_factory=list) #Query, else DB
+    dietary_preferences: Optional[List[str]] = Field(default_factory=list) # DB
+    special_needs: Optional[List[str]] = Field(default_factory=list) # DB
 
     # --- Budget & logistics ---
     transport_pref: Optional[str] = None    #DB           # e.g. "train", "flight"
@@ -45,7 +200,7 @@ class ItineraryPlannerContext(BaseModel):
     accommodation_type: Optional[str] = None    #DB  # e.g. "hotel", "hostel", "villa"
 
     # --- Activity and location ---
-    must_see: Optional[List[str]] = []        # must-visit sites
+    must_see: Optional[List[str]] = Field(default_factory=list)  # must-visit sites
     start_loc: Optional[str] = None           # starting point, e.g. "airport" or hotel name
     activity_type: Optional[str] = None       # e.g. "sightseeing", "adventure"
     preferred_vacation_type: Optional[str] = None  # e.g. "family", "romantic", "solo"
@@ -56,9 +211,7 @@ class ItineraryPlannerContext(BaseModel):
     special_notes: Optional[str] = None       # any custom notes / constraints
 
     #APIs POIs
-    # poi_candidates: Optional[Dict[str, List[Dict]]] = {} #Make this type later
-    
-    poi_candidates: Optional[List[Dict[str, Any]]] = {}
+    poi_candidates: Optional[List[POIRecord]] = Field(default_factory=list)
 
 # must_see,activity_type,interests,travel_duration,pace,city
 
@@ -68,10 +221,7 @@ class ReviewSummarizerContext(BaseContext):
     timeframe: Optional[str] = "all_time"
     sentiment_focus: Optional[str] = "overall"
 
-from typing import List, Optional, Dict
-from pydantic import BaseModel, Field
-
-class MeetingPointContext(BaseModel):
+class MeetingPointContext(ContextModel):
     """
     Context model for planning a meeting point between multiple participants.
     Stores participant locations, preferences, constraints, and other metadata.
@@ -112,12 +262,12 @@ class MeetingPointContext(BaseModel):
 class RouteOptimizerContext(BaseContext):
     origin: Dict  # {lat, lon, label?}
     destinations: List[Dict]  # [{lat, lon, label?}, ...]
-    constraints: Optional[Dict] = {}
+    constraints: Optional[Dict] = Field(default_factory=dict)
 
 class TripJournalContext(BaseContext):
     user_id: Optional[str]
     trip_id: Optional[str]
     start_date: Optional[str]
     end_date: Optional[str]
-    tags: Optional[List[str]] = []
+    tags: Optional[List[str]] = Field(default_factory=list)
 
@@ -0,0 +1,103 @@
+"""
+Small persistent key-value cache with per-entry TTL.
+
+Values are stored as JSON in a local SQLite file so they survive restarts, with
+an in-memory copy in front so repeated hits do not touch the disk. Safe to share
+between threads.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+DEFAULT_CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+
+_MISSING = object()
+
+
+class PersistentTTLCache:
+    """
+    Args:
+        namespace: Table name, one per kind of cached data (e.g. "geocode").
+        ttl_seconds: How long an entry stays fresh.
+        path: SQLite file, defaults to <CACHE_DIR>/<namespace>.sqlite3. Use ":memory:" for a
+            process-local cache.
+    """
+
+    def __init__(self, namespace: str, ttl_seconds: float, path: Optional[str] = None):
+        if not namespace.isidentifier():
+            raise ValueError(f"Invalid cache namespace: {namespace}")
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, f"{namespace}.sqlite3")
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._memory: dict = {}
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {namespace} (key TEXT PRIMARY KEY, value TEXT, stored_at REAL)"
+            )
+            self._conn.commit()
+
+    def _entry(self, key: str):
+        with self._lock:
+            entry = self._memory.get(key, _MISSING)
+            if entry is _MISSING:
+                row = self._conn.execute(
+                    f"SELECT value, stored_at FROM {self.namespace} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                entry = (json.loads(row[0]), row[1])
+                self._memory[key] = entry
+        return entry
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Fresh value for `key`, or `default` if missing or expired."""
+        entry = self._entry(key)
+        if entry is None or time.time() - entry[1] > self.ttl_seconds:
+            return default
+        return entry[0]
+
+    def get_stale(self, key: str, default: Any = None) -> Any:
+        """Value for `key` even if expired (until purged), or `default` if missing."""
+        entry = self._entry(key)
+        return default if entry is None else entry[0]
+
+    def age(self, key: str) -> Optional[float]:
+        """Seconds since `key` was stored, or None if it is not stored (expired entries still count)."""
+        with self._lock:
+            entry = self._memory.get(key, _MISSING)
+            if entry is not _MISSING:
+                return time.time() - entry[1]
+            row = self._conn.execute(f"SELECT stored_at FROM {self.namespace} WHERE key = ?", (key,)).fetchone()
+        return None if row is None else time.time() - row[0]
+
+    def set(self, key: str, value: Any):
+        """Store a JSON-serializable value."""
+        stored_at = time.time()
+        with self._lock:
+            self._memory[key] = (value, stored_at)
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.namespace} (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), stored_at),
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """Delete expired entries. Returns the number removed."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            self._memory = {k: v for k, v in self._memory.items() if v[1] >= cutoff}
+            removed = self._conn.execute(f"DELETE FROM {self.namespace} WHERE stored_at < ?", (cutoff,)).rowcount
+            self._conn.commit()
+        return removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.namespace}").fetchone()[0]
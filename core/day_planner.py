@@ -0,0 +1,202 @@
+"""
+Deterministic day-wise pre-planner for the ItineraryPlanner task.
+
+Splits POI candidates into one geographic group per travel day with a
+capacity-constrained k-means (each day holds at most `poi_per_day` stops),
+orders the stops inside each day with the route optimizer and attaches
+estimated leg times. The final LLM call then only has to narrate the plan
+instead of working out days and travel order from raw POIs.
+"""
+import math
+from typing import List, Dict, Optional, Tuple, Any, Callable
+
+from core.route_optimizer import RouteOptimizer, build_time_matrix
+
+KMEANS_MAX_ITER = 50
+
+# Reviews are cut to this many characters when POIs are rendered for a prompt.
+REVIEW_CHARS = 160
+
+# Local equirectangular projection, good enough at city scale.
+KM_PER_DEG_LAT = 110.57
+
+
+def poi_coords(poi: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    """(lat, lon) of a POI dict as produced by steps.extract_data_from_api_response."""
+    location = poi.get("location") or {}
+    lat, lon = location.get("latitude"), location.get("longitude")
+    if lat is None or lon is None:
+        return None
+    return float(lat), float(lon)
+
+
+def _project(points: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    lat0 = sum(p[0] for p in points) / len(points)
+    km_per_deg_lon = 111.32 * math.cos(math.radians(lat0))
+    return [(lon * km_per_deg_lon, lat * KM_PER_DEG_LAT) for lat, lon in points]
+
+
+def _sq_dist(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2
+
+
+def _farthest_point_init(xy: List[Tuple[float, float]], k: int, anchor: Tuple[float, float]) -> List[Tuple[float, float]]:
+    """Deterministic k-means++ style seeding: start nearest the anchor, then keep adding the farthest point."""
+    first = min(range(len(xy)), key=lambda i: (_sq_dist(xy[i], anchor), i))
+    centres = [xy[first]]
+    nearest = [_sq_dist(p, centres[0]) for p in xy]
+    while len(centres) < k:
+        idx = max(range(len(xy)), key=lambda i: (nearest[i], -i))
+        centres.append(xy[idx])
+        nearest = [min(d, _sq_dist(p, xy[idx])) for d, p in zip(nearest, xy)]
+    return centres
+
+
+def _assign_with_capacity(xy: List[Tuple[float, float]], centres: List[Tuple[float, float]], capacity: int) -> List[int]:
+    """
+    Greedy capacity-constrained assignment. Points with the most to lose from not
+    getting their nearest centre (largest regret) pick first.
+    """
+    k = len(centres)
+    dists = [[_sq_dist(p, c) for c in centres] for p in xy]
+    prefs = [sorted(range(k), key=lambda c, row=row: (row[c], c)) for row in dists]
+
+    def regret(i: int) -> float:
+        row, pref = dists[i], prefs[i]
+        return row[pref[1]] - row[pref[0]] if k > 1 else 0.0
+
+    load = [0] * k
+    labels = [-1] * len(xy)
+    for i in sorted(range(len(xy)), key=lambda i: (-regret(i), i)):
+        for c in prefs[i]:
+            if load[c] < capacity:
+                labels[i] = c
+                load[c] += 1
+                break
+    return labels
+
+
+def cluster_by_day(points: List[Tuple[float, float]], days: int, capacity: int,
+                   anchor: Optional[Tuple[float, float]] = None) -> List[List[int]]:
+    """
+    Group (lat, lon) points into at most `days` clusters of at most `capacity` points.
+
+    Returns:
+        List of clusters, each a list of indices into `points`. Empty clusters are dropped.
+    """
+    if not points:
+        return []
+    k = max(1, min(days, len(points)))
+    xy = _project(points + ([anchor] if anchor else []))
+    anchor_xy = xy.pop() if anchor else xy[0]
+
+    centres = _farthest_point_init(xy, k, anchor_xy)
+    labels: List[int] = []
+    for _ in range(KMEANS_MAX_ITER):
+        new_labels = _assign_with_capacity(xy, centres, capacity)
+        if new_labels == labels:
+            break
+        labels = new_labels
+        for c in range(k):
+            members = [xy[i] for i, label in enumerate(labels) if label == c]
+            if members:
+                centres[c] = (sum(m[0] for m in members) / len(members), sum(m[1] for m in members) / len(members))
+
+    clusters = [[i for i, label in enumerate(labels) if label == c] for c in range(k)]
+    clusters = [c for c in clusters if c]
+    # Visit the day closest to the start first
+    clusters.sort(key=lambda c: min(_sq_dist(xy[i], anchor_xy) for i in c))
+    return clusters
+
+
+def _order_day(points: List[Tuple[float, float]], start: Optional[Tuple[float, float]],
+               travel_mode: str) -> Tuple[List[int], List[float]]:
+    """
+    Order one day's stops with the route optimizer.
+
+    Returns:
+        (order, legs): indices into `points` and minutes travelled to reach each stop.
+        Without a start the first stop has a 0 minute leg.
+    """
+    if start is not None:
+        matrix = build_time_matrix([start] + points, travel_mode)
+        order = [node - 1 for node in RouteOptimizer(matrix).solve(max_seconds=0.2)]
+        nodes = [0] + [i + 1 for i in order]
+        return order, [matrix[a][b] for a, b in zip(nodes, nodes[1:])]
+
+    # No fixed start: try every stop as the first one and keep the shortest path.
+    matrix = build_time_matrix(points, travel_mode)
+    best: Optional[Tuple[float, List[int]]] = None
+    for first in range(len(points)):
+        rest = [i for i in range(len(points)) if i != first]
+        sub = [[matrix[a][b] for b in [first] + rest] for a in [first] + rest]
+        optimizer = RouteOptimizer(sub)
+        sub_order = optimizer.solve(max_seconds=0.05)
+        cost = optimizer.route_cost(sub_order)
+        if best is None or cost < best[0]:
+            best = (cost, [first] + [rest[node - 1] for node in sub_order])
+    order = best[1]
+    return order, [0.0] + [matrix[a][b] for a, b in zip(order, order[1:])]
+
+
+def plan_days(pois: List[Dict[str, Any]], days: int, poi_per_day: int,
+              start: Optional[Tuple[float, float]] = None, travel_mode: str = "DRIVE") -> List[Dict[str, Any]]:
+    """
+    Build a day-wise plan from POI candidates.
+
+    Args:
+        pois: POI dicts in priority order, the first days * poi_per_day with coordinates are kept.
+        days: Number of travel days.
+        poi_per_day: Maximum stops per day, from the trip pace.
+        start: Optional (lat, lon) every day starts from, e.g. the hotel.
+        travel_mode: Routes API travel mode used for leg time estimates.
+
+    Returns:
+        List of {"day", "stops", "total_travel_minutes"} dicts where every stop is
+        the POI dict plus a "travel_minutes" estimate from the previous stop.
+    """
+    days = max(1, int(days or 1))
+    limit = days * poi_per_day
+    kept, points = [], []
+    for poi in pois:
+        coords = poi_coords(poi)
+        if coords is None:
+            continue
+        kept.append(poi)
+        points.append(coords)
+        if len(kept) >= limit:
+            break
+
+    plan = []
+    for day, cluster in enumerate(cluster_by_day(points, days, poi_per_day, anchor=start), start=1):
+        order, legs = _order_day([points[i] for i in cluster], start, travel_mode)
+        stops = [dict(kept[cluster[i]], travel_minutes=round(leg)) for i, leg in zip(order, legs)]
+        plan.append({"day": day, "stops": stops, "total_travel_minutes": round(sum(legs))})
+    return plan
+
+
+def format_day_plan(plan: List[Dict[str, Any]], start_label: Optional[str] = None,
+                    address: Callable[[str], str] = str) -> str:
+    """
+    Plain text rendering of plan_days output for the narration prompt.
+
+    Args:
+        address: Renders a stop's address, e.g. core.prompt_format.short_address.
+    """
+    lines = []
+    for day in plan:
+        lines.append(f"Day {day['day']} (~{day['total_travel_minutes']} min travel):")
+        previous = start_label
+        for count, stop in enumerate(day["stops"], start=1):
+            leg = f"~{stop['travel_minutes']} min from {previous}" if previous else "first stop"
+            lines.append(f"  {count}. {stop.get('name')} | {address(stop.get('address') or '')} | rating {stop.get('rating')} | {leg}")
+            previous = stop.get("name")
+    return "\n".join(lines)
+
+
+def format_poi_line(poi: Dict[str, Any]) -> str:
+    """One-line rendering of a POI for prompts, with the review shortened to REVIEW_CHARS."""
+    review = (poi.get("review") or "").replace("\n", " ")
+    if len(review) > REVIEW_CHARS:
+        review = review[:REVIEW_CHARS].rsplit(" ", 1)[0] + "..."
+    return f"- {poi.get('name')} | {poi.get('address')} | rating {poi.get('rating')} | {review}"
@@ -0,0 +1,161 @@
+"""
+Per-request time budgets.
+
+A request runs inside `with deadline(seconds):`. The deadline lives in a context var,
+so it follows the request into flow steps (which copy the context onto their worker
+threads) and every stage can ask how much time is left:
+
+    with deadline(60) as budget:
+        ...
+        if running_low(30):
+            degrade("stale_places", "served expired Places results")
+        requests.post(url, timeout=request_timeout(10))
+
+Stages that cut corners to finish in time record it with degrade(); the list ends up
+on budget.degradations and on the current trace span, so the response can say which
+shortcuts were taken. Nested deadlines only ever shrink the budget, and their
+degradations are passed up to the enclosing one.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from core.tracing import current_span
+
+# Final LLM call under a deadline: below these many seconds left, the call degrades
+REASONING_MIN_S = 45        # answer without reasoning
+FAST_MODEL_MIN_S = 20       # also switch to the fast model
+TOKENS_PER_S = 30           # conservative generation speed, to cap max_tokens to what fits
+MIN_MAX_TOKENS = 512
+TYPICAL_ANSWER_TOKENS = 2000  # a cap above this does not shorten a normal answer, so is not reported
+
+# What each degradation means for the user, for the note on degraded answers
+DEGRADATION_NOTES = {
+    "skipped_poi_queries": "searched fewer places",
+    "stale_places": "used older place data",
+    "reasoning_off": "answered without extended reasoning",
+    "fast_model": "used a faster model",
+    "max_tokens_capped": "kept the answer short",
+}
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a stage cannot start because the request's time is up."""
+
+
+class Budget:
+    __slots__ = ("expires_at", "degradations")
+
+    def __init__(self, expires_at: Optional[float]):
+        self.expires_at = expires_at    # time.monotonic() value, None for no deadline
+        self.degradations: List[str] = []
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.monotonic()
+
+    def record(self, name: str):
+        if name not in self.degradations:
+            self.degradations.append(name)
+
+
+_budget: contextvars.ContextVar = contextvars.ContextVar("request_budget", default=None)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """
+    Run the block with `seconds` to finish (None: no new limit, but degradations are still collected).
+    Yields the Budget.
+    """
+    parent = _budget.get()
+    expires_at = None if seconds is None else time.monotonic() + seconds
+    if parent is not None and parent.expires_at is not None:
+        expires_at = parent.expires_at if expires_at is None else min(expires_at, parent.expires_at)
+    budget = Budget(expires_at)
+    token = _budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _budget.reset(token)
+        if parent is not None:
+            for name in budget.degradations:
+                parent.record(name)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current request, None if it has no deadline."""
+    budget = _budget.get()
+    return None if budget is None else budget.remaining()
+
+
+def running_low(reserve_s: float) -> bool:
+    """True if the request has a deadline and less than reserve_s seconds left."""
+    left = remaining()
+    return left is not None and left < reserve_s
+
+
+def check(stage: str):
+    """Raise DeadlineExceeded if the request's time is already up."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"Deadline passed before {stage}")
+
+
+def request_timeout(default: Optional[float] = None) -> Optional[float]:
+    """Timeout for one upstream call: the default, cut down to the time left (at least 1s)."""
+    left = remaining()
+    if left is None:
+        return default
+    left = max(left, 1.0)
+    return left if default is None else min(default, left)
+
+
+def degrade(name: str, detail: str = ""):
+    """Record that the current request took a shortcut to stay within its deadline."""
+    budget = _budget.get()
+    if budget is None:
+        return
+    budget.record(name)
+    current_span().set_attribute("degraded", ",".join(budget.degradations))
+    print(f"[Deadline] Degraded: {name}" + (f" ({detail})" if detail else ""))
+
+
+def degradations() -> List[str]:
+    budget = _budget.get()
+    return [] if budget is None else list(budget.degradations)
+
+
+def describe(names: List[str]) -> str:
+    """One-line note for a degraded answer."""
+    notes = [DEGRADATION_NOTES.get(name, name) for name in names]
+    return "To answer in time, this response " + ", ".join(notes) + "."
+
+
+def fit_llm_call(model: str, fast_model: str, max_tokens: int, thinking: bool = True) -> Dict[str, Any]:
+    """
+    Settings for an LLM call that should finish within the time left: reasoning off
+    below REASONING_MIN_S, fast_model below FAST_MODEL_MIN_S, and max_tokens capped to
+    what TOKENS_PER_S can generate. Records the degradations it applies.
+
+    Returns:
+        {"model", "max_tokens", "thinking"}
+    """
+    left = remaining()
+    settings = {"model": model, "max_tokens": max_tokens, "thinking": thinking}
+    if left is None:
+        return settings
+    if thinking and left < REASONING_MIN_S:
+        settings["thinking"] = False
+        degrade("reasoning_off", f"{left:.0f}s left")
+    if fast_model != model and left < FAST_MODEL_MIN_S:
+        settings["model"] = fast_model
+        degrade("fast_model", fast_model)
+    fits = max(MIN_MAX_TOKENS, int(left * TOKENS_PER_S))
+    if fits < max_tokens:
+        settings["max_tokens"] = fits
+        if fits < TYPICAL_ANSWER_TOKENS:
+            degrade("max_tokens_capped", f"{fits} tokens")
+    return settings
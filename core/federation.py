@@ -1,6 +1,5 @@
 # Orchestrator 
 # This has class with Flow Fetching
-# NOT IN USE
 """
 Base class to make generic federator which can call different APIs based on context and query type.
 
@@ -30,114 +29,484 @@ Execution is about “doing”: actually invoking each step, handling outputs, r
 Lastly make a user k liye output from the final context.
 """
 
-from typing import List, Any, Dict, Callable, Optional
+from typing import List, Any, Dict, Callable, Optional, Set, Union
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+import contextvars
+import hashlib
 import inspect
+import json
+import threading
+import time
+
+from core.tracing import span
+from core.deadline import request_timeout
+
+DEFAULT_STEP_TIMEOUT = 60.0
+DEFAULT_MAX_WORKERS = 8
+
+
+class StepFailedError(RuntimeError):
+    """A flow step raised or timed out. Downstream steps were not started."""
+
+    def __init__(self, step_name: str, cause: BaseException):
+        super().__init__(f"Step '{step_name}' failed: {cause!r}")
+        self.step_name = step_name
+        self.cause = cause
+
+
+@dataclass
+class StepSpec:
+    """
+    Declarative description of one flow step.
+
+    reads: context fields / intermediate results the step needs.
+    writes: names the step produces. With one write the whole return value is stored
+        under it, with several the step must return a dict keyed by them.
+    declared: False for legacy string steps, which run strictly after everything
+        before them and before everything after them.
+    """
+    name: str
+    reads: Set[str] = field(default_factory=set)
+    writes: List[str] = field(default_factory=list)
+    timeout: Optional[float] = None
+    declared: bool = True
+
+    @classmethod
+    def from_flow_entry(cls, entry: Union[str, Dict[str, Any]]) -> "StepSpec":
+        if isinstance(entry, str):
+            return cls(name=entry, declared=False)
+        return cls(
+            name=entry["step"],
+            reads=set(entry.get("reads", [])),
+            writes=list(entry.get("writes", [])),
+            timeout=entry.get("timeout"),
+        )
+
+
+def build_dependencies(specs: List[StepSpec]) -> List[Set[int]]:
+    """
+    For every step, indices of earlier steps it must wait for: it reads something they
+    write, writes something they read or write, or either side is undeclared.
+    """
+    deps: List[Set[int]] = []
+    for j, later in enumerate(specs):
+        needs = set()
+        for i in range(j):
+            earlier = specs[i]
+            if not (earlier.declared and later.declared):
+                needs.add(i)
+            elif later.reads & set(earlier.writes) or set(later.writes) & (earlier.reads | set(earlier.writes)):
+                needs.add(i)
+        deps.append(needs)
+    return deps
+
+
+class FlowValidationError(ValueError):
+    """A flow cannot run: unknown steps or inputs nothing provides."""
+
+    def __init__(self, selected_task: str, problems: List[str]):
+        super().__init__(f"Invalid flow for '{selected_task}':\n  " + "\n  ".join(problems))
+        self.problems = problems
+
+
+# Where a step argument comes from, decided once when the flow is compiled
+ARG_CONTEXT, ARG_USER_QUERY, ARG_CANCEL, ARG_STATE, ARG_FIELD, ARG_DEFAULT = range(6)
+_SPECIAL_ARGS = {"context": ARG_CONTEXT, "user_query": ARG_USER_QUERY, "cancel_event": ARG_CANCEL}
+
+
+@dataclass(frozen=True)
+class CompiledStep:
+    """
+    A step with its argument binding and result merge plan precomputed.
+
+    args: (parameter name, ARG_* source, default) per parameter.
+    merge: (write name, True if it is a context field) per declared write.
+    """
+    spec: StepSpec
+    func: Callable
+    args: tuple
+    merge: tuple
+
+
+@dataclass(frozen=True)
+class CompiledFlow:
+    steps: tuple
+    deps: tuple
+
+
+def _fingerprint_default(value: Any) -> Any:
+    # Values that know their identity (context.POIRecord: the place id) are keyed on it
+    cache_key = getattr(value, "cache_key", None)
+    return cache_key() if callable(cache_key) else str(value)
+
+
+# Compiled flows are reused across requests, keyed by flow shape, step functions and context type
+_COMPILED_FLOWS: Dict[tuple, CompiledFlow] = {}
+
+
+def _context_fields(context: Any) -> Set[str]:
+    model_fields = getattr(type(context), "model_fields", None)
+    if model_fields is not None:
+        return set(model_fields)
+    return {name for name in dir(context) if not name.startswith("_")}
+
+
+def compile_flow(selected_task: str, specs: List[StepSpec], registry: Dict[str, Callable], context: Any) -> CompiledFlow:
+    """
+    Resolve every step's function, arguments and writes once, and check the flow can run.
+
+    Raises:
+        FlowValidationError: Unknown steps, or declared steps whose inputs nothing provides
+            (a parameter, or a name in reads that is neither a context field nor written
+            by an earlier step) or that read another step's output without depending on it.
+    """
+    cacheable = hasattr(type(context), "model_fields")
+    key = (
+        selected_task,
+        tuple((spec.name, frozenset(spec.reads), tuple(spec.writes), spec.timeout, spec.declared) for spec in specs),
+        tuple(registry.get(spec.name) for spec in specs),
+        type(context),
+    )
+    if cacheable and key in _COMPILED_FLOWS:
+        return _COMPILED_FLOWS[key]
+
+    fields = _context_fields(context)
+    deps = build_dependencies(specs)
+    ancestors: List[Set[int]] = []
+    for direct in deps:
+        closure = set(direct)
+        for i in direct:
+            closure |= ancestors[i]
+        ancestors.append(closure)
+
+    problems: List[str] = []
+    compiled = []
+    for index, spec in enumerate(specs):
+        func = registry.get(spec.name)
+        if func is None:
+            problems.append(f"step '{spec.name}' is not registered")
+            continue
+
+        writers = {name: i for i, other in enumerate(specs[:index]) for name in other.writes}
+        for name in sorted(spec.reads - fields - writers.keys()):
+            problems.append(f"step '{spec.name}' reads '{name}' but no context field or earlier step provides it")
+        args = []
+        for name, param in inspect.signature(func).parameters.items():
+            default = None if param.default is inspect.Parameter.empty else param.default
+            if name in _SPECIAL_ARGS:
+                args.append((name, _SPECIAL_ARGS[name], None))
+                continue
+            if name in fields:
+                source = ARG_FIELD
+            elif name in writers:
+                source = ARG_STATE
+            elif not spec.declared:
+                # Legacy steps read anything an earlier legacy step returned in a dict
+                # (or their default / None), as before compilation
+                args.append((name, ARG_STATE, default))
+                continue
+            elif param.default is not inspect.Parameter.empty:
+                args.append((name, ARG_DEFAULT, default))
+                continue
+            else:
+                problems.append(f"step '{spec.name}' needs '{name}' but no context field or earlier step provides it")
+                continue
+            if spec.declared and name in writers and writers[name] not in ancestors[index]:
+                problems.append(
+                    f"step '{spec.name}' uses '{name}' from step '{specs[writers[name]].name}' but does not declare it in reads"
+                )
+            args.append((name, source, default))
+
+        merge = tuple((name, name in fields) for name in spec.writes)
+        compiled.append(CompiledStep(spec=spec, func=func, args=tuple(args), merge=merge))
+
+    if problems:
+        raise FlowValidationError(selected_task, problems)
+
+    flow = CompiledFlow(steps=tuple(compiled), deps=tuple(deps))
+    if cacheable:
+        _COMPILED_FLOWS[key] = flow
+    return flow
+
 
 class Orchestrator:
     """
-    Generic Orchestrator to run a sequence of step functions for a selected task.
+    Generic Orchestrator to run the step functions of a selected task.
     It manages context, user query, and function inputs automatically.
+
+    Steps declare what they read and write (see flow.FLOW), independent steps run
+    concurrently on a thread pool, and a failed or timed out step stops everything
+    downstream of it. Python threads cannot be killed: a timed out step is only told to
+    stop through cancel_event (steps taking a `cancel_event` parameter should check it)
+    and otherwise keeps its worker thread until it returns on its own. Argument binding and result merging are compiled once per
+    flow shape (see compile_flow), not worked out again on every call.
+
+    Given a memo from an earlier run (e.g. the same session before a follow-up), declared
+    steps whose inputs are unchanged reuse their earlier result instead of running again.
     """
     
-    def __init__(self, selected_task: str, flow: List[str], context: Any, user_query: str):
+    def __init__(self, selected_task: str, flow: List[Union[str, Dict[str, Any]]], context: Any, user_query: str,
+                 max_workers: int = DEFAULT_MAX_WORKERS, default_timeout: float = DEFAULT_STEP_TIMEOUT,
+                 memo: Optional[Dict[str, tuple]] = None):
         """
         Args:
             selected_task: Name of the task (e.g., "ItineraryPlanner", "MeetingPointPlanner")
-            flow: List of step function names as strings
+            flow: List of step names, or step dicts {"step", "reads", "writes", "timeout"}
             context: Context object (e.g., Pydantic model or dict)
             user_query: Raw user input query
+            max_workers: Maximum steps running at the same time
+            default_timeout: Seconds a step may run when its spec sets no timeout
+            memo: {step name: (input fingerprint, result)} from an earlier run. When given
+                (even empty), results are fingerprinted and self.memo holds them afterwards.
         """
         self.selected_task = selected_task
         self.flow = flow
+        self.specs = [StepSpec.from_flow_entry(entry) for entry in flow]
         self.context = context
         self.user_query = user_query
-        
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+
+        # Intermediate results that are not context fields (e.g. user_profile, queries)
+        self.state: Dict[str, Any] = {}
+        # Set when the run is aborted, steps can accept a `cancel_event` parameter to stop early
+        self.cancel_event = threading.Event()
+
         # Mapping of function names to actual callables
         self.step_registry: Dict[str, Callable] = {}
+        self.compiled: Optional[CompiledFlow] = None
+
+        self.memoize = memo is not None
+        self.memo: Dict[str, tuple] = dict(memo or {})
+        # Steps answered from the memo in the last run
+        self.reused: List[str] = []
     
     def register_steps(self, step_functions: Dict[str, Callable]):
         """
-        Register available step functions for the orchestrator.
+        Register available step functions for the orchestrator and compile the flow against them.
         Args:
             step_functions: Dict mapping function name string -> callable
+
+        Raises:
+            FlowValidationError: If any step is unknown or misses an input.
         """
         self.step_registry.update(step_functions)
-    
-    def run(self):
+        self.compiled = compile_flow(self.selected_task, self.specs, self.step_registry, self.context)
+
+    def validate(self) -> CompiledFlow:
+        """
+        The compiled flow (compiled here if no steps were registered yet).
+
+        Raises:
+            FlowValidationError: If any step is unknown or misses an input.
+        """
+        if self.compiled is None:
+            self.compiled = compile_flow(self.selected_task, self.specs, self.step_registry, self.context)
+        return self.compiled
+
+    def _bind_kwargs(self, step: CompiledStep) -> Dict[str, Any]:
+        context, state = self.context, self.state
+        kwargs = {}
+        for name, source, default in step.args:
+            if source == ARG_FIELD:
+                kwargs[name] = getattr(context, name)
+            elif source == ARG_STATE:
+                kwargs[name] = state.get(name, default)
+            elif source == ARG_CONTEXT:
+                kwargs[name] = context
+            elif source == ARG_USER_QUERY:
+                kwargs[name] = self.user_query
+            elif source == ARG_CANCEL:
+                kwargs[name] = self.cancel_event
+            else:
+                kwargs[name] = default
+        return kwargs
+
+    def _bind(self, step: CompiledStep, kwargs: Optional[Dict[str, Any]] = None) -> Callable[[], Any]:
+        kwargs = self._bind_kwargs(step) if kwargs is None else kwargs
+        func, name = step.func, step.spec.name
+
+        def call():
+            with span(f"step.{name}"):
+                return func(**kwargs)
+        return call
+
+    def _fingerprint(self, step: CompiledStep, kwargs: Dict[str, Any]) -> Optional[str]:
         """
-        Execute each step in the flow sequentially.
-        Automatically passes required arguments from context or user_query.
+        Hash of everything a declared step gets as input, or None if it cannot be memoized.
+        A step taking the whole context is keyed on all of it except fields other steps write.
         """
-        for step_name in self.flow:
-            if step_name not in self.step_registry:
-                raise ValueError(f"Step function '{step_name}' not registered.")
-            
-            func = self.step_registry[step_name]
-            # Inspect function signature
-            sig = inspect.signature(func)
-            kwargs = {}
-            
-            for name, param in sig.parameters.items():
-                # Determine what to pass to each parameter
-                if name == "context":
-                    kwargs[name] = self.context
-                elif name == "user_query":
-                    kwargs[name] = self.user_query
-                elif hasattr(self.context, name):
-                    kwargs[name] = getattr(self.context, name)
+        if not step.spec.declared:
+            return None
+        inputs = {}
+        for name, source, _ in step.args:
+            if source == ARG_CANCEL:
+                continue
+            if source == ARG_CONTEXT:
+                if not hasattr(self.context, "model_dump"):
+                    return None
+                others = {w for other in self.compiled.steps if other is not step for w in other.spec.writes}
+                # fast_dump (context.ContextModel) skips model_dump's copy of every POI
+                dump = getattr(self.context, "fast_dump", self.context.model_dump)
+                inputs[name] = dump(exclude=others)
+            else:
+                inputs[name] = kwargs[name]
+        try:
+            encoded = json.dumps([step.spec.name, inputs], sort_keys=True, default=_fingerprint_default)
+        except (TypeError, ValueError):
+            return None
+        return hashlib.sha1(encoded.encode()).hexdigest()
+
+    def _store(self, name: str, value: Any):
+        if hasattr(self.context, name):
+            setattr(self.context, name, value)
+        else:
+            self.state[name] = value
+
+    def _merge(self, step: CompiledStep, result: Any):
+        spec = step.spec
+        if spec.declared:
+            if len(step.merge) == 1:
+                name, to_context = step.merge[0]
+                if to_context:
+                    setattr(self.context, name, result)
                 else:
-                    # If parameter not found, pass None or rely on function default
-                    kwargs[name] = None
-            
-            # Call the function and capture return if it modifies context
-            result = func(**kwargs)
-            
-            # If function returns a dict or Pydantic model, merge/update context
-            if result is not None:
-                if isinstance(result, dict):
-                    for k, v in result.items():
-                        setattr(self.context, k, v)
-                elif hasattr(result, "__dict__"):  # Pydantic or object
-                    for k, v in result.__dict__.items():
-                        setattr(self.context, k, v)
-        
+                    self.state[name] = result
+            elif step.merge:
+                if not isinstance(result, dict):
+                    raise TypeError(f"Step '{spec.name}' declares {spec.writes} but returned {type(result).__name__}.")
+                for name, to_context in step.merge:
+                    if name in result:
+                        if to_context:
+                            setattr(self.context, name, result[name])
+                        else:
+                            self.state[name] = result[name]
+            return
+
+        # Legacy steps: if function returns a dict or Pydantic model, merge/update context
+        if result is None or result is self.context:
+            return
+        if isinstance(result, dict):
+            for k, v in result.items():
+                self._store(k, v)
+        elif hasattr(type(result), "model_fields"):  # Pydantic, only declared fields
+            for k in type(result).model_fields:
+                setattr(self.context, k, getattr(result, k))
+        elif hasattr(result, "__dict__"):
+            for k, v in vars(result).items():
+                setattr(self.context, k, v)
+
+    def run(self):
+        """
+        Execute the flow, starting every step as soon as the steps it depends on are done.
+
+        Raises:
+            StepFailedError: A step raised or exceeded its timeout.
+        """
+        compiled = self.validate()
+        steps, deps = compiled.steps, compiled.deps
+        pending = set(range(len(steps)))
+        done: Set[int] = set()
+        running: Dict[Future, tuple] = {}
+        fingerprints: Dict[int, Optional[str]] = {}
+        self.reused = []
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"flow-{self.selected_task}")
+        try:
+            while pending or running:
+                for index in sorted(pending):
+                    if deps[index] <= done:
+                        step = steps[index]
+                        pending.discard(index)
+                        kwargs = self._bind_kwargs(step)
+                        if self.memoize:
+                            fingerprint = fingerprints[index] = self._fingerprint(step, kwargs)
+                            previous = self.memo.get(step.spec.name)
+                            if fingerprint is not None and previous is not None and previous[0] == fingerprint:
+                                self._merge(step, previous[1])
+                                done.add(index)
+                                self.reused.append(step.spec.name)
+                                print(f"[Orchestrator] Step '{step.spec.name}' unchanged, reusing earlier result.")
+                                continue
+                        # No step may outlive the request's deadline
+                        timeout = request_timeout(step.spec.timeout or self.default_timeout)
+                        print(f"[Orchestrator] Starting step '{step.spec.name}'.")
+                        # copy_context carries the current trace (and other context vars) into the worker
+                        call = self._bind(step, kwargs)
+                        running[pool.submit(contextvars.copy_context().run, call)] = (index, time.monotonic() + timeout, timeout)
+
+                if not running:
+                    continue
+                next_deadline = min(deadline for _, deadline, _ in running.values())
+                finished, _ = wait(running, timeout=max(0.0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+
+                if not finished:
+                    # wait() may return a little before the deadline: the first step due is the one that timed out
+                    index, _, timeout = min(running.values(), key=lambda entry: entry[1])
+                    # Raising sets cancel_event below; the step's thread is left to finish on its own
+                    raise StepFailedError(self.specs[index].name, TimeoutError(f"timed out after {timeout:.1f}s"))
+
+                for future in finished:
+                    index, _, _ = running.pop(future)
+                    step = steps[index]
+                    spec = step.spec
+                    error = future.exception()
+                    if error is not None:
+                        raise StepFailedError(spec.name, error) from error
+                    result = future.result()
+                    self._merge(step, result)
+                    if fingerprints.get(index) is not None:
+                        self.memo[spec.name] = (fingerprints[index], result)
+                    done.add(index)
+                    print(f"[Orchestrator] Step '{spec.name}' done.")
+        except BaseException:
+            # Stop downstream work: nothing new starts, queued steps are dropped
+            self.cancel_event.set()
+            for future in running:
+                future.cancel()
+            raise
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
         return self.context
 
-# Example usage with dummy step functions and context
-from orch import Orchestrator
-from context import MeetingPointContext
-
-# Define step functions
-def extract_meeting_query_context(user_query: str, context):
-    # Populate some fields in context from query
-    context.participants = [{"label": "Me", "address": "Govindpuri, Delhi"}]
-    context.cuisine_type = ["Italian"]
-    return context
-
-def geocode_participant_addresses(context):
-    # Simulate geocoding
-    for p in context.participants:
-        p["lat"], p["lon"] = 28.527, 77.267
-    return context
-
-def generate_candidate_venues(context):
-    # Simulate venue generation
-    context.venues = [{"name": "Italian Bistro", "lat": 28.530, "lon": 77.270}]
-    return context
-
-# Setup orchestrator
-context = MeetingPointContext()
-flow = [
-    "extract_meeting_query_context",
-    "geocode_participant_addresses",
-    "generate_candidate_venues"
-]
-orchestrator = Orchestrator(selected_task="MeetingPointPlanner", flow=flow, context=context, user_query="Demo query")
-orchestrator.register_steps({
-    "extract_meeting_query_context": extract_meeting_query_context,
-    "geocode_participant_addresses": geocode_participant_addresses,
-    "generate_candidate_venues": generate_candidate_venues
-})
-
-final_context = orchestrator.run()
-print(final_context)
+
+if __name__ == "__main__":
+    # Example usage with dummy step functions and context
+    from context import MeetingPointContext
+
+    # Define step functions
+    def extract_meeting_query_context(user_query: str, context):
+        # Populate some fields in context from query
+        context.participants = [{"label": "Me", "address": "Govindpuri, Delhi"}]
+        context.cuisine_type = ["Italian"]
+        return context
+
+    def geocode_participant_addresses(participants):
+        # Simulate geocoding
+        for p in participants:
+            p["lat"], p["lon"] = 28.527, 77.267
+        return participants
+
+    def generate_candidate_venues(cuisine_type):
+        # Simulate venue generation
+        return [{"name": f"{cuisine_type[0]} Bistro", "lat": 28.530, "lon": 77.270}]
+
+    # Setup orchestrator
+    context = MeetingPointContext()
+    flow = [
+        "extract_meeting_query_context",
+        {"step": "geocode_participant_addresses", "reads": ["participants"], "writes": ["participants"]},
+        {"step": "generate_candidate_venues", "reads": ["cuisine_type"], "writes": ["venues"]},
+    ]
+    orchestrator = Orchestrator(selected_task="MeetingPointPlanner", flow=flow, context=context, user_query="Demo query")
+    orchestrator.register_steps({
+        "extract_meeting_query_context": extract_meeting_query_context,
+        "geocode_participant_addresses": geocode_participant_addresses,
+        "generate_candidate_venues": generate_candidate_venues
+    })
+
+    final_context = orchestrator.run()
+    print(final_context)
+    print(orchestrator.state)
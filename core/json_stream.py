@@ -0,0 +1,128 @@
+"""
+Incremental JSON extraction from streamed LLM output.
+
+Models asked for JSON often wrap it in prose or ``` fences, and keep generating after
+the object is closed. IncrementalJSONParser is fed the stream chunk by chunk, finds the
+first complete top-level JSON object, and reports it as soon as its closing brace
+arrives, so the caller can stop reading the stream there.
+
+While the object is still streaming, partial() returns what has fully arrived so far:
+members whose values are complete, with the open containers closed. With on_member set,
+it is called with partial() each time a top-level member completes (and with the whole
+object at the end), so a caller can act on early fields while the rest still streams.
+
+    parser = IncrementalJSONParser()
+    for piece in stream:
+        if parser.feed(piece):
+            break
+    data = parser.value
+"""
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class IncrementalJSONParser:
+    def __init__(self, on_member: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.on_member = on_member
+        self.text = ""
+        self.done = False
+        self.value: Any = None
+        self._scan = 0                  # next index of self.text to look at
+        self._start: Optional[int] = None
+        self._stack: List[str] = []     # open brackets of the current object
+        self._in_string = False
+        self._escape = False
+        # (end index, open brackets) of the longest prefix that is valid JSON once closed
+        self._safe: Optional[Tuple[int, Tuple[str, ...]]] = None
+
+    def feed(self, chunk: str) -> bool:
+        """Add streamed text. Returns True once a complete object has been parsed (see .value)."""
+        if self.done or not chunk:
+            return self.done
+        self.text += chunk
+        text = self.text
+        i = self._scan
+        while i < len(text) and not self.done:
+            ch = text[i]
+            if self._start is None:
+                if ch == "{":
+                    self._open(i)
+                i += 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in _CLOSERS:
+                self._stack.append(ch)
+                self._safe = (i + 1, tuple(self._stack))
+            elif ch in "}]":
+                self._stack.pop()
+                self._safe = (i + 1, tuple(self._stack))
+                if not self._stack and not self._finish(i + 1):
+                    # Braces in prose (e.g. "{city}") rather than the object: look again after it
+                    i = self._start + 1
+                    self._start = self._safe = None
+                    continue
+            elif ch == ",":
+                self._safe = (i, tuple(self._stack))
+                if self.on_member is not None and len(self._stack) == 1:
+                    self._member_done()
+            i += 1
+        self._scan = i
+        if self.done and self.on_member is not None:
+            self._member_done()
+        return self.done
+
+    def _member_done(self):
+        value = self.partial()
+        if isinstance(value, dict):
+            self.on_member(value)
+
+    def _open(self, index: int):
+        self._start = index
+        self._stack = ["{"]
+        self._in_string = self._escape = False
+        self._safe = (index + 1, ("{",))
+
+    def _finish(self, end: int) -> bool:
+        try:
+            self.value = json.loads(self.text[self._start:end])
+        except json.JSONDecodeError:
+            return False
+        self.done = True
+        return True
+
+    def partial(self) -> Optional[Any]:
+        """The object so far with only fully received members, or None before it starts."""
+        if self.done:
+            return self.value
+        if self._start is None or self._safe is None:
+            return None
+        end, stack = self._safe
+        prefix = self.text[self._start:end].rstrip()
+        closed = prefix + "".join(_CLOSERS[b] for b in reversed(stack))
+        try:
+            return json.loads(closed)
+        except json.JSONDecodeError:
+            return None
+
+
+def extract_json(text: str) -> Any:
+    """
+    The first JSON object in `text`.
+
+    Raises:
+        ValueError: If there is none.
+    """
+    parser = IncrementalJSONParser()
+    if not parser.feed(text):
+        raise ValueError(f"Cannot parse JSON from LLM response: {text[:500]}")
+    return parser.value
@@ -0,0 +1,76 @@
+"""
+Columnar view of a request's POI candidates for vectorized scoring.
+
+POIBatch keeps the context.POIRecord objects (or POI dicts) it was built from, plus
+NumPy columns for the values scoring computes on: coordinates, rating and review
+count. core.poi_scoring.POIScorer.score_batch works on whole columns instead of a
+Python loop per POI:
+
+    batch = POIBatch.from_pois(context.poi_candidates)
+    km = batch.distances_km(start)      # one array, NaN where a POI has no location
+"""
+from typing import Any, Iterable, Iterator, Mapping, Sequence, Tuple
+
+import numpy as np
+
+from context import POIRecord
+from core.route_optimizer import EARTH_RADIUS_KM
+
+
+def _row(poi: Mapping[str, Any]) -> Tuple[float, float, float, int]:
+    """(lat, lon, rating, rating_count) of a POI, NaN coordinates when it has no location."""
+    if isinstance(poi, POIRecord):
+        lat, lon, rating, count = poi.lat, poi.lon, poi.rating, poi.rating_count
+    else:
+        location = poi.get("location") or {}
+        lat, lon = location.get("latitude"), location.get("longitude")
+        rating, count = poi.get("rating"), poi.get("rating_count")
+    if lat is None or lon is None:
+        lat = lon = np.nan
+    return lat, lon, rating or 0.0, count or 0
+
+
+class POIBatch:
+    """
+    POIs column-wise. Built once per candidate list.
+
+    Attributes:
+        lat, lon: float64 arrays, NaN where a POI has no location.
+        rating: float64 array (0 when unrated).
+        rating_count: int64 array.
+    """
+
+    __slots__ = ("pois", "lat", "lon", "rating", "rating_count")
+
+    def __init__(self, pois: Sequence[Mapping[str, Any]], lat: np.ndarray, lon: np.ndarray, rating: np.ndarray,
+                 rating_count: np.ndarray):
+        self.pois = pois
+        self.lat = lat
+        self.lon = lon
+        self.rating = rating
+        self.rating_count = rating_count
+
+    @classmethod
+    def from_pois(cls, pois: Iterable[Mapping[str, Any]]) -> "POIBatch":
+        """From POIRecords or POI dicts (anything with the POI dict keys)."""
+        pois = list(pois)
+        numeric = np.array([_row(p) for p in pois], dtype=np.float64).reshape(-1, 4)
+        return cls(pois, numeric[:, 0], numeric[:, 1], numeric[:, 2], numeric[:, 3].astype(np.int64))
+
+    def __len__(self) -> int:
+        return len(self.pois)
+
+    def __iter__(self) -> Iterator[Mapping[str, Any]]:
+        return iter(self.pois)
+
+    def __getitem__(self, index: int) -> Mapping[str, Any]:
+        return self.pois[index]
+
+    def distances_km(self, origin: Tuple[float, float]) -> np.ndarray:
+        """Great-circle distance of every POI from origin (lat, lon), NaN where a POI has no location."""
+        phi1 = np.radians(origin[0])
+        phi2 = np.radians(self.lat)
+        dphi = phi2 - phi1
+        dlmb = np.radians(self.lon - origin[1])
+        a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlmb / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
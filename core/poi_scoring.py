@@ -0,0 +1,172 @@
+"""
+Candidate POI scoring and top-K pruning for the ItineraryPlanner task.
+
+get_places_for_queries can return dozens of POIs. They are ranked here by rating,
+review count, how well they match the user's interests and how far they are from
+the start, and only the best `top_k` are kept (must-see places always survive).
+Scores are computed for all candidates at once over a core.poi_batch.POIBatch, and
+selection uses a heap, so cost is O(n log k) instead of a full sort.
+
+The final prompt size is bounded explicitly with a token budget, since prompt
+length drives LLM latency and cost.
+"""
+import heapq
+import math
+import re
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple, Any, Callable, Iterable, Mapping
+
+import numpy as np
+
+from core.poi_batch import POIBatch
+
+DEFAULT_TOP_K = 24
+
+# Token budget for the POI part of the final prompt.
+POI_PROMPT_TOKEN_BUDGET = 2500
+
+# Rough chars per token for English text, good enough to budget prompts.
+CHARS_PER_TOKEN = 4
+
+WEIGHTS = {
+    "rating": 0.35,
+    "popularity": 0.25,
+    "interest": 0.25,
+    "distance": 0.15,
+}
+
+# Bayesian prior for ratings: a 5.0 from 3 reviews should not beat a 4.6 from 30k.
+RATING_PRIOR = 3.5
+RATING_PRIOR_WEIGHT = 50
+
+# Distance (km) at which the distance score halves.
+DISTANCE_HALF_KM = 5.0
+
+# Interest terms are matched on their first few letters, "history" matches "historical_landmark".
+STEM_LEN = 5
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for prompt budgeting."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _stems(texts: Iterable[str]) -> set:
+    return {w[:STEM_LEN] for t in texts if t for w in _WORD_RE.findall(t.lower()) if len(w) > 2}
+
+
+@lru_cache(maxsize=1024)
+def _type_stems(types: Tuple[str, ...]) -> frozenset:
+    # POIs share a handful of type lists (interned tuples, see context.intern_types)
+    return frozenset(_stems(t.replace("_", " ") for t in types))
+
+
+# Left out when comparing place names: "The City Palace" is "City Palace"
+_NAME_STOPWORDS = {"the", "of", "a", "an"}
+
+
+def _name_tokens(text: str) -> Tuple[str, ...]:
+    return tuple(w for w in _WORD_RE.findall(text.lower()) if w not in _NAME_STOPWORDS)
+
+
+def _contains(tokens: Tuple[str, ...], part: Tuple[str, ...]) -> bool:
+    return any(tokens[i:i + len(part)] == part for i in range(len(tokens) - len(part) + 1))
+
+
+def is_must_see(poi: Dict[str, Any], must_see: List[str]) -> bool:
+    """
+    True if the POI name matches one of the user's must-see places on whole words: the
+    must-see name appears in the POI name ("Amer Fort" in "Amer Fort Jaipur"). The other
+    way round ("Hawa Mahal" for "Hawa Mahal Palace") only counts for POI names of two or
+    more words, so a generic "Fort" or "Palace" is never pinned.
+    """
+    name = _name_tokens(poi.get("name") or "")
+    if not name:
+        return False
+    for m in must_see:
+        wanted = _name_tokens(m or "")
+        if wanted and (_contains(name, wanted) or (len(name) > 1 and _contains(wanted, name))):
+            return True
+    return False
+
+
+class POIScorer:
+    """
+    Scores POI dicts for one request.
+
+    Args:
+        interests: Interest strings from the context (e.g. ["history", "local cuisine"]).
+        origin: Optional (lat, lon) of the start location.
+        max_rating_count: Largest userRatingCount in the candidate set, used to normalise popularity.
+    """
+
+    def __init__(self, interests: List[str], origin: Optional[Tuple[float, float]] = None, max_rating_count: int = 0):
+        self.interest_stems = _stems(interests or [])
+        self.origin = origin
+        self.log_max_count = math.log1p(max_rating_count) or 1.0
+
+    def score_batch(self, batch: POIBatch) -> np.ndarray:
+        """
+        Score of every POI in the batch, computed column-wise: rating (shrunk towards
+        RATING_PRIOR for few reviews), popularity, interest matches and closeness to origin.
+        """
+        count = batch.rating_count.astype(np.float64)
+        adjusted = (batch.rating * count + RATING_PRIOR * RATING_PRIOR_WEIGHT) / (count + RATING_PRIOR_WEIGHT)
+
+        total = WEIGHTS["rating"] * adjusted / 5.0
+        total += WEIGHTS["popularity"] * np.log1p(count) / self.log_max_count
+
+        if self.interest_stems:
+            matches = np.array([self._interest_matches(poi) for poi in batch], dtype=np.float64)
+            total += WEIGHTS["interest"] * matches / len(self.interest_stems)
+
+        if self.origin:
+            km = batch.distances_km(self.origin)
+            total += np.where(np.isnan(km), 0.0, WEIGHTS["distance"] * DISTANCE_HALF_KM / (DISTANCE_HALF_KM + km))
+        return total
+
+    def _interest_matches(self, poi: Dict[str, Any]) -> int:
+        poi_stems = _stems([poi.get("name", "")]) | _type_stems(tuple(poi.get("types") or ()))
+        return len(self.interest_stems & poi_stems)
+
+
+def select_top_pois(pois: List[Dict[str, Any]], interests: List[str], must_see: List[str],
+                    origin: Optional[Tuple[float, float]] = None,
+                    top_k: int = DEFAULT_TOP_K) -> List[Tuple[Mapping[str, Any], float]]:
+    """
+    Keep the best `top_k` POIs, must-see places always included on top of that.
+
+    Returns:
+        (POI, score) pairs, must-see first, then by descending score. The POIs are the
+        ones passed in (POIRecords stay records), not copies.
+    """
+    batch = POIBatch.from_pois(pois)
+    scorer = POIScorer(interests, origin, int(batch.rating_count.max(initial=0)))
+    scores = scorer.score_batch(batch).tolist()
+    must, rest = [], []
+    for index, poi in enumerate(batch):
+        entry = (scores[index], -index, poi)
+        (must if is_must_see(poi, must_see or []) else rest).append(entry)
+
+    must.sort(key=lambda e: (e[0], e[1]), reverse=True)
+    best = heapq.nlargest(max(0, top_k - len(must)), rest, key=lambda e: (e[0], e[1]))
+    return [(poi, round(score, 4)) for score, _, poi in must + best]
+
+
+def fit_to_token_budget(items: List[Any], render: Callable[[Any], str], budget: int) -> Tuple[List[Any], int]:
+    """
+    Longest prefix of `items` whose rendered text fits in `budget` tokens.
+
+    Returns:
+        (kept items, estimated tokens used)
+    """
+    kept, used = [], 0
+    for item in items:
+        cost = estimate_tokens(render(item)) + 1  # newline
+        if used + cost > budget:
+            break
+        kept.append(item)
+        used += cost
+    return kept, used
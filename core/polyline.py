@@ -0,0 +1,124 @@
+"""
+Vectorized encoded-polyline codec and Douglas-Peucker simplification.
+
+Google's Routes API returns route geometry as an encoded polyline string
+(https://developers.google.com/maps/documentation/utilities/polylinealgorithm).
+Decoding and encoding here work on whole NumPy arrays instead of looping per
+character, and simplify_polyline drops points that do not move the line by more
+than a tolerance in metres.
+"""
+import math
+from typing import Optional
+
+import numpy as np
+
+# Polyline values are at most 32 bits, i.e. 7 chunks of 5 bits.
+_MAX_CHUNKS = 7
+_CHUNK_SHIFTS = 5 * np.arange(_MAX_CHUNKS, dtype=np.int64)
+
+_M_PER_DEG_LAT = 110_574.0
+_M_PER_DEG_LON_EQUATOR = 111_320.0
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> np.ndarray:
+    """
+    Decode an encoded polyline into an (N, 2) float64 array of (lat, lon).
+
+    Raises:
+        ValueError: If the string is not a valid polyline.
+    """
+    if not encoded:
+        return np.empty((0, 2), dtype=np.float64)
+
+    data = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    if data.min() < 0 or data[-1] >= 0x20:
+        raise ValueError("Malformed polyline string.")
+
+    ends = data < 0x20  # last chunk of every value
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    value_id = np.concatenate(([0], np.cumsum(ends)[:-1]))
+    position = np.arange(data.size) - starts[value_id]
+
+    values = np.add.reduceat((data & 0x1F) << (5 * position), starts)
+    values = np.where(values & 1, ~(values >> 1), values >> 1)
+    if values.size % 2:
+        raise ValueError("Polyline has an odd number of values.")
+
+    return values.reshape(-1, 2).cumsum(axis=0) / float(10 ** precision)
+
+
+def encode_polyline(coords: np.ndarray, precision: int = 5) -> str:
+    """Encode an (N, 2) array of (lat, lon) into a polyline string."""
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    if coords.size == 0:
+        return ""
+
+    ints = np.round(coords * 10 ** precision).astype(np.int64)
+    deltas = np.diff(ints, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    zigzag = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    chunks = (zigzag[:, None] >> _CHUNK_SHIFTS) & 0x1F
+    n_chunks = 1 + ((zigzag[:, None] >> _CHUNK_SHIFTS[1:]) > 0).sum(axis=1)
+    index = np.arange(_MAX_CHUNKS)
+    keep = index < n_chunks[:, None]
+    more = index < (n_chunks - 1)[:, None]
+
+    out = (chunks | np.where(more, 0x20, 0)) + 63
+    return out[keep].astype(np.uint8).tobytes().decode("ascii")
+
+
+def _perpendicular_m(points: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Distance of every point to segment a-b, all in local metres."""
+    ab = b - a
+    length_sq = float(ab @ ab)
+    if length_sq == 0.0:
+        return np.hypot(*(points - a).T)
+    t = np.clip(((points - a) @ ab) / length_sq, 0.0, 1.0)
+    closest = a + t[:, None] * ab
+    return np.hypot(*(points - closest).T)
+
+
+def simplify_polyline(coords: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """
+    Douglas-Peucker simplification of an (N, 2) (lat, lon) array.
+
+    Args:
+        coords: Points to simplify.
+        tolerance_m: Maximum distance in metres a dropped point may be from the simplified line.
+
+    Returns:
+        The kept points, first and last always included.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    n = len(coords)
+    if n < 3 or tolerance_m <= 0:
+        return coords
+
+    lat0 = math.radians(float(coords[:, 0].mean()))
+    xy = np.column_stack((
+        coords[:, 1] * _M_PER_DEG_LON_EQUATOR * math.cos(lat0),
+        coords[:, 0] * _M_PER_DEG_LAT,
+    ))
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dist = _perpendicular_m(xy[first + 1:last], xy[first], xy[last])
+        index = int(dist.argmax())
+        if dist[index] > tolerance_m:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return coords[keep]
+
+
+def parse_duration(value: Optional[str]) -> int:
+    """Routes API durations are strings like "1234s"."""
+    if not value:
+        return 0
+    return int(float(str(value).rstrip("s")))
@@ -0,0 +1,164 @@
+"""
+Compact rendering of task contexts and POI lists for LLM prompts.
+
+Prompt length drives LLM latency and cost, so what goes into the final call is
+written for the model, not for debugging:
+
+    - format_context: one "field: value" line per field that carries information.
+      None, empty lists / strings and untouched defaults are left out, lists are
+      comma-joined. Works for any pydantic context (ItineraryPlannerContext,
+      MeetingPointContext, ...).
+    - format_poi_table: one header and one "|"-separated row per POI, with reviews
+      shortened so the whole table fits a token budget.
+    - format_compact_day_plan: core.day_planner.format_day_plan with short addresses.
+
+Addresses lose the ending every POI shares (", Jaipur", the city is in the trip
+details) and keep their last ADDRESS_PARTS parts, enough to place a POI in the city.
+
+    text = format_context(context, exclude={"poi_candidates"})
+    table, kept = format_poi_table(pois, budget=1200)
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from core.day_planner import REVIEW_CHARS, format_day_plan
+from core.poi_scoring import CHARS_PER_TOKEN, estimate_tokens, fit_to_token_budget
+
+# Shorter than this and a review is dropped rather than cut
+MIN_REVIEW_CHARS = 40
+
+# Comma-separated address parts kept once the shared ending is removed
+ADDRESS_PARTS = 2
+
+POI_TABLE_HEADER = "name | address | rating (reviews) | review"
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or (isinstance(value, (str, list, tuple, set, dict)) and not value)
+
+
+def compact_fields(context: Any, exclude: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Fields of a pydantic context worth sending to the LLM, in declaration order.
+    Empty values are dropped, and so are defaults the request never set.
+    """
+    exclude = set(exclude)
+    fields = type(context).model_fields
+    explicitly_set = context.model_fields_set
+    compact = {}
+    for name, field in fields.items():
+        if name in exclude:
+            continue
+        value = getattr(context, name)
+        if _is_empty(value):
+            continue
+        if name not in explicitly_set and not field.is_required() and value == field.get_default(call_default_factory=True):
+            continue
+        compact[name] = value
+    return compact
+
+
+def _render_value(value: Any) -> str:
+    if isinstance(value, (list, tuple, set)):
+        return ", ".join(_render_value(v) for v in value if not _is_empty(v))
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{k}: {_render_value(v)}" for k, v in value.items() if not _is_empty(v)) + "}"
+    return str(value)
+
+
+def format_context(context: Any, exclude: Iterable[str] = ()) -> str:
+    """One "field: value" line per informative field of the context (see compact_fields)."""
+    return "\n".join(f"{name}: {_render_value(value)}" for name, value in compact_fields(context, exclude).items())
+
+
+def shared_address_suffix(addresses: List[str]) -> str:
+    """Trailing comma-separated parts every address has in common, e.g. ", Jaipur, Rajasthan"."""
+    split = [[part.strip() for part in a.split(",")] for a in addresses if a]
+    if len(split) < 2:
+        return ""
+    common = 0
+    # Keep at least the first part of every address
+    limit = min(len(parts) for parts in split) - 1
+    while common < limit and len({tuple(parts[len(parts) - common - 1:]) for parts in split}) == 1:
+        common += 1
+    return ", " + ", ".join(split[0][len(split[0]) - common:]) if common else ""
+
+
+def short_address(address: str, shared_suffix: str = "") -> str:
+    """Address without the shared ending, cut to its last ADDRESS_PARTS parts."""
+    if shared_suffix and address.endswith(shared_suffix):
+        address = address[:len(address) - len(shared_suffix)]
+    parts = [part.strip() for part in address.split(",") if part.strip()]
+    return ", ".join(parts[-ADDRESS_PARTS:])
+
+
+def _shorten(text: str, chars: int) -> str:
+    text = (text or "").replace("\n", " ").strip()
+    if len(text) <= chars:
+        return text
+    if chars < MIN_REVIEW_CHARS:
+        return ""
+    return text[:chars].rsplit(" ", 1)[0].rstrip(".,;:") + "..."
+
+
+def _rating(poi: Dict[str, Any]) -> str:
+    rating, count = poi.get("rating"), poi.get("rating_count")
+    if not rating:
+        return "-"
+    if not count:
+        return str(rating)
+    return f"{rating} ({count / 1000:.1f}k)" if count >= 1000 else f"{rating} ({count})"
+
+
+def format_poi_row(poi: Dict[str, Any], review_chars: int = REVIEW_CHARS, address_suffix: str = "") -> str:
+    """One table row of a POI dict as produced by steps.extract_data_from_api_response."""
+    address = short_address(poi.get("address") or "", address_suffix)
+    review = poi.get("review")
+    if review == "No reviews available":
+        review = ""
+    cells = (poi.get("name") or "?", address, _rating(poi), _shorten(review, review_chars))
+    # A "|" inside a cell (e.g. "Elefunenjoy| Elephant Sanctuary") would shift the columns
+    return " | ".join(cell.replace("|", "/") for cell in cells).rstrip(" |")
+
+
+def format_poi_table(pois: List[Dict[str, Any]], budget: int, review_chars: int = REVIEW_CHARS,
+                     header: bool = True) -> Tuple[str, int]:
+    """
+    POIs as a compact table of at most `budget` tokens, in the given order.
+
+    Reviews are shortened first (evenly across rows, at most review_chars each); rows
+    are only dropped from the end when the table does not fit even without reviews.
+
+    Returns:
+        (table text, number of POIs kept). The text is empty when no POI fits.
+    """
+    if not pois or budget <= 0:
+        return "", 0
+    suffix = shared_address_suffix([p.get("address") or "" for p in pois])
+    preamble = [POI_TABLE_HEADER] if header else []
+    used = sum(estimate_tokens(line) + 1 for line in preamble)
+
+    rows, row_tokens = fit_to_token_budget([format_poi_row(p, 0, suffix) for p in pois], lambda row: row, budget - used)
+    if not rows:
+        return "", 0
+    used += row_tokens
+
+    # Share what is left between the reviews of the rows that fit. A review adds " | ", at most
+    # per_row_chars of text and "...", and a row's estimate rounds up, so whole tokens per row are
+    # given out: the table never goes over the budget.
+    per_row_chars = min(review_chars, (budget - used) // len(rows) * CHARS_PER_TOKEN - len(" | ") - len("..."))
+    if per_row_chars >= MIN_REVIEW_CHARS:
+        rows = [format_poi_row(p, per_row_chars, suffix) for p in pois[:len(rows)]]
+    return "\n".join(preamble + rows), len(rows)
+
+
+def format_compact_day_plan(plan: List[Dict[str, Any]], start_label: Optional[str] = None) -> str:
+    """format_day_plan with short addresses (see short_address)."""
+    suffix = shared_address_suffix([stop.get("address") or "" for day in plan for stop in day["stops"]])
+    return format_day_plan(plan, start_label, address=lambda a: short_address(a, suffix))
+
+
+def section_tokens(sections: Dict[str, Optional[str]]) -> Dict[str, int]:
+    """Estimated tokens per named prompt section, plus their "total"."""
+    tokens = {name: estimate_tokens(text or "") for name, text in sections.items()}
+    tokens["total"] = sum(tokens.values())
+    return tokens
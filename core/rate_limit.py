@@ -0,0 +1,305 @@
+"""
+Client-side rate limiting for the external APIs.
+
+Every upstream ("places", "routes", "overpass", "llm") has one shared token bucket,
+so all threads and requests in the process together stay under its QPS. Callers wait
+in priority order: interactive requests go before background work such as cache
+warming (see priority()).
+
+When an upstream still answers 429/503 the limiter backs off: nobody is let through
+until its Retry-After has passed, and the rate is halved, then grows back on success.
+Transient failures (connection errors, timeouts, 408/409 and other 5xx) are retried
+too, after an exponential backoff, without slowing down the other callers.
+
+Limits are "<requests per second>:<burst>", overridable per upstream with
+RATE_LIMIT_<NAME>, e.g. RATE_LIMIT_OVERPASS=0.5:1. The LLM backends ("llm" and
+"llm_<backend>") have no client-side limit unless RATE_LIMIT_LLM(_<BACKEND>) is set:
+their quota depends on the provider, account and model, so only the 429 backoff applies.
+
+Usage:
+    limiter = get_limiter("places")
+    data = limiter.call(send_request)       # waits for a token, retries on 429
+
+    with priority(BACKGROUND):
+        warm_cache()
+"""
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from openai import APIConnectionError
+
+from core.tracing import current_span
+from core.deadline import remaining
+
+INTERACTIVE = 0
+BACKGROUND = 10
+
+# (requests per second, burst), None for no client-side limit
+DEFAULT_LIMITS = {
+    "places": (10.0, 20),
+    "routes": (10.0, 10),
+    "overpass": (0.5, 2),   # public Overpass allows ~2 concurrent slots per IP
+    "llm": None,            # provider quota, set RATE_LIMIT_LLM to match it
+}
+
+MAX_RETRIES = 3
+BACKOFF_BASE_S = 1.0        # used when a 429/503 carries no Retry-After
+TRANSIENT_BACKOFF_S = 0.5   # first retry delay after a transient failure, doubled per attempt
+MAX_TRANSIENT_BACKOFF_S = 8.0
+MIN_RATE_FRACTION = 0.1     # adaptive backoff never goes below this share of the configured rate
+THROTTLE_STATUSES = (429, 503)
+TRANSIENT_STATUSES = (408, 409)     # plus every other 5xx
+CONNECTION_ERRORS = (requests.ConnectionError, requests.Timeout, APIConnectionError)
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level: int):
+    """Run the block (and threads started with its context) at the given priority. Lower goes first."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+class RateLimitTimeout(TimeoutError):
+    """Raised when a caller gave up waiting for a token."""
+
+
+def retry_after_seconds(exc: Exception, attempt: int) -> Optional[float]:
+    """
+    Seconds to back off if `exc` is an upstream throttling error (HTTP 429/503), else None.
+    Works with requests.HTTPError and openai.APIStatusError, both of which carry .response.
+    """
+    response = getattr(exc, "response", None)
+    if getattr(response, "status_code", None) not in THROTTLE_STATUSES:
+        return None
+    header = (getattr(response, "headers", None) or {}).get("Retry-After")
+    if header:
+        try:
+            return max(float(header), 0.0)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(header).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                pass
+    return BACKOFF_BASE_S * 2 ** attempt
+
+
+def transient_backoff_seconds(exc: Exception, attempt: int) -> Optional[float]:
+    """
+    Seconds to wait before retrying if `exc` is a transient failure (connection error, timeout,
+    HTTP 408/409 or a 5xx other than 503), else None. Jittered so callers do not retry in step.
+    """
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    if not isinstance(exc, CONNECTION_ERRORS) and status not in TRANSIENT_STATUSES \
+            and not (status is not None and status >= 500 and status not in THROTTLE_STATUSES):
+        return None
+    return min(MAX_TRANSIENT_BACKOFF_S, TRANSIENT_BACKOFF_S * 2 ** attempt) * random.uniform(0.75, 1.0)
+
+
+class RateLimiter:
+    """
+    Token bucket with a priority wait queue and Retry-After driven backoff.
+    With rate None there is no bucket: callers only wait out a Retry-After.
+    """
+
+    def __init__(self, name: str, rate: Optional[float], burst: int):
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._cond = threading.Condition()
+        self._waiters: list = []
+        self._seq = itertools.count()
+
+        self.requests = 0
+        self.throttled = 0
+        self.queue_wait_s = 0.0
+        self.max_queue_wait_s = 0.0
+        self.upstream_s = 0.0
+        self.attempts = 0
+
+    def _refill(self, now: float):
+        if self.rate is None:
+            self.tokens = float(self.burst)
+        else:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, level: Optional[int] = None, timeout: Optional[float] = None) -> float:
+        """
+        Block until a token is available and every higher-priority caller has been served.
+
+        Returns:
+            Seconds spent waiting.
+
+        Raises:
+            RateLimitTimeout: If `timeout` seconds pass first.
+        """
+        entry = (current_priority() if level is None else level, next(self._seq))
+        started = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiters[0] is entry and now >= self.blocked_until and self.tokens >= 1:
+                        self.tokens -= 1
+                        heapq.heappop(self._waiters)
+                        break
+                    if now < self.blocked_until:
+                        wait = self.blocked_until - now
+                    elif self.tokens < 1:       # only with a rate: unlimited buckets stay full
+                        wait = (1 - self.tokens) / self.rate
+                    else:
+                        wait = None     # a token is free but someone is ahead of us
+                    if timeout is not None:
+                        left = timeout - (now - started)
+                        if left <= 0:
+                            raise RateLimitTimeout(f"No {self.name} token within {timeout:.1f}s")
+                        wait = left if wait is None else min(wait, left)
+                    self._cond.wait(wait)
+            except BaseException:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                raise
+            finally:
+                self._cond.notify_all()
+
+        waited = time.monotonic() - started
+        with self._cond:
+            self.requests += 1
+            self.queue_wait_s += waited
+            self.max_queue_wait_s = max(self.max_queue_wait_s, waited)
+        return waited
+
+    def penalize(self, retry_after_s: float):
+        """Upstream throttled us: hold everyone until Retry-After passes and halve the rate."""
+        with self._cond:
+            now = time.monotonic()
+            self.blocked_until = max(self.blocked_until, now + retry_after_s)
+            if self.rate is not None:
+                self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+                self.tokens = 0.0
+            self.updated = now
+            self.throttled += 1
+            self._cond.notify_all()
+        rate = "unlimited" if self.rate is None else f"{self.rate:.2f}/s"
+        print(f"[RateLimiter] {self.name} throttled, backing off {retry_after_s:.1f}s, rate now {rate}")
+
+    def record_attempt(self, upstream_s: float):
+        with self._cond:
+            self.attempts += 1
+            self.upstream_s += upstream_s
+
+    def record_success(self):
+        with self._cond:
+            if self.rate is not None and self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * MIN_RATE_FRACTION)
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        fn(*args, **kwargs) once a token is available, retrying up to MAX_RETRIES times on 429/503
+        (backing off for everyone) and on transient failures (backing off this call only).
+        Records queue wait and upstream time on the current span.
+
+        Raises:
+            RateLimitTimeout: If the request's deadline passes while waiting for a token.
+        """
+        waited = upstream = 0.0
+        for attempt in range(MAX_RETRIES + 1):
+            # Waiting for a token counts against the request's deadline (core.deadline)
+            waited += self.acquire(timeout=remaining())
+            started = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                elapsed = time.monotonic() - started
+                upstream += elapsed
+                self.record_attempt(elapsed)
+                throttle = retry_after_seconds(e, attempt)
+                delay = throttle if throttle is not None else transient_backoff_seconds(e, attempt)
+                left = remaining()
+                if delay is None or attempt == MAX_RETRIES or (left is not None and delay >= left):
+                    raise
+                if throttle is not None:
+                    self.penalize(delay)
+                else:
+                    print(f"[RateLimiter] {self.name} failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                continue
+            elapsed = time.monotonic() - started
+            upstream += elapsed
+            self.record_attempt(elapsed)
+            self.record_success()
+            current_span().set_attributes(
+                queue_wait_ms=round(1000 * waited, 1), upstream_ms=round(1000 * upstream, 1), retries=attempt
+            )
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            served = self.requests or 1
+            return {
+                "rate": None if self.rate is None else round(self.rate, 3),
+                "max_rate": self.max_rate,
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "waiting": len(self._waiters),
+                "avg_queue_wait_ms": round(1000 * self.queue_wait_s / served, 1),
+                "max_queue_wait_ms": round(1000 * self.max_queue_wait_s, 1),
+                "avg_upstream_ms": round(1000 * self.upstream_s / (self.attempts or 1), 1),
+            }
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _limits_for(name: str):
+    # "llm_<backend>" limiters default like "llm"
+    default = DEFAULT_LIMITS.get(name, DEFAULT_LIMITS.get(name.partition("_")[0], (5.0, 5)))
+    rate, burst = default or (None, 1)
+    override = os.getenv(f"RATE_LIMIT_{name.upper()}")
+    if override:
+        rate_text, _, burst_text = override.partition(":")
+        rate = float(rate_text)
+        burst = int(burst_text) if burst_text else max(1, int(rate))
+    return rate, burst
+
+
+def get_limiter(name: str) -> RateLimiter:
+    """The process-wide limiter for an upstream, created on first use."""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = RateLimiter(name, *_limits_for(name))
+            _limiters[name] = limiter
+        return limiter
+
+
+def rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
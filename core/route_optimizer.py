@@ -0,0 +1,444 @@
+"""
+Local route optimizer for the RouteOptimizer task.
+
+Orders a set of destinations visited from a fixed start (the origin) so that the
+total travel time is as small as possible. The tour is built with a
+nearest-neighbour construction and then improved with 2-opt and Or-opt moves,
+all evaluated against a travel-time matrix that is computed once up front.
+
+Stops may carry an optional time window (earliest, latest) in minutes from the
+start time. Arriving early means waiting, arriving late is penalised heavily so
+feasible orders always win over infeasible ones. Such instances start from the better
+of nearest neighbour and earliest-deadline order, re-schedule candidates only from the
+first stop they change, and get at most TIME_WINDOW_MAX_SECONDS of improvement.
+
+Only the final order is sent to the Routes API, as a single get_route call.
+"""
+import math
+import time
+from typing import List, Dict, Optional, Sequence, Tuple, Any
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Rough average city speeds used to turn straight-line distance into minutes.
+SPEED_KMPH = {
+    "DRIVE": 25.0,
+    "TWO_WHEELER": 25.0,
+    "TRANSIT": 20.0,
+    "BICYCLE": 12.0,
+    "WALK": 4.5,
+}
+
+# Roads are never straight, scale haversine distance up a bit.
+DETOUR_FACTOR = 1.3
+
+# Cost (in minutes) added per minute of arriving after a window closes.
+LATE_PENALTY = 1000.0
+
+# Or-opt moves segments of up to this many consecutive stops.
+OR_OPT_MAX_SEGMENT = 3
+
+# Improvement budget with time windows, whatever max_seconds asks for. Candidates there
+# are re-scheduled instead of priced in O(1), so large instances never converge quickly;
+# starting from the better of two constructions, most of the gain comes early.
+TIME_WINDOW_MAX_SECONDS = 0.3
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two coordinates in kilometres."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def build_time_matrix(points: Sequence[Tuple[float, float]], travel_mode: str = "DRIVE") -> List[List[float]]:
+    """
+    Precompute the travel time in minutes between every pair of (lat, lon) points.
+
+    Args:
+        points: List of (lat, lon) tuples, the origin first.
+        travel_mode: Routes API travel mode, used to pick an average speed.
+
+    Returns:
+        Square matrix where matrix[i][j] is the estimated minutes from i to j.
+    """
+    speed = SPEED_KMPH.get(travel_mode.upper(), SPEED_KMPH["DRIVE"])
+    minutes_per_km = 60.0 * DETOUR_FACTOR / speed
+    n = len(points)
+    matrix = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        lat1, lon1 = points[i]
+        row = matrix[i]
+        for j in range(i + 1, n):
+            lat2, lon2 = points[j]
+            t = haversine_km(lat1, lon1, lat2, lon2) * minutes_per_km
+            row[j] = t
+            matrix[j][i] = t
+    return matrix
+
+
+class RouteOptimizer:
+    """
+    Orders stops 1..n-1 of a travel-time matrix, starting from the fixed stop 0.
+
+    Args:
+        matrix: Square travel-time matrix in minutes, node 0 is the start.
+        time_windows: Optional list aligned with the matrix of (earliest, latest)
+            minutes from the start time, or None for stops without a window.
+        service_minutes: Minutes spent at each stop before leaving again.
+        return_to_start: If True the tour ends back at node 0.
+    """
+
+    def __init__(
+        self,
+        matrix: List[List[float]],
+        time_windows: Optional[List[Optional[Tuple[float, float]]]] = None,
+        service_minutes: float = 0.0,
+        return_to_start: bool = False,
+    ):
+        self.matrix = matrix
+        self.n = len(matrix)
+        self.time_windows = time_windows if time_windows and any(time_windows) else None
+        self.service_minutes = service_minutes
+        self.return_to_start = return_to_start
+        self.symmetric = all(
+            matrix[i][j] == matrix[j][i] for i in range(self.n) for j in range(i + 1, self.n)
+        )
+
+    # ---------------- Cost ---------------- #
+    def _edge(self, u: int, v: Optional[int]) -> float:
+        """Travel time of edge u -> v, where v=None is the open end of the path."""
+        if v is None:
+            return self.matrix[u][0] if self.return_to_start else 0.0
+        return self.matrix[u][v]
+
+    def route_cost(self, order: List[int]) -> float:
+        """Total cost of visiting `order` from the start, including lateness penalties."""
+        if self.time_windows:
+            return self._schedule_cost(order)
+        cost = 0.0
+        prev = 0
+        m = self.matrix
+        for node in order:
+            cost += m[prev][node]
+            prev = node
+        return cost + self._edge(prev, None)
+
+    def _schedule_cost(self, order: List[int], start: int = 0, state: Tuple[float, float, int] = (0.0, 0.0, 0),
+                       bound: float = math.inf, merge: int = -1,
+                       states: Optional[List[Tuple[float, float, int]]] = None) -> float:
+        """
+        Cost of `order` with time windows, resuming from position `start` in `state`
+        (clock, lateness, previous node) as returned by _prefix_states. Clock and
+        lateness only grow, so evaluation stops with inf once the cost reaches `bound`.
+
+        From position `merge` on, `order` is the same as the order `states` belongs to:
+        leaving that stop no earlier and no less late than it did there cannot be cheaper,
+        so evaluation stops with inf as well.
+        """
+        clock, late, prev = state
+        m = self.matrix
+        tw = self.time_windows
+        for index in range(start, len(order)):
+            node = order[index]
+            clock += m[prev][node]
+            window = tw[node]
+            if window:
+                earliest, latest = window
+                if clock < earliest:
+                    clock = earliest
+                elif clock > latest:
+                    late += clock - latest
+            clock += self.service_minutes
+            prev = node
+            if clock + LATE_PENALTY * late >= bound:
+                return math.inf
+            if index == merge:
+                known_clock, known_late, _ = states[index + 1]
+                if clock >= known_clock and late >= known_late:
+                    return math.inf
+        clock += self._edge(prev, None)
+        return clock + LATE_PENALTY * late
+
+    def _prefix_states(self, order: List[int]) -> List[Tuple[float, float, int]]:
+        """(clock, lateness, previous node) before each position of `order`, for _schedule_cost."""
+        states = [(0.0, 0.0, 0)]
+        clock, late, prev = states[0]
+        m = self.matrix
+        tw = self.time_windows
+        for node in order:
+            clock += m[prev][node]
+            window = tw[node]
+            if window:
+                earliest, latest = window
+                if clock < earliest:
+                    clock = earliest
+                elif clock > latest:
+                    late += clock - latest
+            clock += self.service_minutes
+            prev = node
+            states.append((clock, late, prev))
+        return states
+
+    def _candidate_cost(self, candidate: List[int], unchanged: int, merge: int,
+                        states: Optional[List[Tuple[float, float, int]]], bound: float) -> float:
+        """
+        Cost of a candidate order that differs from the order `states` belongs to only
+        between positions `unchanged` and `merge`.
+        """
+        if states is None:
+            return self.route_cost(candidate)
+        return self._schedule_cost(candidate, unchanged, states[unchanged], bound, merge, states)
+
+    def schedule(self, order: List[int]) -> List[Dict[str, float]]:
+        """
+        Arrival and departure minutes for each stop in `order`.
+
+        Returns:
+            List of {"node", "arrival", "departure", "late"} dicts.
+        """
+        clock = 0.0
+        prev = 0
+        out = []
+        for node in order:
+            clock += self.matrix[prev][node]
+            arrival = clock
+            late = 0.0
+            window = self.time_windows[node] if self.time_windows else None
+            if window:
+                earliest, latest = window
+                if clock < earliest:
+                    clock = earliest
+                elif clock > latest:
+                    late = clock - latest
+            clock += self.service_minutes
+            out.append({"node": node, "arrival": arrival, "departure": clock, "late": late})
+            prev = node
+        return out
+
+    # ---------------- Construction ---------------- #
+    def _nearest_neighbour(self) -> List[int]:
+        """Greedy tour. With time windows, lateness is avoided first and the earliest closing window breaks ties."""
+        remaining = set(range(1, self.n))
+        order = []
+        current = 0
+        clock = 0.0
+        m = self.matrix
+        tw = self.time_windows
+        while remaining:
+            best = None
+            best_key = None
+            for node in remaining:
+                travel = m[current][node]
+                if tw:
+                    arrival = clock + travel
+                    window = tw[node]
+                    late = max(0.0, arrival - window[1]) if window else 0.0
+                    wait = max(0.0, window[0] - arrival) if window else 0.0
+                    key = (late, travel + wait, window[1] if window else math.inf, node)
+                else:
+                    key = (travel, node)
+                if best_key is None or key < best_key:
+                    best, best_key = node, key
+            order.append(best)
+            remaining.discard(best)
+            if tw:
+                clock += m[current][best]
+                window = tw[best]
+                if window and clock < window[0]:
+                    clock = window[0]
+                clock += self.service_minutes
+            current = best
+        return order
+
+    def _earliest_deadline(self) -> List[int]:
+        """Stops by closing window, those without one last. Often feasible where nearest neighbour is late."""
+        tw = self.time_windows
+        return sorted(range(1, self.n), key=lambda node: (tw[node][1] if tw[node] else math.inf, node))
+
+    # ---------------- Improvement ---------------- #
+    def _two_opt(self, order: List[int], deadline: float) -> Tuple[List[int], bool]:
+        """Reverse segments while that shortens the tour. Returns (order, improved)."""
+        n = len(order)
+        improved_any = False
+        fast = self.symmetric and not self.time_windows
+        m = self.matrix
+        best_cost = self.route_cost(order)
+        # With time windows a candidate is only re-scheduled from the first stop it changes
+        states = self._prefix_states(order) if self.time_windows else None
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for i in range(n - 1):
+                if time.perf_counter() >= deadline:
+                    break
+                a = order[i - 1] if i > 0 else 0
+                b = order[i]
+                for j in range(i + 1, n):
+                    c = order[j]
+                    d = order[j + 1] if j + 1 < n else None
+                    if fast:
+                        delta = (m[a][c] + self._edge(b, d)) - (m[a][b] + self._edge(c, d))
+                        if delta < -1e-9:
+                            order[i:j + 1] = order[i:j + 1][::-1]
+                            best_cost += delta
+                            improved = improved_any = True
+                            b = order[i]
+                    else:
+                        candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                        cost = self._candidate_cost(candidate, i, j + 1, states, best_cost - 1e-9)
+                        if cost < best_cost - 1e-9:
+                            order, best_cost = candidate, cost
+                            improved = improved_any = True
+                            b = order[i]
+                            if states is not None:
+                                states = self._prefix_states(order)
+        return order, improved_any
+
+    def _or_opt(self, order: List[int], deadline: float) -> Tuple[List[int], bool]:
+        """Move short segments of consecutive stops to a cheaper position. Returns (order, improved)."""
+        improved_any = False
+        fast = self.symmetric and not self.time_windows
+        m = self.matrix
+        best_cost = self.route_cost(order)
+        states = self._prefix_states(order) if self.time_windows else None
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            n = len(order)
+            for seg_len in range(1, min(OR_OPT_MAX_SEGMENT, n - 1) + 1):
+                i = 0
+                while i + seg_len <= n and time.perf_counter() < deadline:
+                    segment = order[i:i + seg_len]
+                    rest = order[:i] + order[i + seg_len:]
+                    if fast:
+                        a = order[i - 1] if i > 0 else 0
+                        d = order[i + seg_len] if i + seg_len < n else None
+                        first, last = segment[0], segment[-1]
+                        removal_gain = m[a][first] + self._edge(last, d) - self._edge(a, d)
+                    moved = False
+                    for k in range(len(rest) + 1):
+                        if k == i:
+                            continue
+                        for candidate_seg in (segment, segment[::-1]) if seg_len > 1 else (segment,):
+                            if fast:
+                                x = rest[k - 1] if k > 0 else 0
+                                y = rest[k] if k < len(rest) else None
+                                added = m[x][candidate_seg[0]] + self._edge(candidate_seg[-1], y) - self._edge(x, y)
+                                if added - removal_gain < -1e-9:
+                                    order = rest[:k] + candidate_seg + rest[k:]
+                                    best_cost += added - removal_gain
+                                    moved = True
+                            else:
+                                candidate = rest[:k] + candidate_seg + rest[k:]
+                                cost = self._candidate_cost(candidate, min(i, k), max(i, k) + seg_len, states,
+                                                           best_cost - 1e-9)
+                                if cost < best_cost - 1e-9:
+                                    order, best_cost = candidate, cost
+                                    moved = True
+                                    if states is not None:
+                                        states = self._prefix_states(order)
+                            if moved:
+                                break
+                        if moved:
+                            break
+                    if moved:
+                        improved = improved_any = True
+                    i += 1
+        return order, improved_any
+
+    def solve(self, max_seconds: float = 1.0) -> List[int]:
+        """
+        Compute a good visiting order of nodes 1..n-1.
+
+        Args:
+            max_seconds: Time budget for the improvement phase, at most
+                TIME_WINDOW_MAX_SECONDS when stops have time windows.
+
+        Returns:
+            List of node indices in visiting order (the start node 0 excluded).
+        """
+        if self.n <= 2:
+            return list(range(1, self.n))
+        deadline = time.perf_counter() + max_seconds
+        order = self._nearest_neighbour()
+        if self.time_windows:
+            deadline = min(deadline, time.perf_counter() + TIME_WINDOW_MAX_SECONDS)
+            order = min(order, self._earliest_deadline(), key=self.route_cost)
+        while time.perf_counter() < deadline:
+            order, improved_2opt = self._two_opt(order, deadline)
+            order, improved_or = self._or_opt(order, deadline)
+            if not (improved_2opt or improved_or):
+                break
+        return order
+
+
+# ---------------- Helpers for RouteOptimizerContext ---------------- #
+def to_minutes(value: Any) -> Optional[float]:
+    """Accept minutes as a number or a "HH:MM" clock string."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    hours, _, minutes = str(value).strip().partition(":")
+    return int(hours) * 60.0 + int(minutes or 0)
+
+
+def time_windows_for(destinations: List[Dict], start_time: Any = None) -> List[Optional[Tuple[float, float]]]:
+    """
+    Read optional per-destination "time_window": [earliest, latest] values, given either
+    as minutes from the start or as "HH:MM" clock times relative to `start_time`.
+    """
+    offset = to_minutes(start_time) or 0.0
+    windows: List[Optional[Tuple[float, float]]] = [None]  # the origin
+    for dest in destinations:
+        window = dest.get("time_window")
+        if not window:
+            windows.append(None)
+            continue
+        earliest, latest = (to_minutes(v) for v in window)
+        earliest = 0.0 if earliest is None else earliest - offset
+        latest = math.inf if latest is None else latest - offset
+        windows.append((earliest, latest))
+    return windows
+
+
+def optimize_order(origin: Dict, destinations: List[Dict], constraints: Optional[Dict] = None) -> Dict[str, Any]:
+    """
+    Order `destinations` for a trip starting at `origin`.
+
+    Args:
+        origin: {"lat", "lon", "label"?}
+        destinations: [{"lat", "lon", "label"?, "time_window"?}, ...]
+        constraints: Optional {"travel_mode", "return_to_origin", "start_time",
+            "service_minutes", "max_seconds"}
+
+    Returns:
+        Dict with "order" (indices into destinations), "destinations" (reordered),
+        "estimated_minutes" and "schedule".
+    """
+    constraints = constraints or {}
+    travel_mode = constraints.get("travel_mode") or "DRIVE"
+    points = [(origin["lat"], origin["lon"])] + [(d["lat"], d["lon"]) for d in destinations]
+    matrix = build_time_matrix(points, travel_mode)
+
+    optimizer = RouteOptimizer(
+        matrix,
+        time_windows=time_windows_for(destinations, constraints.get("start_time")),
+        service_minutes=float(constraints.get("service_minutes") or 0.0),
+        return_to_start=bool(constraints.get("return_to_origin")),
+    )
+    order = optimizer.solve(max_seconds=float(constraints.get("max_seconds") or 1.0))
+    schedule = optimizer.schedule(order)
+
+    last = schedule[-1] if schedule else {"node": 0, "departure": 0.0}
+    return {
+        "order": [node - 1 for node in order],
+        "destinations": [destinations[node - 1] for node in order],
+        "estimated_minutes": last["departure"] + optimizer._edge(last["node"], None),
+        "schedule": schedule,
+    }
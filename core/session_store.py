@@ -0,0 +1,76 @@
+"""
+In-process store of conversation sessions, so follow-up messages can refine the last
+request instead of starting over.
+
+A session keeps the task, the context as the Decomposer (plus any follow-ups) left it,
+the original query and follow-ups, and the Orchestrator memo of step results. Sessions
+expire after SESSION_TTL_SECONDS of inactivity; past MAX_SESSIONS the least recently
+used is dropped.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+SESSION_TTL_SECONDS = 2 * 3600
+MAX_SESSIONS = 1000
+
+
+@dataclass
+class Session:
+    session_id: str
+    task: str
+    context: Any                    # pre-execution context, step outputs are not merged in
+    user_query: str
+    memo: Dict[str, tuple] = field(default_factory=dict)
+    followups: List[str] = field(default_factory=list)
+    result: Any = None
+    updated_at: float = field(default_factory=time.time)
+
+    def conversation(self) -> str:
+        """Original query plus follow-ups, as the user_query for re-running the task."""
+        if not self.followups:
+            return self.user_query
+        return self.user_query + "\n\nFollow-up requests, in order:\n" + "\n".join(f"- {f}" for f in self.followups)
+
+
+class SessionStore:
+    def __init__(self, ttl_seconds: float = SESSION_TTL_SECONDS, max_sessions: int = MAX_SESSIONS):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if time.time() - session.updated_at > self.ttl_seconds:
+                self._drop(session_id)
+                return None
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def save(self, session: Session):
+        session.updated_at = time.time()
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._sessions.move_to_end(session.session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._drop(next(iter(self._sessions)))
+
+    def lock(self, session_id: str) -> threading.Lock:
+        """Per-session lock, so messages of one session are handled one at a time."""
+        with self._lock:
+            return self._locks.setdefault(session_id, threading.Lock())
+
+    def _drop(self, session_id: str):
+        self._sessions.pop(session_id, None)
+        self._locks.pop(session_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
@@ -0,0 +1,73 @@
+"""
+Duplicate call suppression.
+
+While a call for a key is in flight, other callers with the same key wait for it and
+get its result (or its exception) instead of starting their own. Once it finishes the
+key is forgotten, so this is coalescing, not caching.
+
+Results are shared between callers, so treat them as read-only. A waiting caller only
+waits as long as its own request's deadline (core.deadline) allows.
+
+Usage:
+    flight = SingleFlight()
+    places = flight.do(("text_search", query), client.text_search, query)
+"""
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from core.deadline import DeadlineExceeded, remaining
+from core.tracing import current_span
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[Hashable, Tuple[Future, int]] = {}
+        self._lock = threading.Lock()
+        self.shared = 0     # calls answered by another caller's in-flight result
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        fn(*args, **kwargs), unless a call with the same key is already running, in which case
+        wait for that one and return its result.
+
+        Raises:
+            Whatever fn raised, in the leader and in every waiting caller.
+            DeadlineExceeded: In a waiting caller whose deadline passes before the leader finishes.
+            RuntimeError: If the leader's own thread asks for the same key again (would deadlock).
+        """
+        thread_id = threading.get_ident()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                future = Future()
+                self._calls[key] = (future, thread_id)
+            else:
+                future, leader_thread = call
+                if leader_thread == thread_id:
+                    raise RuntimeError(f"Re-entrant single-flight call for key {key!r}")
+                self.shared += 1
+
+        if not leader:
+            current_span().set_attribute("coalesced", True)
+            try:
+                return future.result(timeout=remaining())
+            except FutureTimeout:
+                raise DeadlineExceeded(f"Deadline passed while waiting for the in-flight call for {key!r}") from None
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
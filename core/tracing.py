@@ -0,0 +1,328 @@
+"""
+Lightweight request tracing.
+
+Spans cover the pipeline stages (routing, decomposition, DB profile load, each
+Places query, each LLM call, rendering). A trace is exported when its root span
+ends, to any of:
+
+    - JSON lines file with every span           (TRACE_EXPORT=json:traces.jsonl)
+    - Chrome trace-event file for flamegraphs   (TRACE_EXPORT=chrome:trace.json,
+      open in chrome://tracing, Perfetto or speedscope)
+    - OpenTelemetry collector over OTLP/HTTP    (TRACE_EXPORT=otlp:http://localhost:4318)
+
+Several exporters can be combined with commas. Tracing is off unless
+TRACE_ENABLED=1. When off, span() hands back one shared no-op object, so the
+cost at each call site is a function call and a flag check.
+
+Usage:
+    with span("places.text_search", query=q) as s:
+        places = client.text_search(q)
+        s.set_attribute("results", len(places))
+"""
+import atexit
+import contextvars
+import functools
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "map-assistant")
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error", "_token")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any):
+        self.attributes.update((k, v) for k, v in attributes.items() if v is not None)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.error = repr(exc)
+        _current_span.reset(self._token)
+        _tracer._finish(self)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Returned when tracing is disabled. Accepts and drops everything."""
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, **attributes: Any):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+# ---------------- Exporters ---------------- #
+class JSONLinesExporter:
+    """Appends one JSON object per trace: {"trace_id", "spans": [...]}."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        line = json.dumps({"trace_id": spans[0].trace_id, "spans": [s.to_dict() for s in spans]}, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class ChromeTraceExporter:
+    """
+    Writes Chrome trace-event JSON ("X" complete events), one file holding every exported trace.
+    Each trace gets its own process row so concurrent requests do not overlap.
+
+    The file uses the array format without its closing bracket, which the viewers accept,
+    so each trace is appended as it ends and nothing is kept in memory. It is started
+    afresh when the exporter is created.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("[\n")
+
+    def export(self, spans: List[Span]):
+        pid = int(spans[0].trace_id[:6], 16)
+        lines = "".join(json.dumps({
+            "name": s.name,
+            "ph": "X",
+            "ts": s.start_ns / 1000,
+            "dur": (s.end_ns - s.start_ns) / 1000,
+            "pid": pid,
+            "tid": s.attributes.get("thread", 0),
+            "args": dict(s.attributes, error=s.error) if s.error else s.attributes,
+        }, default=str) + ",\n" for s in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPHTTPExporter:
+    """
+    Posts traces to an OpenTelemetry collector as OTLP/JSON (POST <endpoint>/v1/traces).
+
+    export() only queues the trace: a background thread posts queued traces in batches,
+    so a slow or unreachable collector never holds up a request. When max_queued traces
+    are waiting, new ones are dropped (and counted in .dropped).
+    """
+
+    def __init__(self, endpoint: str, timeout: float = 2.0, max_queued: int = 1000, batch: int = 64):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.timeout = timeout
+        self.batch = batch
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[List[Span]]]" = queue.Queue(maxsize=max_queued)
+        self._thread = threading.Thread(target=self._run, name="otlp-export", daemon=True)
+        self._thread.start()
+        # Send what is still queued when a CLI run exits
+        atexit.register(self.close)
+
+    def payload(self, spans: List[Span]) -> Dict[str, Any]:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{
+                "scope": {"name": SERVICE_NAME},
+                "spans": [{
+                    "traceId": s.trace_id,
+                    "spanId": s.span_id,
+                    "parentSpanId": s.parent_id or "",
+                    "name": s.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(s.start_ns),
+                    "endTimeUnixNano": str(s.end_ns),
+                    "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                    "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+                } for s in spans],
+            }],
+        }]}
+
+    def export(self, spans: List[Span]):
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 5.0):
+        """Post what is queued and stop the background thread."""
+        if self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                return
+            self._thread.join(timeout)
+
+    def _run(self):
+        import requests
+        while True:
+            traces = [self._queue.get()]
+            while traces[-1] is not None and len(traces) < self.batch:
+                try:
+                    traces.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = traces[-1] is None
+            spans = [s for trace in traces if trace is not None for s in trace]
+            if spans:
+                try:
+                    requests.post(self.url, json=self.payload(spans), timeout=self.timeout)
+                except Exception as e:
+                    print(f"[Tracing] OTLP export of {len(spans)} spans failed: {e}")
+            if stop:
+                return
+
+
+# ---------------- Tracer ---------------- #
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.exporters: List[Any] = []
+        self._open: Dict[str, List[Span]] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: bool, exporters: Optional[List[Any]] = None):
+        self.enabled = enabled
+        self.exporters = list(exporters or [])
+
+    def span(self, name: str, **attributes: Any):
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = _current_span.get()
+        attributes["thread"] = threading.get_ident() % 100000
+        if parent is None:
+            new = Span(name, secrets.token_hex(16), None, attributes)
+        else:
+            new = Span(name, parent.trace_id, parent.span_id, attributes)
+        with self._lock:
+            if parent is None:
+                self._open[new.trace_id] = [new]
+            elif new.trace_id in self._open:
+                self._open[new.trace_id].append(new)
+            # else: the root has already ended, the span is never exported (nor kept)
+        return new
+
+    def _finish(self, finished: Span):
+        if finished.parent_id is not None:
+            return
+        with self._lock:
+            spans = self._open.pop(finished.trace_id, [])
+        # Spans still running when their root ends (e.g. abandoned background work) are dropped
+        spans = [s for s in spans if s.end_ns]
+        for exporter in self.exporters:
+            try:
+                exporter.export(spans)
+            except Exception as e:
+                print(f"[Tracing] {type(exporter).__name__} failed: {e}")
+
+
+_tracer = Tracer()
+
+
+def configure_from_env():
+    """Read TRACE_ENABLED / TRACE_EXPORT and set up the global tracer."""
+    enabled = os.getenv("TRACE_ENABLED", "").lower() in ("1", "true", "yes")
+    exporters = []
+    for entry in filter(None, (e.strip() for e in os.getenv("TRACE_EXPORT", "").split(","))):
+        kind, _, target = entry.partition(":")
+        if kind == "json":
+            exporters.append(JSONLinesExporter(target or "traces.jsonl"))
+        elif kind == "chrome":
+            exporters.append(ChromeTraceExporter(target or "trace.json"))
+        elif kind == "otlp":
+            exporters.append(OTLPHTTPExporter(target or "http://localhost:4318"))
+        else:
+            print(f"[Tracing] Unknown exporter '{kind}', ignored.")
+    _tracer.configure(enabled, exporters)
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def span(name: str, **attributes: Any):
+    """Start a span as a context manager, child of the current span if there is one."""
+    if not _tracer.enabled:
+        return NOOP_SPAN
+    return _tracer.span(name, **attributes)
+
+
+def current_span():
+    """The active span, or the no-op span when tracing is off or no span is open."""
+    return _current_span.get() or NOOP_SPAN
+
+
+def traced(name: str) -> Callable:
+    """Decorator form of span()."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _tracer.enabled:
+                return func(*args, **kwargs)
+            with _tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+configure_from_env()
@@ -114,6 +114,13 @@ class PostgresDB:
         query = "SELECT * FROM users WHERE user_id = %s;"
         return self.execute_query(query, (user_id,), fetch='one')
 
+    def get_user_by_email(self, email: str) -> Optional[Dict]:
+        """
+        Fetch a single user record by email.
+        """
+        query = "SELECT * FROM users WHERE email = %s;"
+        return self.execute_query(query, (email,), fetch='one')
+
     def delete_user(self, user_id: str) -> int:
         """
         Delete a user by UUID. Returns the number of rows deleted.
@@ -1,9 +1,10 @@
 # decomposer.py
 import os, json, re
-from typing import Type
+from typing import Any, Callable, Dict, Optional, Type
 
-from steps import ask_llm
-from prompter import get_prompt,PROMPT_TEMPLATES
+from steps import ask_llm_json
+from core.tracing import traced, current_span
+from prompter import get_messages, get_prompt, PROMPTS
 from context import (
     TripSuggestionContext, ItineraryPlannerContext, ReviewSummarizerContext,
     MeetingPointContext, RouteOptimizerContext, TripJournalContext,BaseContext  
@@ -19,6 +20,9 @@ CONTEXT_MAPPING = {
     "TripJournalManager": TripJournalContext,
 }
 
+# Re-asks after an unusable reply (no JSON, or JSON that fails validation), with the error shown to the model
+MAX_REPAIR_ATTEMPTS = 1
+
 
 class Decomposer:
     def __init__(self, query: str, task: str):
@@ -26,48 +30,70 @@ class Decomposer:
         self.query = query
         self.task = task
         self.context_class: Type[BaseContext]
+        self.schema: dict = {}
         self.prompt: str = ""
+        self.messages: list = []
 
         self.load_prompt_and_context()
 
     def load_prompt_and_context(self):
         print("[Decomposer] Loading prompt and context...")
-        if self.task not in PROMPT_TEMPLATES:
+        if self.task not in PROMPTS:
             raise ValueError(f"[Error] No prompt found for task: {self.task}")
         if self.task not in CONTEXT_MAPPING:
             raise ValueError(f"[Error] No context schema found for task: {self.task}")
 
-        self.prompt = PROMPT_TEMPLATES[self.task].format(query=self.query)
+        self.prompt = get_prompt(self.task, query=self.query)
+        # Sent as system (the task's fixed instructions and JSON format) + user (the query)
+        self.messages = get_messages(self.task, query=self.query)
         self.context_class = CONTEXT_MAPPING[self.task]
+        self.schema = self.context_class.model_json_schema()
 
         print(f"[Decomposer] Loaded prompt and context for task: {self.task}")
 
 
-    def run(self):
-        print("[Decomposer] Sending prompt to LLM...")
-
-        llm_response = ask_llm(self.prompt)
-
-        print("[Decomposer] LLM response received.")
-        print("[Decomposer] Building initial context object. Extracting JSON...")
-
-        # Extract JSON from LLM response using regex
-        match = re.search(r'\{.*\}', llm_response, flags=re.DOTALL)
-        if match:
-            cleaned = match.group(0)
-            data = json.loads(cleaned)
-        else:
-            raise ValueError(f"Cannot parse JSON from LLM response: {llm_response}")
-
-        #Using Pydantic here.
-        # context = ItineraryPlannerContext.model_validate(data)
-        context = self.context_class.model_validate(data)
-
+    @traced("decompose")
+    def run(self, on_member: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Context object for the query, from the LLM's structured JSON output.
+
+        Args:
+            on_member: Called with the fields received so far while the reply streams
+                (unvalidated, first attempt only), see prefetch.POIPrefetcher.
+
+        Raises:
+            ValueError: If the reply is still unusable after MAX_REPAIR_ATTEMPTS repairs.
+        """
+        response, error = None, None
+        for attempt in range(MAX_REPAIR_ATTEMPTS + 1):
+            prompt = self.messages if attempt == 0 else self.repair_prompt(response, error)
+            print("[Decomposer] Sending prompt to LLM..." if attempt == 0 else "[Decomposer] Asking LLM to repair its JSON...")
+            try:
+                data, response = ask_llm_json(prompt, self.schema, "extractor", on_member if attempt == 0 else None)
+                print("[Decomposer] LLM response received. Building context object...")
+                #Using Pydantic here.
+                context = self.context_class.model_validate(data)
+                break
+            except ValueError as e:     # no JSON object, or pydantic ValidationError
+                if attempt == MAX_REPAIR_ATTEMPTS:
+                    raise
+                print(f"[Decomposer] Unusable LLM response: {e}")
+                error = e
+        current_span().set_attributes(repairs=attempt or None)
 
         print(f"[Decomposer] Context Object:\n{context}")
         print("[Decomposer] Context successfully built.\n")
         return context
 
+    def repair_prompt(self, response, error: Exception) -> list:
+        return get_messages(
+            "JSONRepair",
+            request=self.prompt,
+            response=response or "(no JSON object)",
+            error=str(error),
+            schema=json.dumps(self.schema, separators=(",", ":")),
+        )
+
 
 if __name__ == "__main__":
     demo_query = "Plan a 2 day itinerary in Jaipur covering Amer Fort and City Palace with a budget of 5000 INR."
@@ -1,72 +1,158 @@
-from typing import List, Dict, Callable, Any
+from typing import List, Dict, Callable, Any, Optional, Tuple
 from context import ItineraryPlannerContext
+from core.day_planner import plan_days
+from core.poi_scoring import (
+    select_top_pois,
+    estimate_tokens,
+    DEFAULT_TOP_K,
+    POI_PROMPT_TOKEN_BUDGET,
+)
+from core.prompt_format import format_compact_day_plan, format_context, format_poi_table, section_tokens
+from core.federation import Orchestrator
+from core.tracing import span
+from core.deadline import fit_llm_call
+from apis.llm_api import FAST_MODEL, get_profile
+from prompter import get_messages
 from steps import (
-    generate_poi_query,
-    get_places_for_queries,
+    get_poi_per_day,
     ask_llm,
-    add_demo_data,
-    extract_data_from_user_profile,
-    populate_context_from_user_profile
+    STEP_REGISTRY,
 )
 
 class Execute:
-    def __init__(self, selected_task: str, flow: List[str], context: Any, user_query: str):
+    def __init__(self, selected_task: str, flow: List[str], context: Any, user_query: str,
+                 memo: Optional[Dict[str, tuple]] = None):
         """
         Initialize the executor with the selected task, flow, context, and user query.
         Args:
             selected_task: Name of the selected task (e.g., "MeetingPointPlanner")
-            flow: List of step function names as strings
+            flow: Flow steps for the task, see flow.FLOW
             context: Context object (e.g., Pydantic model or dict)      
+            memo: Flow step results from an earlier run of this session, see Orchestrator
         """
         self.selected_task = selected_task
         self.flow = flow
         self.context = context
         self.user_query = user_query
+        self.memo = memo
+        # Flow steps answered from the memo
+        self.reused: List[str] = []
 
     def execute(self):
         
         if self.selected_task == "ItineraryPlanner":
-            itinerary_data = {
-                "city": self.context.city,
-                "travel_duration": self.context.travel_duration,
-                "pace": self.context.pace,
-                "interests": self.context.interests,
-                "must_see": self.context.must_see,
-                "activity_type": self.context.activity_type,
-            }
-            print("[MAIN] Itinerary Data prepared.")
-            
-            # User DB
-            # Federate
-            user_id = add_demo_data()
-            print("[EXECUTER] Demo Data Added.")
-            user_profile = extract_data_from_user_profile(user_id)
-            print("[EXECUTER] User Profile Fetched.")
+            # Federate: profile fetch, POI search and geocoding run as a dependency graph
+            print("[EXECUTER] Running flow steps.")
+            orchestrator = self.run_flow()
+            candidates = self.context.poi_candidates or []
+            start = orchestrator.state.get("start_coords")
 
-            # Execute
-            populate_context_from_user_profile(self.context,user_profile)
-            print("[EXECUTER] Context Filled.")
+            # Rank and prune candidates, keep must-see places
+            with span("score_pois", candidates=len(candidates)) as score_span:
+                ranked = select_top_pois(
+                    candidates,
+                    interests=self.context.interests or [],
+                    must_see=self.context.must_see or [],
+                    origin=start,
+                    top_k=DEFAULT_TOP_K,
+                )
+                self.context.poi_candidates = [poi for poi, _ in ranked]
+                if ranked:
+                    score_span.set_attributes(top_score=ranked[0][1], min_score=min(score for _, score in ranked))
+            print(f"[EXECUTER] Kept {len(self.context.poi_candidates)} of {len(candidates)} POIs.")
 
+            # Pre-plan days and travel order, the LLM only narrates
+            print("[EXECUTER] Planning days.")
+            with span("plan_days", days=self.context.travel_duration):
+                day_plan = plan_days(
+                    self.context.poi_candidates,
+                    days=self.context.travel_duration,
+                    poi_per_day=get_poi_per_day(self.context.pace),
+                    start=start,
+                )
+            day_plan_text = format_compact_day_plan(day_plan, start_label=self.context.start_loc)
 
-            # API DB
-            # Federate
-            
-            print("[EXECUTER] Making POI Queries for API.")
-            queries = generate_poi_query(itinerary_data)
-            # print("--------------------------------------------------------------------------------------")
-            print(queries)
+            # Unplanned candidates go in as alternatives, as a compact table within the token budget
+            planned = {stop.get("place_id") or stop.get("name") for day in day_plan for stop in day["stops"]}
+            alternatives = [p for p in self.context.poi_candidates if (p.get("place_id") or p.get("name")) not in planned]
+            alternatives_text, _ = format_poi_table(
+                alternatives, POI_PROMPT_TOKEN_BUDGET - estimate_tokens(day_plan_text)
+            )
 
-            # Execute
-            print("[EXECUTER] Getting POIs using API.")
-            self.context.poi_candidates = get_places_for_queries(queries)
-            
             #Integrate
             print("[EXECUTER] Final LLM Call.")
-            final = ask_llm("Plan me a detailed itinerary with the following data:\n" + str(self.context) + "\nUser Query:\n" + self.user_query)
+            trip_details = format_context(self.context, exclude={"poi_candidates"})
+            prompt = get_messages(
+                "ItineraryNarration",
+                day_plan=day_plan_text,
+                alternatives=alternatives_text or "None",
+                trip_details=trip_details,
+                user_query=self.user_query,
+            )
+            tokens = section_tokens({"day_plan": day_plan_text, "alternatives": alternatives_text,
+                                     "trip_details": trip_details})
+            prompt_tokens = estimate_tokens("".join(message["content"] for message in prompt))
+            print(f"[EXECUTER] Final prompt ~{prompt_tokens} tokens (day plan {tokens['day_plan']}, "
+                  f"alternatives {tokens['alternatives']}, trip details {tokens['trip_details']}).")
+            # Short on time: no reasoning, a faster model, fewer tokens (see core.deadline)
+            narrator = get_profile("narrator")
+            final = ask_llm(prompt, "narrator",
+                            **fit_llm_call(narrator.model, FAST_MODEL, narrator.max_tokens, narrator.thinking))
 
             return final
         
 
         elif self.selected_task == "MeetingPointPlanner":
-            # Implement execution logic for MeetingPointPlanner
-            pass
+            # Participants are geocoded as one batch; venue search is not implemented yet
+            print("[EXECUTER] Locating participants.")
+            orchestrator = self.run_flow()
+            return self.render_meeting_point(orchestrator.state.get("midpoint"))
+
+        elif self.selected_task == "RouteOptimizer":
+            print("[EXECUTER] Optimizing route order.")
+            orchestrator = self.run_flow()
+            return self.render_route(orchestrator.state["route_result"])
+
+    def run_flow(self) -> Orchestrator:
+        """Run the declared flow steps for the task over the context."""
+        orchestrator = Orchestrator(
+            selected_task=self.selected_task, flow=self.flow, context=self.context, user_query=self.user_query,
+            memo=self.memo,
+        )
+        orchestrator.register_steps(STEP_REGISTRY)
+        orchestrator.run()
+        if orchestrator.memoize:
+            self.memo, self.reused = orchestrator.memo, orchestrator.reused
+        return orchestrator
+
+    def render_meeting_point(self, midpoint: Optional[Dict[str, float]]) -> str:
+        """Markdown summary of where the participants are and the point between them."""
+        lines = ["### Meeting Point"]
+        for participant in self.context.participants:
+            label = participant.get("label") or participant.get("id") or "Participant"
+            where = participant.get("address") or ""
+            if participant.get("lat") is not None and participant.get("lon") is not None:
+                where = f"{where} ({participant['lat']:.4f}, {participant['lon']:.4f})".strip()
+            else:
+                where = f"{where} (not found)".strip()
+            lines.append(f"- {label}: {where}")
+        if midpoint:
+            lines.append(f"\nMidpoint: ({midpoint['lat']:.4f}, {midpoint['lon']:.4f})")
+        else:
+            lines.append("\nNo participant could be located, so there is no midpoint.")
+        return "\n".join(lines)
+
+    def render_route(self, result: Dict[str, Any]) -> str:
+        """Markdown summary of an optimized route."""
+        origin = self.context.origin
+        lines = ["### Optimized Route", f"Start: {origin.get('label') or (origin['lat'], origin['lon'])}"]
+        for count, (stop, slot) in enumerate(zip(result["destinations"], result["schedule"]), start=1):
+            label = stop.get("label") or f"({stop['lat']}, {stop['lon']})"
+            lines.append(f"{count}. {label} (arrive ~{slot['arrival']:.0f} min)")
+
+        route = result.get("route")
+        if route:
+            lines.append(f"\nTotal: {route.distance_m / 1000:.1f} km, {route.duration_s / 60:.0f} min")
+        else:
+            lines.append(f"\nEstimated total: {result['estimated_minutes']:.0f} min")
+        return "\n".join(lines)
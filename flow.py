@@ -27,27 +27,18 @@ FLOW = {
 'MeetingPointPlanner': [
 
     # 2️⃣ Fetch participant details from DB
-    'fetch_participant_details',         
+    # 'fetch_participant_details',
 
-    # 3️⃣ Geocode addresses (if needed)
-    'geocode_participant_addresses',     # Convert textual addresses into coordinates for calculations
+    # 3️⃣ Geocode addresses (if needed), all participants as one batch
+    {"step": "geocode_participant_addresses", "reads": ["participants"], "writes": ["participants"], "timeout": 20},
 
     # 6️⃣ Calculate optimal midpoint
-    'calculate_optimal_midpoint',        # Compute central or weighted midpoint location between participants
+    {"step": "calculate_optimal_midpoint", "reads": ["participants"], "writes": ["midpoint"]},
 
-
-    # 4️⃣ Generate candidate venues
-    'generate_candidate_venues',         # Query Google Places API based on cuisine_type, venue_type, budget, open_now
-
-    # 5️⃣ Pre-filter candidate venues
-    'pre_filter_venues',                 # Remove venues that don't satisfy time_window, max_travel_time, accessibility, or distance constraints
-
-
-    # 8️⃣ Generate response
-    'generate_narration',                # Optional: create human-readable explanation / suggestions for selected venues
-
-    # # 9️⃣ Return final result
-    'return_response'                    # Return selected venues, midpoint info, and structured data
+    # Not implemented yet:
+    # 4️⃣ 'generate_candidate_venues',   Query Google Places API based on cuisine_type, venue_type, budget, open_now
+    # 5️⃣ 'pre_filter_venues',           Remove venues that don't satisfy time_window, max_travel_time, accessibility, or distance constraints
+    # 8️⃣ 'generate_narration',          Optional: create human-readable explanation / suggestions for selected venues
 ],
 
 'ItineraryPlanner':[
@@ -67,6 +58,25 @@ FLOW = {
 
     # Pass the context to LLM for itinerary generation
 
+    # Steps declare what they read and write, the Orchestrator runs independent ones
+    # (profile fetch, POI search, geocoding) at the same time.
+    {"step": "fetch_user_profile", "reads": [], "writes": ["user_profile"], "timeout": 20},
+
+    # Queries use the context as extracted from the query, before profile defaults are applied
+    {"step": "generate_poi_queries",
+     "reads": ["city", "travel_duration", "pace", "interests", "must_see", "activity_type"],
+     "writes": ["queries"]},
+
+    {"step": "get_places_for_queries", "reads": ["queries"], "writes": ["poi_candidates"], "timeout": 60},
+
+    {"step": "locate_start", "reads": ["start_loc", "city"], "writes": ["start_coords"], "timeout": 15},
+
+    {"step": "apply_user_profile",
+     "reads": ["user_profile"],
+     "writes": ["city", "travel_duration", "pace", "interests", "dietary_preferences", "special_needs",
+                "transport_pref", "commute_pref", "budget_max", "accommodation_type", "activity_type",
+                "preferred_vacation_type"]},
+
 #DB
 
 #     fetch_user_preferences,
@@ -84,6 +94,11 @@ FLOW = {
 #     score_and_rank,    
 #     generate_narration,
 #     return_response
+],
+
+'RouteOptimizer': [
+    # Order destinations locally (nearest neighbour + 2-opt/Or-opt), then one Routes API call
+    {"step": "optimize_route", "reads": ["origin", "destinations", "constraints"], "writes": ["route_result"], "timeout": 30},
 ]
 }
 
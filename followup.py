@@ -0,0 +1,214 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from steps import ask_llm_json
+from prompter import get_messages
+from core.tracing import traced
+
+PACES = ["relaxed", "moderate", "fast"]
+
+# What the FollowUpChanges prompt asks for
+FOLLOWUP_SCHEMA = {
+    "title": "FollowUpChanges",
+    "type": "object",
+    "properties": {
+        "changes": {"type": "object"},
+        "new_request": {"type": "boolean"},
+    },
+}
+
+NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7}
+_NUMBER = r"(\d+|a|an|one|two|three|four|five|six|seven)"
+
+_SLOWER_RE = re.compile(r"\b(more relaxed|relax|leisurely|slower|slow down|less rushed|less packed|fewer places)\b", re.I)
+_FASTER_RE = re.compile(r"\b(faster|more packed|busier|fit in more|more places|speed up)\b", re.I)
+_PACE_RE = re.compile(r"\b(relaxed|moderate|fast)\s+pace\b", re.I)
+_DAY_N_RE = re.compile(r"\bday\s*\d+\b", re.I)
+_SET_DAYS_RE = re.compile(rf"\b(?:make it|for|change (?:it )?to|only|just)\s+{_NUMBER}\s+days?\b", re.I)
+_ADD_DAYS_RE = re.compile(rf"\b(?:add|extend (?:it )?by)\s+{_NUMBER}\s+(?:more\s+|extra\s+)?days?\b|\b{_NUMBER}\s+more\s+days?\b", re.I)
+_REMOVE_DAYS_RE = re.compile(rf"\b(?:remove|drop|cut|shorten (?:it )?by)\s+{_NUMBER}\s+days?\b|\b{_NUMBER}\s+(?:day|days)\s+(?:less|fewer)\b", re.I)
+_BUDGET_RE = re.compile(
+    r"\bbudget\b[^\d]{0,20}([\d,]*\.?\d+)\s*(k|thousand|l|lakhs?|lacs?|cr|crores?|m|million)?\b", re.I
+)
+BUDGET_UNITS = {"k": 1e3, "thousand": 1e3, "l": 1e5, "lakh": 1e5, "lac": 1e5, "cr": 1e7, "crore": 1e7,
+                "m": 1e6, "million": 1e6}
+MIN_BUDGET = 100    # a bare smaller number is more likely people or days ("budget for 2"): left to the LLM
+# Where a list of places ends: the end of the sentence or the start of another instruction
+# ("add Jal Mahal, and make it more relaxed")
+_VERBS = r"(?:make|set|change|keep|plan|start(?:ing)?|stay(?:ing)?|extend|shorten|cut|budget|add|include" \
+         r"|also visit|also see|also cover|skip|remove|drop|exclude|leave out)"
+_CLAUSE_END = rf"(?=$|[.;!?]|,?\s+(?:(?:and|then|but)\s+)?(?:please\s+)?{_VERBS}\b)"
+_START_RE = re.compile(rf"\b(?:start(?:ing)?|staying)\s+(?:from|at)\s+([^,.;]+?)(?=,|{_CLAUSE_END})", re.I)
+_ADD_PLACES_RE = re.compile(rf"\b(?:add|include|also visit|also see|also cover)\s+([^.;!?]+?){_CLAUSE_END}", re.I)
+_REMOVE_PLACES_RE = re.compile(rf"\b(?:skip|remove|drop|exclude|leave out)\s+([^.;!?]+?){_CLAUSE_END}", re.I)
+_PLACE_SPLIT_RE = re.compile(r"\s*(?:,|\band\b|&)\s*", re.I)
+# "add more museums", "include some food": a kind of place, not a place to pin
+_QUANTIFIER_RE = re.compile(
+    r"^(?:(?:more|some|any|few|several|many|other|another|extra|a few|a couple(?: of)?|a lot of|lots of|a bit of)\s+)+", re.I
+)
+# Kinds of places that go to interests when added without a quantifier ("add museums"), singular
+CATEGORIES = {
+    "museum", "gallery", "art", "history", "heritage", "culture", "monument", "temple", "fort", "palace",
+    "park", "garden", "nature", "lake", "viewpoint", "market", "bazaar", "shopping", "food", "street food",
+    "local food", "cuisine", "restaurant", "cafe", "nightlife", "bar", "adventure", "sightseeing",
+}
+
+
+def _number(text: str) -> int:
+    return int(text) if text.isdigit() else NUMBER_WORDS[text.lower()]
+
+
+def _budget(match: "re.Match") -> Optional[int]:
+    """The budget in a _BUDGET_RE match ("5k" -> 5000, "1.5 lakh" -> 150000), None if it is not believable."""
+    amount = float(match.group(1).replace(",", ""))
+    unit = (match.group(2) or "").lower()
+    amount *= BUDGET_UNITS.get(unit.rstrip("s") if unit not in BUDGET_UNITS else unit, 1)
+    return int(amount) if amount >= MIN_BUDGET else None
+
+
+def _places(text: str) -> List[str]:
+    return [p.strip(" '\"") for p in _PLACE_SPLIT_RE.split(text) if p.strip(" '\"")]
+
+
+def _singular(word: str) -> str:
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    return word[:-1] if word.endswith("s") and not word.endswith("ss") else word
+
+
+def _category(text: str) -> Optional[str]:
+    """
+    The interest an added item asks for if it is a kind of place rather than a place:
+    "museums" -> "museums", "more museums" -> "museums", "some local food" -> "local food".
+    "" for quantified items that name no known kind ("some more stuff"), None for places.
+    """
+    rest = _QUANTIFIER_RE.sub("", text).strip()
+    words = rest.lower().split()
+    if not words:
+        return ""
+    kind = " ".join(words[:-1] + [_singular(words[-1])])
+    if kind in CATEGORIES:
+        return rest
+    if rest != text:
+        return rest if _singular(words[-1]) in CATEGORIES else ""
+    return None
+
+
+class FollowUpParser:
+    """
+    Turns a follow-up message ("make it more relaxed", "add Jal Mahal", "make it 4 days")
+    into changes to the session's context.
+
+    Common follow-ups are handled by rules without an LLM call. Anything else goes to the
+    LLM once, which either returns the changed fields or says the message is a new request.
+    """
+
+    def __init__(self, context: Any):
+        self.context = context
+        self.fields = set(type(context).model_fields)
+
+    def rule_based_changes(self, message: str) -> Optional[Dict[str, Any]]:
+        """Changed fields, {} if the message only asks to adjust the answer, None if not recognised."""
+        context, changes = self.context, {}
+        recognised = False
+        # Spans of the message already understood, taken out before looking for place names
+        matched: List["re.Match"] = []
+
+        if "pace" in self.fields:
+            current = (context.pace or "moderate").lower()
+            step = PACES.index(current) if current in PACES else 1
+            explicit = _PACE_RE.search(message)
+            if _DAY_N_RE.search(message) and (_SLOWER_RE.search(message) or _FASTER_RE.search(message)):
+                # "make day 2 more relaxed": one day only, the narration handles it
+                recognised = True
+            elif explicit:
+                changes["pace"] = explicit.group(1).lower()
+            elif _SLOWER_RE.search(message):
+                changes["pace"] = PACES[max(step - 1, 0)]
+            elif _FASTER_RE.search(message):
+                changes["pace"] = PACES[min(step + 1, len(PACES) - 1)]
+            matched += [m for regex in (_PACE_RE, _SLOWER_RE, _FASTER_RE) for m in regex.finditer(message)]
+
+        if "travel_duration" in self.fields:
+            days = context.travel_duration or 1
+            if match := _ADD_DAYS_RE.search(message):
+                changes["travel_duration"] = days + _number(match.group(1) or match.group(2))
+            elif match := _REMOVE_DAYS_RE.search(message):
+                changes["travel_duration"] = max(1, days - _number(match.group(1) or match.group(2)))
+            elif match := _SET_DAYS_RE.search(message):
+                changes["travel_duration"] = _number(match.group(1))
+            matched += [m for regex in (_ADD_DAYS_RE, _REMOVE_DAYS_RE, _SET_DAYS_RE) for m in regex.finditer(message)]
+
+        if "budget_max" in self.fields and (match := _BUDGET_RE.search(message)):
+            budget = _budget(match)
+            if budget is None:
+                # "budget for 2": do not guess, the LLM reads the whole message
+                return None
+            changes["budget_max"] = budget
+            matched.append(match)
+
+        if "start_loc" in self.fields and (match := _START_RE.search(message)):
+            changes["start_loc"] = match.group(1).strip()
+            matched.append(match)
+
+        # "make it 4 days and add Jal Mahal": places are looked for in what is left
+        rest = message
+        for match in matched:
+            rest = rest[:match.start()] + ";" * (match.end() - match.start()) + rest[match.end():]
+
+        if "must_see" in self.fields:
+            must_see = list(context.must_see or [])
+            for match in _ADD_PLACES_RE.finditer(rest):
+                items = _places(match.group(1))
+                kinds = [k for k in map(_category, items) if k]
+                places = [p for p in items if _category(p) is None]
+                if kinds and "interests" in self.fields:
+                    interests = list(changes.get("interests", context.interests) or [])
+                    new = [k for k in kinds if k.lower() not in {i.lower() for i in interests}]
+                    if new:
+                        changes["interests"] = interests + new
+                    recognised = True
+                added = [p for p in places if p.lower() not in {m.lower() for m in must_see}]
+                if added:
+                    must_see += added
+                    changes["must_see"] = must_see
+            for match in _REMOVE_PLACES_RE.finditer(rest):
+                removed = {p.lower() for p in _places(match.group(1))}
+                kept = [m for m in must_see if m.lower() not in removed]
+                if len(kept) != len(must_see):
+                    must_see = changes["must_see"] = kept
+
+        if changes or recognised:
+            return changes
+        return None
+
+    def llm_changes(self, message: str) -> Optional[Dict[str, Any]]:
+        """Changed fields according to the LLM, or None if it sees a new request (or answers badly)."""
+        current = self.context.fast_dump(exclude={"poi_candidates"})
+        prompt = get_messages("FollowUpChanges", context=json.dumps(current, default=str), message=message)
+        try:
+            data, _ = ask_llm_json(prompt, FOLLOWUP_SCHEMA, "extractor")
+        except ValueError:
+            print("[FollowUpParser] No JSON in LLM response, treating as a new request.")
+            return None
+        if not isinstance(data, dict) or data.get("new_request") or not isinstance(data.get("changes"), dict):
+            return None
+        return {k: v for k, v in data["changes"].items() if k in self.fields and k != "poi_candidates"}
+
+    @traced("followup.parse")
+    def parse(self, message: str) -> Optional[Dict[str, Any]]:
+        changes = self.rule_based_changes(message)
+        if changes is not None:
+            print(f"[FollowUpParser] Rule-based changes: {changes}")
+            return changes
+        changes = self.llm_changes(message)
+        print(f"[FollowUpParser] LLM changes: {changes}")
+        return changes
+
+    def apply(self, changes: Dict[str, Any]) -> Any:
+        """A new, validated context with the changes applied. Raises pydantic.ValidationError on bad values."""
+        # Unset fields keep their model defaults instead of being re-validated
+        data = self.context.model_dump(exclude_unset=True)
+        data.update(changes)
+        return type(self.context).model_validate(data)
@@ -3,24 +3,79 @@ from decomp import Decomposer
 from steps import initialize_services,ask_llm
 from flow import FLOW
 from executor import Execute
-from prompter import get_prompt
+from prompter import get_messages
+from core.tracing import span
+from core.singleflight import SingleFlight
+from core.session_store import Session, SessionStore
+from followup import FollowUpParser
+from prefetch import POIPrefetcher, prefetch_enabled
+from core.deadline import deadline, degradations, describe
+import os
 
+# Identical queries arriving together share one pipeline run
+_pipeline_flight = SingleFlight()
 
-def main(demo_query):
+# Conversations, so a follow-up refines the last request instead of starting over
+_sessions = SessionStore()
+
+# Seconds a request may take; as the time runs out the pipeline cuts corners to finish (core.deadline)
+PIPELINE_DEADLINE_S = float(os.getenv("PIPELINE_DEADLINE_S", "120"))
+
+
+def main(demo_query, session_id=None, deadline_s=None):
+    """
+    Answer one query. Within a session, follow-ups refine the previous answer.
+    If the pipeline had to degrade to finish within deadline_s, the answer ends with a note saying how.
+    """
+    with span("pipeline") as pipeline_span, deadline(deadline_s or PIPELINE_DEADLINE_S) as budget:
+        pipeline_span.set_attributes(session_id=session_id)
+        key = " ".join(demo_query.split())
+        if session_id is not None:
+            key = (session_id, key)
+        final, applied = _pipeline_flight.do(key, _run_reporting, demo_query, pipeline_span, session_id)
+        # Requests that shared another's run share its degradations too
+        for name in applied:
+            budget.record(name)
+    if applied and isinstance(final, str):
+        final = f"{final}\n\n---\n_{describe(applied)}_"
+    return final
+
+
+def _run_reporting(demo_query, pipeline_span, session_id=None):
+    final = _run_pipeline(demo_query, pipeline_span, session_id)
+    return final, degradations()
+
+
+def _run_pipeline(demo_query, pipeline_span, session_id=None):
 
 #Initialize Everything
     initialize_services()
 
+#Follow-up on an earlier request in this session
+    if session_id is not None and _sessions.get(session_id) is not None:
+        with _sessions.lock(session_id):
+            final = run_followup(_sessions.get(session_id), demo_query, pipeline_span)
+        if final is not None:
+            return final
+
 #Query Analyser
     analyzer = QueryAnalyzer()
     selected_task = analyzer.select_task(demo_query)
     print(f"[MAIN] Selected Task: {selected_task}")
+    pipeline_span.set_attribute("task", selected_task)
 
     if selected_task == "NoneOfThese":
-        return ask_llm(get_prompt("NoneOfThese", user_query=demo_query))
+        return ask_llm(get_messages("NoneOfThese", user_query=demo_query), "narrator")
 #Decomposer
     decomposer = Decomposer(query=demo_query, task=selected_task)
-    context = decomposer.run()
+    # Places searches start as soon as the streamed reply names the city and must-see places
+    prefetcher = POIPrefetcher() if prefetch_enabled(selected_task) else None
+    context = None
+    try:
+        context = decomposer.run(on_member=prefetcher.on_member if prefetcher else None)
+    finally:
+        if prefetcher is not None:
+            prefetcher.reconcile(context)
 
 #Get Flow
     flow = FLOW.get(selected_task, [])
@@ -29,12 +84,61 @@ def main(demo_query):
 
 #Federator and Executor and Integrate
 
-    executor = Execute(selected_task=selected_task, flow=flow, context=context, user_query=demo_query)
-    final = executor.execute()
+    # Step outputs get merged into the context, keep it as the Decomposer left it for follow-ups
+    snapshot = context.model_copy(deep=True) if session_id is not None else None
+    memo = {} if session_id is not None else None
+
+    with span("execute", task=selected_task):
+        executor = Execute(selected_task=selected_task, flow=flow, context=context, user_query=demo_query, memo=memo)
+        final = executor.execute()
     
     print(f"[MAIN] Final Output for {selected_task}: \n {final}")
 
+    if session_id is not None:
+        _sessions.save(Session(session_id=session_id, task=selected_task, context=snapshot,
+                               user_query=demo_query, memo=executor.memo or {}, result=final))
+
     return final 
+
+
+def run_followup(session, message, pipeline_span):
+    """
+    Re-run the session's task with the follow-up's changes applied to its context.
+    Flow steps whose inputs did not change reuse their earlier results.
+
+    Returns:
+        The new answer, or None if the message is a new request (or the session is gone).
+    """
+    if session is None:
+        return None
+    parser = FollowUpParser(session.context)
+    changes = parser.parse(message)
+    if changes is None:
+        print("[MAIN] Follow-up looks like a new request, running the full pipeline.")
+        return None
+    try:
+        context = parser.apply(changes)
+    except ValueError as e:
+        print(f"[MAIN] Follow-up changes {changes} are invalid ({e}), running the full pipeline.")
+        return None
+
+    snapshot = context.model_copy(deep=True)
+    pipeline_span.set_attributes(task=session.task, followup=True, changed=",".join(changes) or None)
+    session.followups.append(message)
+    try:
+        with span("execute", task=session.task, followup=True):
+            executor = Execute(selected_task=session.task, flow=FLOW.get(session.task, []), context=context,
+                               user_query=session.conversation(), memo=session.memo)
+            final = executor.execute()
+    except BaseException:
+        session.followups.pop()
+        raise
+    pipeline_span.set_attributes(reused_steps=",".join(executor.reused) or None)
+    print(f"[MAIN] Follow-up reused steps: {executor.reused or 'none'}")
+
+    session.context, session.memo, session.result = snapshot, executor.memo or {}, final
+    _sessions.save(session)
+    return final
     
 # Render in Streamlit
 
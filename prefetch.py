@@ -0,0 +1,121 @@
+"""
+Speculative POI searches while the Decomposer is still streaming.
+
+The ItineraryPlanner flow searches Places only once Decomposer.run has returned a
+validated context, but "city" is the first field the model writes and "must_see"
+arrives well before the end of the reply. POIPrefetcher is fed the partial JSON
+(Decomposer.run(on_member=...)) and starts the city-level and must-see searches that
+generate_poi_query will ask for as soon as those fields are complete, so the Places
+calls overlap the rest of the LLM stream.
+
+Reconciling with the final context:
+
+    - A prefetched query the flow also asks for is served from the places_search cache,
+      or joins the still running call (GooglePlacesClient coalesces identical in-flight
+      searches), so nothing is fetched twice.
+    - reconcile(context) cancels the prefetches the final queries do not contain (the
+      Decomposer's JSON failed validation and the repaired reply differs, or it raised)
+      as far as they have not started, and reports what was used and what was wasted.
+
+Set POI_PREFETCH=0 to turn it off.
+"""
+import contextvars
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from core.deadline import running_low
+from core.tracing import current_span, span
+from steps import POI_SEARCH_RESERVE_S, generate_poi_query, search_places
+
+PREFETCH_ENABLED = os.getenv("POI_PREFETCH", "1") != "0"
+PREFETCH_TASKS = {"ItineraryPlanner"}
+PREFETCH_WORKERS = 4
+# Upper bound on speculative searches per request, the cost if the guess is wrong
+MAX_PREFETCH_QUERIES = int(os.getenv("POI_PREFETCH_MAX", "6"))
+
+
+def prefetch_enabled(task: str) -> bool:
+    return PREFETCH_ENABLED and task in PREFETCH_TASKS
+
+
+def expected_queries(fields: Dict[str, Any]) -> List[str]:
+    """The city-level and must-see searches generate_poi_query asks for with these fields."""
+    return generate_poi_query({
+        "city": fields.get("city"),
+        "travel_duration": 1,
+        "pace": None,
+        "interests": None,
+        "must_see": fields.get("must_see") or [],
+        "activity_type": None,
+    })
+
+
+class POIPrefetcher:
+    """Starts Places searches from a Decomposer's partial output. Not thread-safe: one per request."""
+
+    def __init__(self, max_queries: int = MAX_PREFETCH_QUERIES, workers: int = PREFETCH_WORKERS):
+        self.max_queries = max_queries
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._futures: Dict[str, Future] = {}
+
+    def on_member(self, data: Dict[str, Any]):
+        """Decomposer callback: search for whatever the fields received so far already determine."""
+        # Runs inside the LLM stream loop: speculation must never fail the request
+        try:
+            self._prefetch(data)
+        except Exception as e:
+            print(f"[Prefetch] Skipped early searches: {e!r}")
+
+    def _prefetch(self, data: Dict[str, Any]):
+        city = data.get("city")
+        must_see = data.get("must_see")
+        if not isinstance(city, str) or not city.strip():
+            return
+        if not isinstance(must_see, list) or not all(isinstance(m, str) for m in must_see):
+            must_see = []
+        for query in expected_queries({"city": city, "must_see": must_see}):
+            if query in self._futures or len(self._futures) >= self.max_queries:
+                continue
+            if self._futures and running_low(POI_SEARCH_RESERVE_S):
+                # Short on time the flow only searches the first query, see get_places_for_queries
+                break
+            print(f"[Prefetch] Searching early: '{query}'")
+            # copy_context keeps the request's trace and deadline on the worker thread
+            self._futures[query] = self._pool.submit(contextvars.copy_context().run, self._search, query)
+
+    @staticmethod
+    def _search(query: str):
+        with span("prefetch.search", query=query):
+            try:
+                search_places(query)
+            except Exception as e:
+                # Speculative: the flow searches again and surfaces the error if it persists
+                print(f"[Prefetch] Search failed for '{query}': {e!r}")
+
+    def reconcile(self, context: Optional[Any]) -> Dict[str, int]:
+        """
+        Match the prefetches against the final context's queries (None: the Decomposer failed)
+        and cancel the unneeded ones that have not started.
+
+        Returns:
+            {"prefetched", "used", "cancelled", "wasted"}
+        """
+        wanted = set()
+        if context is not None and getattr(context, "city", None):
+            wanted = set(expected_queries({"city": context.city, "must_see": context.must_see}))
+        stats = {"prefetched": len(self._futures), "used": 0, "cancelled": 0, "wasted": 0}
+        for query, future in self._futures.items():
+            if query in wanted:
+                stats["used"] += 1
+            elif future.cancel():
+                stats["cancelled"] += 1
+            else:
+                stats["wasted"] += 1
+        # Running searches finish on their own and fill the cache
+        self._pool.shutdown(wait=False)
+        if stats["prefetched"]:
+            print(f"[Prefetch] {stats['used']} of {stats['prefetched']} early searches used, "
+                  f"{stats['cancelled']} cancelled, {stats['wasted']} wasted.")
+            current_span().set_attributes(**{f"prefetch_{k}": v for k, v in stats.items()})
+        return stats
@@ -1,8 +1,96 @@
+"""
+Prompt templates, compiled and validated once at import.
+
+Every template declares the variables it takes in PROMPT_VARIABLES. At import each one
+is parsed into literal text and {variable} slots, and checked: a field that is not a
+declared variable (typically JSON braces in the text that were not doubled, {{ }}),
+a declared variable the text never uses, or malformed braces raise PromptTemplateError
+right away instead of failing a request after its LLM calls were spent.
+
+Variable parts come last in each template, after the fixed instructions, so consecutive
+calls of one kind share a long identical prefix (PromptTemplate.prefix), which is what
+provider-side prompt caching reuses. get_messages sends that fixed part as the system
+message and the rest as the user message:
+
+    ask_llm(get_messages("query_analyser", user_query=query, tasks=tasks), "router")
+"""
+import string
+import textwrap
+from typing import Dict, List, Optional, Tuple
+
+
+class PromptTemplateError(ValueError):
+    pass
+
+
+class PromptTemplate:
+    """A template parsed once into (literal text, variable) parts."""
+
+    def __init__(self, key: str, text: str, variables: Tuple[str, ...]):
+        self.key = key
+        self.text = textwrap.dedent(text).lstrip("\n").rstrip(" \t")
+        self.variables = tuple(variables)
+        self._parts: List[Tuple[str, Optional[str]]] = []
+        try:
+            parsed = list(string.Formatter().parse(self.text))
+        except ValueError as e:
+            raise PromptTemplateError(f"Prompt '{key}': {e} (double literal braces as {{{{ }}}})") from None
+        for literal, field, spec, conversion in parsed:
+            if field is not None and (not field.isidentifier() or spec or conversion):
+                raise PromptTemplateError(
+                    f"Prompt '{key}': {{{field}{':' + spec if spec else ''}}} is not a variable "
+                    f"(double literal braces as {{{{ }}}})"
+                )
+            if field is not None and field not in self.variables:
+                raise PromptTemplateError(f"Prompt '{key}': undeclared variable {{{field}}}")
+            self._parts.append((literal, field))
+        unused = set(self.variables) - {field for _, field in self._parts if field}
+        if unused:
+            raise PromptTemplateError(f"Prompt '{key}': declared variables not in the text: {sorted(unused)}")
+        # Text before the first variable, identical for every call of this template
+        prefix = []
+        for literal, field in self._parts:
+            prefix.append(literal)
+            if field:
+                break
+        self.prefix = "".join(prefix)
+        # The system message: the prefix up to its last paragraph (or line) break, so a
+        # heading such as "User query:" stays with the value it introduces
+        cut = self.prefix.rfind("\n\n")
+        if cut < 0:
+            cut = self.prefix.rfind("\n")
+        self._system_end = max(cut, 0)
+        self.system = self.prefix[:self._system_end].strip()
+
+    def render(self, **values) -> str:
+        missing = [v for v in self.variables if v not in values]
+        if missing:
+            raise PromptTemplateError(f"Prompt '{self.key}' is missing variables: {missing}")
+        return "".join(literal + (str(values[field]) if field else "") for literal, field in self._parts)
+
+
+    def messages(self, **values) -> List[Dict[str, str]]:
+        """Chat messages: the fixed system part, then the rest as the user message."""
+        text = self.render(**values)
+        if not self.system:
+            return [{"role": "user", "content": text}]
+        return [{"role": "system", "content": self.system},
+                {"role": "user", "content": text[self._system_end:].strip()}]
+
+
 def get_prompt(key: str, **kwargs) -> str:
-    template = PROMPT_TEMPLATES.get(key)
+    template = PROMPTS.get(key)
     if not template:
         raise ValueError(f"Prompt key '{key}' not found.")
-    return template.format(**kwargs)
+    return template.render(**kwargs)
+
+
+def get_messages(key: str, **kwargs) -> List[Dict[str, str]]:
+    """The prompt as [system, user] chat messages, see PromptTemplate.messages."""
+    template = PROMPTS.get(key)
+    if not template:
+        raise ValueError(f"Prompt key '{key}' not found.")
+    return template.messages(**kwargs)
 
 
 
@@ -17,7 +105,7 @@ PROMPT_TEMPLATES = {
 
 
 
-    "query_analyser": "You are a travel assistant task selector.A user gave this query: {user_query} Choose **exactly one** task from the following list that best fits the user's intent: {tasks} Only output the **task name**. Do not include any explanations or extra text.",
+    "query_analyser": "You are a travel assistant task selector. Choose **exactly one** task from the list below that best fits the user's intent. Only output the **task name**. Do not include any explanations or extra text.\nTasks: {tasks}\nUser query: {user_query}",
     
     
 
@@ -83,11 +171,12 @@ Return a single SQL query following the above rules.
 
     "TripSuggestion": """
     You are an assistant that extracts structured trip suggestion parameters.
-    Output JSON: {"city": str, "days": int, "interests": [str], "pace": "slow|moderate|fast", "budget": str|int|null}
+    Output JSON: {{"city": str, "days": int, "interests": [str], "pace": "slow|moderate|fast", "budget": str|int|null}}
+    Return ONLY JSON.
+
     User query:
     "{query}"
-    Return ONLY JSON.
-    """, 
+    """,
 
 
     "ItineraryPlanner": """
@@ -114,27 +203,83 @@ Return a single SQL query following the above rules.
             "special_notes": str|null         
         }}
 
+        Return ONLY JSON. Do not add explanations or extra text.
+
         User query:
         "{query}"
-
-        Return ONLY JSON. Do not add explanations or extra text.
         """,
 
 
+    "ItineraryNarration": """
+You are a travel planner. The day-wise plan below is already final: POIs are grouped by day and ordered
+to minimise travel, with estimated travel times between stops. Do not reorder stops or move them between days.
+
+Write a detailed itinerary from it: approximate visit duration at each spot, best times to visit,
+travel times between locations, meal breaks and any extra suggestions the user asked for.
+
+Day-wise plan:
+{day_plan}
+
+Other nearby options (use for hidden gems, eateries or swaps if the user asked):
+{alternatives}
+
+Trip details:
+{trip_details}
+
+User Query:
+{user_query}
+""",
+
+
+    "JSONRepair": """
+Your previous reply to the request below could not be used.
+Reply again with a single corrected JSON object matching this JSON schema, and nothing else:
+{schema}
+
+Request:
+{request}
+
+Your reply:
+{response}
+
+Problem:
+{error}
+""",
+
+
+    "FollowUpChanges": """
+The user already has an answer for a request, and sent a follow-up message about it.
+If the message refines the same request, reply with the fields that change and their new values:
+{{"changes": {{"field": new value}}}}
+Use only the field names of the request details, and give list fields in full (e.g. the whole new must_see list).
+If the message only asks to reword or adjust the answer itself, reply {{"changes": {{}}}}.
+If it is a different request altogether, reply {{"new_request": true}}.
+Reply with the JSON object only.
+
+Request details:
+{context}
+
+Follow-up message:
+"{message}"
+""",
+
+
     "NoneOfThese": """
-    You are a map assistant. The user's query does not fit into any predefined category. 
-    Respond directly and naturally to the user's query: {{user_query}} — do not include any introductory or meta statements before your answer. 
+    You are a map assistant. The user's query does not fit into any predefined category.
+    Respond directly and naturally to the user's query — do not include any introductory or meta statements before your answer.
     After providing your full response, conclude with a short statement such as:
     "I can also assist you more precisely with map-related tasks, like planning trips and routes."
+    User query: {user_query}
     """,
 
 
     "ReviewSummarizer": """
     Extract target for review summarization.
-    Output JSON: {"poi_id": str|null, "poi_name": str|null, "timeframe": str, "sentiment_focus": "overall|positive|negative"}
+    Output JSON: {{"poi_id": str|null, "poi_name": str|null, "timeframe": str, "sentiment_focus": "overall|positive|negative"}}
+    Return ONLY JSON.
+
     User query:
     "{query}"
-    Return ONLY JSON.
     """,
 
 
@@ -168,9 +313,6 @@ Return a single SQL query following the above rules.
         "special_notes": str|null
     }}
 
-    User query:
-    "{query}"
-
     Instructions:
     - Extract all participants and assign IDs or labels where possible.  
     - Determine participant constraints and travel preferences.  
@@ -178,24 +320,55 @@ Return a single SQL query following the above rules.
     - Extract time_window if specified.
     - Identify constraints such as avoid_long_distance or accessibility_needs.
     - Return ONLY JSON; do not include explanations or extra text.
+
+    User query:
+    "{query}"
     """,
 
 
     "RouteOptimizer": """
     Extract origin and destinations for route optimization.
-    Output JSON: {"origin": {"lat": float, "lon": float, "label": str|null}, "destinations": [{"lat": float, "lon": float, "label": str|null}],
-    "constraints": {}}
+    Output JSON: {{"origin": {{"lat": float, "lon": float, "label": str|null}}, "destinations": [{{"lat": float, "lon": float, "label": str|null}}],
+    "constraints": {{}}}}
+    Return ONLY JSON.
+
     User query:
     "{query}"
-    Return ONLY JSON.
     """,
 
 
     "TripJournalManager": """
     Extract trip journal parameters.
-    Output JSON: {"user_id": str|null, "trip_id": str|null, "start_date": str|null, "end_date": str|null, "tags": [str]}
+    Output JSON: {{"user_id": str|null, "trip_id": str|null, "start_date": str|null, "end_date": str|null, "tags": [str]}}
+    Return ONLY JSON.
+
     User query:
     "{query}"
-    Return ONLY JSON.
     """,
 }
+
+
+# Variables each template takes, checked against its text at import
+PROMPT_VARIABLES: Dict[str, Tuple[str, ...]] = {
+    "summarize": (),
+    "qa": ("domain",),
+    "translate": ("source_lang", "target_lang"),
+    "creative_story": (),
+    "query_analyser": ("tasks", "user_query"),
+    "sql": ("context", "user_id"),
+    "sql2": ("user_id",),
+    "TripSuggestion": ("query",),
+    "ItineraryPlanner": ("query",),
+    "ItineraryNarration": ("day_plan", "alternatives", "trip_details", "user_query"),
+    "JSONRepair": ("schema", "request", "response", "error"),
+    "FollowUpChanges": ("context", "message"),
+    "NoneOfThese": ("user_query",),
+    "ReviewSummarizer": ("query",),
+    "MeetingPointPlanner": ("query",),
+    "RouteOptimizer": ("query",),
+    "TripJournalManager": ("query",),
+}
+
+PROMPTS: Dict[str, PromptTemplate] = {
+    key: PromptTemplate(key, text, PROMPT_VARIABLES.get(key, ())) for key, text in PROMPT_TEMPLATES.items()
+}
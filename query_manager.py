@@ -1,5 +1,6 @@
-from prompter import get_prompt
+from prompter import get_messages
 from steps import ask_llm
+from core.tracing import traced
 
 class QueryAnalyzer:
 
@@ -16,13 +17,14 @@ class QueryAnalyzer:
     def __init__(self):
         print("[QueryAnalyzer] Initializing...")
 
+    @traced("route")
     def select_task(self, user_query: str) -> str:
         print(f"[QueryAnalyzer] Received query.")
 
-        prompt = get_prompt("query_analyser", user_query=user_query, tasks=', '.join(self.TASKS))
+        prompt = get_messages("query_analyser", user_query=user_query, tasks=', '.join(self.TASKS))
         print(f"[QueryAnalyzer] Modified prompt. Sending to LLM...")
 
-        response = ask_llm(prompt).strip()
+        response = ask_llm(prompt, "router").strip()
         print(f"[QueryAnalyzer] LLM response received.")
 
         # Set Default to TripSuggestion if unexpected output
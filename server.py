@@ -0,0 +1,176 @@
+"""
+HTTP API for the assistant, for serving many users from one process.
+
+    uvicorn server:app --host 0.0.0.0 --port 8000
+    curl -X POST localhost:8000/query -H "Content-Type: application/json" -d '{"query": "Plan 2 days in Jaipur"}'
+
+main.main is blocking, so requests run on a bounded worker pool while the event loop
+keeps accepting connections:
+
+    - SERVER_MAX_WORKERS requests run at once (default 8).
+    - Up to SERVER_MAX_QUEUE more wait for a worker (default 32). Beyond that the server
+      answers 503 with Retry-After instead of piling up work.
+    - Every request has a deadline (the "timeout_s" field, capped at SERVER_REQUEST_TIMEOUT_S,
+      default 120), covering both queueing and running. Past it the client gets 504.
+      A running pipeline cannot be interrupted, so its worker slot is only freed once it ends.
+      The pipeline itself gets what is left of the deadline and degrades to finish within it
+      (see core.deadline); the response lists any degradations applied.
+
+Clients (LLM, Places, geocoder, DB pool) are created once at startup and shared;
+each request gets its own context objects from the Decomposer. With CACHE_WARM_INTERVAL_S
+set, warmer.py keeps the caches for popular cities filled in the background.
+"""
+import asyncio
+import contextvars
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+
+from main import main
+from steps import initialize_services, close_db_pool, llm_backend_stats
+from core.tracing import span
+from core.rate_limit import rate_limit_stats
+from core.deadline import DeadlineExceeded, deadline
+import warmer
+
+SERVER_MAX_WORKERS = int(os.getenv("SERVER_MAX_WORKERS", "8"))
+SERVER_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "32"))
+SERVER_REQUEST_TIMEOUT_S = float(os.getenv("SERVER_REQUEST_TIMEOUT_S", "120"))
+RETRY_AFTER_S = 2
+# The pipeline aims to finish this long before the request deadline, so the answer still gets out
+DEADLINE_MARGIN_S = 2.0
+CACHE_WARM_INTERVAL_S = float(os.getenv("CACHE_WARM_INTERVAL_S", "0"))
+
+
+class Overloaded(Exception):
+    """Raised when the wait queue is full."""
+
+
+class WorkerPool:
+    """Runs blocking calls on a fixed number of threads, with a bounded wait queue and deadlines."""
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="request")
+        self.slots = asyncio.Semaphore(max_workers)
+        self.queued = 0
+        self.running = 0
+
+    async def run(self, func: Callable, *args, timeout: float) -> Any:
+        """
+        Run func(*args) on a worker thread.
+
+        Raises:
+            Overloaded: If the wait queue is full.
+            asyncio.TimeoutError: If the deadline passes while queued or running.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        if self.slots.locked() and self.queued >= self.max_queue:
+            raise Overloaded()
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), timeout)
+        finally:
+            self.queued -= 1
+
+        self.running += 1
+        future = loop.run_in_executor(self.executor, contextvars.copy_context().run, func, *args)
+        future.add_done_callback(self._release)
+        # shield: on timeout the thread keeps its slot until it really finishes
+        return await asyncio.wait_for(asyncio.shield(future), max(deadline - loop.time(), 0))
+
+    def _release(self, _future):
+        self.running -= 1
+        self.slots.release()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+pool: Optional[WorkerPool] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global pool
+    # Connects to the DB, so keep it off the event loop
+    await asyncio.get_running_loop().run_in_executor(None, initialize_services)
+    pool = WorkerPool(SERVER_MAX_WORKERS, SERVER_MAX_QUEUE)
+    warm_stop = warmer.start_background(CACHE_WARM_INTERVAL_S) if CACHE_WARM_INTERVAL_S > 0 else None
+    print(f"[Server] Ready: {SERVER_MAX_WORKERS} workers, queue {SERVER_MAX_QUEUE}.")
+    yield
+    if warm_stop:
+        warm_stop.set()
+    pool.shutdown()
+    close_db_pool()
+    print("[Server] Stopped.")
+
+
+app = FastAPI(title="Map Assistant", lifespan=lifespan)
+
+
+class QueryRequest(BaseModel):
+    query: str = Field(min_length=1)
+    timeout_s: Optional[float] = Field(default=None, gt=0)
+    # Send back the session_id of a previous response to refine that answer
+    session_id: Optional[str] = Field(default=None, max_length=64)
+
+
+class QueryResponse(BaseModel):
+    request_id: str
+    session_id: str
+    result: Optional[str]
+    elapsed_s: float
+    # Shortcuts taken to answer within the deadline, e.g. "skipped_poi_queries", "fast_model"
+    degradations: List[str] = []
+
+
+def handle_query(request_id: str, query: str, session_id: str, expires_at: float) -> tuple:
+    """(answer, degradations) for one request, given its deadline as a time.perf_counter() value."""
+    left = max(expires_at - time.perf_counter() - DEADLINE_MARGIN_S, 1.0)
+    with span("request", source="server", request_id=request_id), deadline(None) as budget:
+        result = main(query, session_id=session_id, deadline_s=left)
+    return result, budget.degradations
+
+
+@app.post("/query", response_model=QueryResponse)
+async def query(body: QueryRequest) -> QueryResponse:
+    request_id = uuid.uuid4().hex
+    session_id = body.session_id or uuid.uuid4().hex
+    timeout = min(body.timeout_s or SERVER_REQUEST_TIMEOUT_S, SERVER_REQUEST_TIMEOUT_S)
+    started = time.perf_counter()
+    try:
+        result, degraded = await pool.run(handle_query, request_id, body.query, session_id, started + timeout,
+                                          timeout=timeout)
+    except Overloaded:
+        raise HTTPException(status_code=503, detail="Server busy, retry later.",
+                            headers={"Retry-After": str(RETRY_AFTER_S)})
+    except (asyncio.TimeoutError, DeadlineExceeded):
+        raise HTTPException(status_code=504, detail=f"Request {request_id} exceeded its {timeout:g}s deadline.")
+    except Exception as e:
+        print(f"[Server] Request {request_id} failed: {e!r}")
+        raise HTTPException(status_code=500, detail=f"Request {request_id} failed: {e}")
+    return QueryResponse(request_id=request_id, session_id=session_id, result=result,
+                         elapsed_s=round(time.perf_counter() - started, 3), degradations=degraded)
+
+
+@app.get("/health")
+async def health() -> dict:
+    return {
+        "status": "ok" if pool else "starting",
+        "running": pool.running if pool else 0,
+        "queued": pool.queued if pool else 0,
+        "max_workers": SERVER_MAX_WORKERS,
+        "max_queue": SERVER_MAX_QUEUE,
+        "upstreams": rate_limit_stats(),
+        "llm_backends": llm_backend_stats(),
+    }
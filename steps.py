@@ -1,8 +1,20 @@
-from apis.llm_api import LLMClient
+from apis.llm_api import LLMClient, DEFAULT_PROFILE, Prompt, prompt_chars
 from apis.places_api import GooglePlacesClient
+from apis.routes_api import GoogleRoutesClient
+from apis.geocoder import Geocoder, normalize_address
+from context import POIRecord
+from core.cache import PersistentTTLCache
+from core.route_optimizer import optimize_order
+from core.tracing import span, traced, configure_from_env
+from core.singleflight import SingleFlight
+from core.deadline import degrade, running_low
 from db.baseDB import PostgresDB
-from typing import Dict, List, Any,Optional, Tuple
+from typing import Dict, List, Any,Optional, Tuple, Callable
 
+import json
+import queue
+import threading
+from contextlib import contextmanager
 from uuid import uuid4
 
 
@@ -14,7 +26,22 @@ load_dotenv()
 # Global variables to hold initialized clients
 _llm_client = None
 _places_api_client = None
+_routes_api_client = None
+_geocoder = None
+_places_cache = None
 _db_client = None
+_services_ready = False
+_init_lock = threading.RLock()     # re-entered by get_llm_client() from initialize_services()
+_demo_user_id = None
+_demo_lock = threading.Lock()
+_llm_flight = SingleFlight()
+
+# Pool of DB clients, each with its own connection and cursor, so concurrent requests never share a cursor
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+DB_POOL_TIMEOUT_S = 30
+_db_pool: "queue.LifoQueue[PostgresDB]" = queue.LifoQueue()
+_db_pool_created = 0
+_db_pool_lock = threading.Lock()
 
 
 # Port
@@ -36,137 +63,287 @@ def initialize_llm_client():
     _llm_client = LLMClient(api_key=os.getenv("LLM_API_KEY"))
     return _llm_client
 
+def get_llm_client() -> LLMClient:
+    """The shared LLMClient, created on first use. One per process, so all calls share its backend stats."""
+    if _llm_client is None:
+        with _init_lock:
+            if _llm_client is None:
+                initialize_llm_client()
+    return _llm_client
+
 def initialize_places_client():
     global _places_api_client
     _places_api_client = GooglePlacesClient(api_key=os.getenv("MAPS_API_KEY"))
     return _places_api_client
 
+def initialize_geocoder():
+    global _geocoder
+    if _places_api_client is None:
+        initialize_places_client()
+    _geocoder = Geocoder(_places_api_client)
+    return _geocoder
+
+# Text search results change slowly; a week keeps popular cities warm between warmer runs
+PLACES_SEARCH_TTL_SECONDS = 7 * 24 * 3600
+
+def initialize_places_cache():
+    global _places_cache
+    _places_cache = PersistentTTLCache("places_search", PLACES_SEARCH_TTL_SECONDS)
+    return _places_cache
+
+def get_places_cache() -> PersistentTTLCache:
+    return _places_cache or initialize_places_cache()
+
+def get_geocoder() -> Geocoder:
+    return _geocoder or initialize_geocoder()
+
+def initialize_routes_client():
+    global _routes_api_client
+    _routes_api_client = GoogleRoutesClient(api_key=os.getenv("MAPS_API_KEY"))
+    return _routes_api_client
+
+def connect_db_client() -> PostgresDB:
+    db = PostgresDB(host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD)
+    db.connect(schema=DB_SCHEMA)
+    print("[Steps] CONNECTED TO HOST.")
+    return db
+
 def initialize_db_client():
     global _db_client
-    _db_client = PostgresDB(host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD)
-    _db_client.connect(schema=DB_SCHEMA)
-    print("[Steps] CONNECTED TO HOST.")
+    _db_client = connect_db_client()
     return _db_client
 
+@contextmanager
+def db_session():
+    """
+    Check a DB client out of the pool for the duration of the block.
+    Opens up to DB_POOL_SIZE connections, then waits for one to be returned.
+    """
+    global _db_pool_created
+    try:
+        db = _db_pool.get_nowait()
+    except queue.Empty:
+        with _db_pool_lock:
+            create = _db_pool_created < DB_POOL_SIZE
+            if create:
+                _db_pool_created += 1
+        if create:
+            try:
+                db = connect_db_client()
+            except Exception:
+                with _db_pool_lock:
+                    _db_pool_created -= 1
+                raise
+        else:
+            db = _db_pool.get(timeout=DB_POOL_TIMEOUT_S)
+    try:
+        yield db
+    finally:
+        _db_pool.put(db)
+
+def close_db_pool():
+    global _db_pool_created
+    while True:
+        try:
+            _db_pool.get_nowait().close()
+        except queue.Empty:
+            break
+    with _db_pool_lock:
+        _db_pool_created = 0
+
 def initialize_services():
-    global _llm_client, _places_api_client, _db_client
+    """Create the shared clients once per process. Safe to call on every request and from several threads."""
+    global _services_ready
+    with _init_lock:
+        if _services_ready:
+            return
 
-    initialize_llm_client()
-    print("[Initializer] LLMClient initialized.")
+        # .env is loaded now, pick up TRACE_ENABLED / TRACE_EXPORT
+        configure_from_env()
 
-    initialize_places_client()
-    print("[Initializer] GooglePlacesClient initialized.")
+        get_llm_client()
+        print("[Initializer] LLMClient initialized.")
 
-    initialize_db_client()
-    print("[Initializer] PostgresDB client initialized.")
+        initialize_places_client()
+        print("[Initializer] GooglePlacesClient initialized.")
+
+        initialize_geocoder()
+        initialize_places_cache()
+        print("[Initializer] Geocoder and places cache initialized.")
+
+        # Open the first pooled connection now so a bad DB config fails at startup
+        with db_session():
+            pass
+        print("[Initializer] PostgresDB pool initialized.")
 
-    print("[Initializer] All services initialized successfully.\n")
+        seed_demo_user()
+        print(f"[Initializer] Demo user ready: {_demo_user_id}")
+
+        _services_ready = True
+        print("[Initializer] All services initialized successfully.\n")
 
 
 
 
 #LLM STEPS --------------------------------------------------------------------------------------------------
 
-def ask_llm(query: str) -> str:
-    global _llm_client
-    if _llm_client is None:
-        initialize_llm_client()
+def ask_llm(query: Prompt, profile: str = DEFAULT_PROFILE, **settings) -> str:
+    """
+    Send a prompt (text, or chat messages from prompter.get_messages) to the LLM.
+
+    Args:
+        profile: "router", "extractor" or "narrator", see apis.llm_api.LLM_PROFILES.
+        settings: Profile fields to override for this call (model, max_tokens, thinking, ...).
+    """
+    client = get_llm_client()
 
     print("[Steps : ask_llm] Sending query to LLM...")
-    response = _llm_client.query(query)
+    with span("llm.call", profile=profile, prompt_chars=prompt_chars(query)):
+        # Same prompt with the same settings already being answered for another request: wait for that answer
+        key = (_prompt_key(query), profile, tuple(sorted(settings.items())))
+        response = _llm_flight.do(key, client.query, query, profile, **settings)
     print("[Steps : ask_llm] LLM response received.")
     return response
 
+def _prompt_key(prompt: Prompt):
+    """Hashable form of a prompt, for SingleFlight keys."""
+    return prompt if isinstance(prompt, str) else tuple((m["role"], m["content"]) for m in prompt)
+
+def llm_backend_stats() -> Dict[str, Dict[str, Any]]:
+    """Rolling latency and health per LLM backend, empty before the client exists."""
+    return _llm_client.backend_stats() if _llm_client is not None else {}
+
+def ask_llm_json(query: Prompt, json_schema: Dict[str, Any], profile: str = "extractor",
+                 on_member: Optional[Callable[[Dict[str, Any]], None]] = None, **settings) -> Tuple[Any, str]:
+    """
+    Ask for JSON matching json_schema (see LLMClient.query_json).
+    on_member sees the object as it streams in, only in the caller that actually makes the call
+    (a caller coalesced onto an identical in-flight call just gets the result).
+
+    Returns:
+        (parsed object, raw reply text)
+
+    Raises:
+        ValueError: If the reply contains no complete JSON object.
+    """
+    client = get_llm_client()
+
+    print("[Steps : ask_llm_json] Sending query to LLM...")
+    with span("llm.call", profile=profile, prompt_chars=prompt_chars(query), schema=json_schema.get("title")):
+        key = (_prompt_key(query), profile, json.dumps(json_schema, sort_keys=True), tuple(sorted(settings.items())))
+        result = _llm_flight.do(key, client.query_json, query, json_schema, profile, on_member, **settings)
+    print("[Steps : ask_llm_json] LLM response received.")
+    return result
+
     user_preferences = db.get_prefs_by_user(user_id)
 
 
 
 #DB STEPS --------------------------------------------------------------------------------------------------
 
-def add_demo_data():
-    if _db_client is None:
-        initialize_db_client()
-    _db_client.clear_all()
-    new_user = _db_client.add_user(
-        first_name="Rohan",
-        last_name="Sharma",
-        email="rohan.sharma@studentemail.com",
-        password_hash="hashed_password_here"
-    )
-    user_id = new_user['user_id']
-
-    user_details = _db_client.add_user_details(
-        user_id=user_id,
-        dob="2001-08-20",
-        gender="Male",
-        aadhar_number="1111-2222-3333",
-        passport_number="P1234567",
-        driving_license_number="DL9876543210",
-        spoken_languages=["English", "Hindi"],
-        understood_languages=["English", "Hindi"],
-        native_language="Hindi",
-        hometown="Delhi",
-        current_city="Delhi",
-        address="45 Student Hostel, Delhi University",
-        phone_number="+911234567891",
-        home_lat=28.6139,
-        home_lng=77.2090,
-        dietary_preferences=["Vegetarian", "No Spicy"]
-    )
+# Stand-in for the logged-in user until login exists
+DEMO_USER_EMAIL = "rohan.sharma@studentemail.com"
 
-    travel_pref = _db_client.add_travel_preference(
-        user_id=user_id,
-        budget_min=500.00,
-        budget_max=3000.00,
-        transport_pref="Train",
-        commute_pref="Public Transport",
-        pace="Relaxed",
-        travel_duration_preference="2-5 days",
-        travel_group_preference="Solo/Group",
-        preferred_regions=["Rajasthan", "Uttar Pradesh", "Madhya Pradesh"],
-        season_preference="Winter",
-        accommodation_type="Hostel/Guesthouse",
-        special_needs=None,
-        frequent_travel=True
-    )
+def add_demo_data(clear: bool = True):
+    """
+    Insert the demo user with details, travel preferences and interests, and return its user_id.
+    With clear (the test scripts' reset) every table is emptied first; never call it that way while serving.
+    """
+    with db_session() as db:
+        if clear:
+            db.clear_all()
+        new_user = db.add_user(
+            first_name="Rohan",
+            last_name="Sharma",
+            email=DEMO_USER_EMAIL,
+            password_hash="hashed_password_here"
+        )
+        user_id = new_user['user_id']
 
-    interests = [
-        {
-            "tag": "Culture",
-            "sub_tag": "Heritage Sites",
-            "preferred_vacation_type": "City Break",
-            "activity_type": "Sightseeing",
-            "frequency_of_interest": "Often",
-            "special_notes": "Likes historical monuments"
-        },
-        {
-            "tag": "Food",
-            "sub_tag": "Street Food",
-            "preferred_vacation_type": "City Break",
-            "activity_type": "Culinary Tour",
-            "frequency_of_interest": "Sometimes",
-            "special_notes": "Prefers vegetarian options"
-        }
-    ]
-
-    for interest in interests:
-        _db_client.add_user_interest(
+        user_details = db.add_user_details(
             user_id=user_id,
-            tag=interest["tag"],
-            sub_tag=interest["sub_tag"],
-            preferred_vacation_type=interest["preferred_vacation_type"],
-            activity_type=interest["activity_type"],
-            frequency_of_interest=interest["frequency_of_interest"],
-            special_notes=interest["special_notes"]
+            dob="2001-08-20",
+            gender="Male",
+            aadhar_number="1111-2222-3333",
+            passport_number="P1234567",
+            driving_license_number="DL9876543210",
+            spoken_languages=["English", "Hindi"],
+            understood_languages=["English", "Hindi"],
+            native_language="Hindi",
+            hometown="Delhi",
+            current_city="Delhi",
+            address="45 Student Hostel, Delhi University",
+            phone_number="+911234567891",
+            home_lat=28.6139,
+            home_lng=77.2090,
+            dietary_preferences=["Vegetarian", "No Spicy"]
         )
 
-    print(f"Demo data added for user_id: {user_id}")
-    return user_id
+        travel_pref = db.add_travel_preference(
+            user_id=user_id,
+            budget_min=500.00,
+            budget_max=3000.00,
+            transport_pref="Train",
+            commute_pref="Public Transport",
+            pace="Relaxed",
+            travel_duration_preference="2-5 days",
+            travel_group_preference="Solo/Group",
+            preferred_regions=["Rajasthan", "Uttar Pradesh", "Madhya Pradesh"],
+            season_preference="Winter",
+            accommodation_type="Hostel/Guesthouse",
+            special_needs=None,
+            frequent_travel=True
+        )
+
+        interests = [
+            {
+                "tag": "Culture",
+                "sub_tag": "Heritage Sites",
+                "preferred_vacation_type": "City Break",
+                "activity_type": "Sightseeing",
+                "frequency_of_interest": "Often",
+                "special_notes": "Likes historical monuments"
+            },
+            {
+                "tag": "Food",
+                "sub_tag": "Street Food",
+                "preferred_vacation_type": "City Break",
+                "activity_type": "Culinary Tour",
+                "frequency_of_interest": "Sometimes",
+                "special_notes": "Prefers vegetarian options"
+            }
+        ]
+
+        for interest in interests:
+            db.add_user_interest(
+                user_id=user_id,
+                tag=interest["tag"],
+                sub_tag=interest["sub_tag"],
+                preferred_vacation_type=interest["preferred_vacation_type"],
+                activity_type=interest["activity_type"],
+                frequency_of_interest=interest["frequency_of_interest"],
+                special_notes=interest["special_notes"]
+            )
+
+        print(f"Demo data added for user_id: {user_id}")
+        return user_id
+
+def seed_demo_user() -> str:
+    """
+    user_id of the demo user, inserted (without clearing anything) only if the DB does not have it yet.
+    Run once at startup; requests then read the profile by this fixed id.
+    """
+    global _demo_user_id
+    with _demo_lock:
+        if _demo_user_id is None:
+            with db_session() as db:
+                existing = db.get_user_by_email(DEMO_USER_EMAIL)
+            _demo_user_id = existing["user_id"] if existing else add_demo_data(clear=False)
+        return _demo_user_id
 
 def extract_data_from_user_profile(user_id : str):
-    if _db_client is None:
-        initialize_db_client()
-    user_profile = _db_client.get_full_profile(user_id)
+    with db_session() as db:
+        user_profile = db.get_full_profile(user_id)
     return user_profile
 
 def populate_context_from_user_profile(context, user_profile: dict):
@@ -248,8 +425,31 @@ def populate_context_from_user_profile(context, user_profile: dict):
 
     return context
 
+# Context fields populate_context_from_user_profile may fill
+PROFILE_FIELDS = [
+    "city", "travel_duration", "pace", "interests", "dietary_preferences", "special_needs",
+    "transport_pref", "commute_pref", "budget_max", "accommodation_type", "activity_type",
+    "preferred_vacation_type",
+]
+
+def fetch_user_profile(user_id: Optional[str] = None) -> Dict[str, Any]:
+    """Flow step: full DB profile of the user (demo user until login exists)."""
+    user_id = user_id or seed_demo_user()
+    with span("db.profile_load"):
+        return extract_data_from_user_profile(user_id)
+
+def apply_user_profile(context, user_profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Flow step: PROFILE_FIELDS filled from the profile, computed on a copy so concurrent steps never see half-updated context."""
+    updated = populate_context_from_user_profile(context.model_copy(), user_profile)
+    return {name: getattr(updated, name) for name in PROFILE_FIELDS}
+
 #API STEPS --------------------------------------------------------------------------------------------------
 
+def get_poi_per_day(pace: Optional[str]) -> int:
+    """Number of POIs that fit in one day at the given pace."""
+    return 4 if pace == "fast" else 3 if pace == "moderate" else 2
+
+
 def generate_poi_query(itinerary_data: Any) -> Dict[str, List[str]]:
     
     if _places_api_client is None:
@@ -262,14 +462,20 @@ def generate_poi_query(itinerary_data: Any) -> Dict[str, List[str]]:
     must_see = itinerary_data.get("must_see")
     activity_type = itinerary_data.get("activity_type")
 
-    poi_per_day = 4 if pace == "fast" else 3 if pace == "moderate" else 2
+    poi_per_day = get_poi_per_day(pace)
     target_pois = travel_duration * poi_per_day
     
     if not city:
         raise ValueError("City is required to generate POI queries.")
 
+    # Most important first: when a request runs short on time, the tail is skipped
     poi_queries: List[str] = []
     poi_queries.append(f"Top tourist attractions and Famous landmarks in {city}")
+    if must_see:
+        for place in must_see:
+            base = f"Details about {place} in {city}, and nearby POIs".strip()
+            poi_queries.append(base)
+
     if interests:
         for interest in interests:
             base = f"Best places for tourists to enjoy {interest} of the {city}".strip()
@@ -280,11 +486,6 @@ def generate_poi_query(itinerary_data: Any) -> Dict[str, List[str]]:
             base = f"Popular {act} places in {city}".strip()
             poi_queries.append(base)
 
-    if must_see:
-        for place in must_see:
-            base = f"Details about {place} in {city}, and nearby POIs".strip()
-            poi_queries.append(base)
-
 
     # def expand_with_llm(q: str) -> List[str]:
     #     llm_prompt = (
@@ -320,35 +521,79 @@ def generate_poi_query(itinerary_data: Any) -> Dict[str, List[str]]:
     return poi_queries
 
 
-def extract_data_from_api_response(place):
-    extracted_data = {
-        "name": place.get("displayName", {}).get("text", "Unknown Place"),
-        "address": place.get("shortFormattedAddress", "Address not available"),
-        "place_id": place.get("id", ""),
-        "types": place.get("types", []),
-        "location": place.get("location", {"latitude": None, "longitude": None}),
-        "review": place.get("reviewSummary", {}).get("text", "No reviews available"),
-        "rating": place.get("rating", 0.0),
-        #Add maps url later, for UI
-    }
-    # print("Extracted Data:", extracted_data)
-    return extracted_data
+def generate_poi_queries(city: str, travel_duration: int, pace: Optional[str], interests: Optional[List[str]],
+                         must_see: Optional[List[str]], activity_type: Optional[str]) -> List[str]:
+    """Flow step wrapper around generate_poi_query."""
+    return generate_poi_query({
+        "city": city,
+        "travel_duration": travel_duration,
+        "pace": pace,
+        "interests": interests,
+        "must_see": must_see,
+        "activity_type": activity_type,
+    })
+
+
+def extract_data_from_api_response(place) -> POIRecord:
+    #Add maps url later, for UI
+    return POIRecord.from_place(place)
+
 
+# Less than this many seconds left for the request: Places searches after the first are
+# served from the cache (expired entries too) and skipped when not cached
+POI_SEARCH_RESERVE_S = 30
 
-def get_places_for_queries(queries: List[str]) -> List[Dict[str, Any]]:
+
+def search_places(query: str, refresh: bool = False, cached_only: bool = False) -> Optional[List[POIRecord]]:
+    """
+    Extracted POIs for one text search, served from the places_search cache when fresh.
+    The cache stores them as dicts (POIRecord.to_dict), callers get immutable POIRecords.
+
+    Args:
+        refresh: Skip the cache lookup and fetch again (used by the cache warmer).
+        cached_only: Never call the API: fall back to an expired entry, or return None.
+    """
+    if _places_api_client is None:
+        initialize_places_client()
+    if _places_cache is None:
+        initialize_places_cache()
+
+    key = normalize_address(query)
+    with span("places.text_search", query=query) as query_span:
+        places = None if refresh else _places_cache.get(key)
+        query_span.set_attribute("cache_hit", places is not None)
+        if places is None and cached_only:
+            places = _places_cache.get_stale(key)
+            if places is None:
+                return None
+            query_span.set_attribute("stale", True)
+            degrade("stale_places", query)
+        if places is None:
+            records = [extract_data_from_api_response(p) for p in _places_api_client.text_search(query)]
+            _places_cache.set(key, [r.to_dict() for r in records])
+        else:
+            records = [POIRecord.from_dict(p) for p in places]
+        query_span.set_attribute("results", len(records))
+    return records
+
+
+def get_places_for_queries(queries: List[str]) -> List[POIRecord]:
     
     if _places_api_client is None:
         initialize_places_client()
 
     all_places = []
     seen_names = set()
+    skipped = 0
 
     for count, q in enumerate(queries, start=1):
         print(f"[Steps : get_places_for_queries] Searching places for query {count}: '{q}'")
-        places = _places_api_client.text_search(q)
-        
-        for p in places:
-            extracted = extract_data_from_api_response(p)
+        places = search_places(q, cached_only=count > 1 and running_low(POI_SEARCH_RESERVE_S))
+        if places is None:
+            skipped += 1
+            continue
+
+        for extracted in places:
             name = extracted.get("name", "").strip()
             if not name:
                 continue 
@@ -359,48 +604,119 @@ def get_places_for_queries(queries: List[str]) -> List[Dict[str, Any]]:
 
         # print(f"[Steps : get_places_for_queries] Found {len(places)} places for query: '{q}'")
 
+    if skipped:
+        degrade("skipped_poi_queries", f"{skipped} of {len(queries)} Places searches")
     print(f"[Steps : get_places_for_queries] Total unique places collected: {len(all_places)}")
     return all_places
 
 
-def get_location_for_place(place_name: str) -> Optional[Tuple[float, float]]:
-    
-    if _places_api_client is None:
-        initialize_places_client()
+def get_location_for_place(place_name: str, refresh: bool = False) -> Optional[Tuple[float, float]]:
+    """(lat, lon) of a place name or address, or None if nothing matches. Cached, see apis.geocoder."""
+    if _geocoder is None:
+        initialize_geocoder()
 
     if not place_name.strip():
         raise ValueError("place_name cannot be empty")
 
-    results = _places_api_client.text_search(place_name)
-     # no json.loads needed
-    place_data = results[0]
-    # print("Place data:", place_data)
-    location_data = place_data.get("location")
-    lat = location_data.get("latitude")
-    lon = location_data.get("longitude")
-    print("Location data:", location_data.get("latitude"))
+    location = _geocoder.geocode(place_name, refresh=refresh)
+    print(f"[Steps : get_location_for_place] '{place_name}' -> {location}")
+    return location
+
 
-    # if isinstance(location_data, list):
-    #     print(location_data[:5])
-    # elif isinstance(location_data, str):
-    #     print("\n".join(location_data.splitlines()[:5]))
-    # else:
-    #     print(location_data)
+def locate_start(start_loc: Optional[str], city: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Flow step: coordinates of start_loc, or None when it is missing or cannot be located."""
+    if not start_loc:
+        return None
+    try:
+        return get_location_for_place(f"{start_loc}, {city}" if city else start_loc)
+    except Exception as e:
+        print(f"[Steps : locate_start] Could not locate start '{start_loc}': {e}")
+        return None
+
+
+def geocode_participant_addresses(participants: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Fill lat/lon for participants that only have a textual address, geocoding them as one batch.
+    """
+    if _geocoder is None:
+        initialize_geocoder()
 
+    pending = [p for p in participants if p.get("address") and (p.get("lat") is None or p.get("lon") is None)]
+    locations = _geocoder.geocode_many(p["address"] for p in pending)
+    for participant, location in zip(pending, locations):
+        if location:
+            participant["lat"], participant["lon"] = location
+        else:
+            print(f"[Steps : geocode_participant_addresses] No match for '{participant['address']}'")
+    return participants
 
-    # with open("places.txt", "w") as f:
-    #     f.write(str(results))
 
-    # print("Results from text_search:", results)
-    if not results:
+def calculate_optimal_midpoint(participants: List[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+    """
+    Flow step: the centre ({"lat", "lon"}) of the participants with coordinates, None if none has any.
+    A plain average, fine at city scale.
+    """
+    located = [(p["lat"], p["lon"]) for p in participants if p.get("lat") is not None and p.get("lon") is not None]
+    if not located:
         return None
+    return {"lat": sum(lat for lat, _ in located) / len(located), "lon": sum(lon for _, lon in located) / len(located)}
+
+
+# Route geometry is simplified to this many metres, plenty for drawing on a map.
+ROUTE_SIMPLIFY_TOLERANCE_M = 10.0
+
+
+def _route_waypoint(stop: Dict[str, Any]) -> Dict[str, Any]:
+    return {"location": {"latLng": {"latitude": stop["lat"], "longitude": stop["lon"]}}}
 
-    # first = results[0]
-    # loc = first.get("geometry", {}).get("location")
-    # if not loc:
-    #     return None
 
-    # lat, lon = loc.get("lat"), loc.get("lng")
-    print("Extracted lat/lon:", lat, lon)
-    return (lat, lon)
+def optimize_route(origin: Dict[str, Any], destinations: List[Dict[str, Any]], constraints: Optional[Dict] = None) -> Dict[str, Any]:
+    """
+    Order destinations locally, then fetch the actual route for that order with one Routes API call.
+
+    Args:
+        origin: {"lat", "lon", "label"?}, the fixed start.
+        destinations: [{"lat", "lon", "label"?, "time_window"?}, ...]
+        constraints: Optional {"travel_mode", "return_to_origin", "start_time", "service_minutes"}
 
+    Returns:
+        Dict with the optimized "destinations" order, "estimated_minutes", "schedule" and the
+        "route" as a ParsedRoute (None if the API found no route).
+    """
+    if _routes_api_client is None:
+        initialize_routes_client()
+
+    if not destinations:
+        raise ValueError("At least one destination is required to optimize a route.")
+
+    constraints = constraints or {}
+    result = optimize_order(origin, destinations, constraints)
+    print(f"[Steps : optimize_route] Ordered {len(destinations)} destinations, estimated {result['estimated_minutes']:.0f} min.")
+
+    ordered = result["destinations"]
+    if constraints.get("return_to_origin"):
+        final_stop, intermediates = origin, ordered
+    else:
+        final_stop, intermediates = ordered[-1], ordered[:-1]
+
+    result["route"] = _routes_api_client.get_parsed_route(
+        _route_waypoint(origin),
+        _route_waypoint(final_stop),
+        travel_mode=(constraints.get("travel_mode") or "DRIVE").upper(),
+        intermediates=[_route_waypoint(stop) for stop in intermediates] or None,
+        tolerance_m=ROUTE_SIMPLIFY_TOLERANCE_M,
+    )
+    return result
+
+
+# Step functions the Orchestrator can run, by the names used in flow.FLOW
+STEP_REGISTRY = {
+    "fetch_user_profile": fetch_user_profile,
+    "apply_user_profile": apply_user_profile,
+    "generate_poi_queries": generate_poi_queries,
+    "get_places_for_queries": get_places_for_queries,
+    "locate_start": locate_start,
+    "geocode_participant_addresses": geocode_participant_addresses,
+    "calculate_optimal_midpoint": calculate_optimal_midpoint,
+    "optimize_route": optimize_route,
+}
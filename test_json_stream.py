@@ -0,0 +1,116 @@
+"""Unit tests for core.json_stream. Run with: python -m pytest -q test_json_stream.py"""
+import json
+
+import pytest
+
+from core.json_stream import IncrementalJSONParser, extract_json
+
+OBJECT = {"city": "Jaipur", "days": 3, "must_see": ["Amer Fort", "Hawa Mahal"], "notes": {"pace": "relaxed"}}
+
+
+def feed_chunks(parser: IncrementalJSONParser, text: str, size: int) -> bool:
+    done = False
+    for i in range(0, len(text), size):
+        done = parser.feed(text[i:i + size])
+        if done:
+            break
+    return done
+
+
+def test_plain_object():
+    assert extract_json(json.dumps(OBJECT)) == OBJECT
+
+
+def test_fenced_object():
+    text = "Here is the plan:\n```json\n" + json.dumps(OBJECT, indent=2) + "\n```\nLet me know if you need more."
+    assert extract_json(text) == OBJECT
+
+
+def test_prose_wrapped_object_stops_at_closing_brace():
+    parser = IncrementalJSONParser()
+    assert parser.feed("Sure! " + json.dumps(OBJECT) + " Hope this helps, and")
+    assert parser.value == OBJECT
+    # Anything after the object is ignored
+    assert parser.feed(' {"other": 1}')
+    assert parser.value == OBJECT
+
+
+def test_prose_braces_are_skipped():
+    text = 'Fill in {city} and {days}, then: {"city": "Jaipur", "days": 3}'
+    assert extract_json(text) == {"city": "Jaipur", "days": 3}
+
+
+def test_prose_brace_split_across_chunks():
+    parser = IncrementalJSONParser()
+    assert feed_chunks(parser, 'Use the {city} template: {"city": "Jaipur"}', 3)
+    assert parser.value == {"city": "Jaipur"}
+
+
+def test_escaped_quotes_and_braces_in_strings():
+    value = {"review": 'He said "go at {dawn}" \\ then left', "tip": "}]"}
+    assert extract_json("Answer: " + json.dumps(value)) == value
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 7])
+def test_chunk_boundaries_inside_strings(size):
+    value = {"review": 'A "must" see, {honestly}', "path": "C:\\temp\\", "list": ["a,b", "c}d"]}
+    parser = IncrementalJSONParser()
+    assert feed_chunks(parser, "```json\n" + json.dumps(value) + "\n```", size)
+    assert parser.value == value
+
+
+def test_not_done_before_closing_brace():
+    parser = IncrementalJSONParser()
+    assert not parser.feed('{"city": "Jaipur", "days": 3')
+    assert not parser.done and parser.value is None
+
+
+def test_no_object_raises():
+    with pytest.raises(ValueError):
+        extract_json("I cannot help with that.")
+
+
+def test_partial_before_start():
+    parser = IncrementalJSONParser()
+    parser.feed("Thinking about it")
+    assert parser.partial() is None
+
+
+def test_partial_keeps_only_complete_members():
+    parser = IncrementalJSONParser()
+    parser.feed('{"city": "Jaipur", "days": 3, "must_see": ["Amer Fort", "Hawa')
+    assert parser.partial() == {"city": "Jaipur", "days": 3, "must_see": ["Amer Fort"]}
+    parser.feed(' Mahal"], "notes": {"pace": "rel')
+    assert parser.partial() == {"city": "Jaipur", "days": 3, "must_see": ["Amer Fort", "Hawa Mahal"], "notes": {}}
+
+
+def test_partial_ignores_incomplete_string_value():
+    parser = IncrementalJSONParser()
+    parser.feed('{"city": "Jai')
+    assert parser.partial() == {}
+
+
+def test_partial_after_done_is_value():
+    parser = IncrementalJSONParser()
+    parser.feed(json.dumps(OBJECT))
+    assert parser.partial() == OBJECT
+
+
+def test_on_member_fires_per_top_level_member_and_at_end():
+    seen = []
+    parser = IncrementalJSONParser(on_member=lambda value: seen.append(dict(value)))
+    assert feed_chunks(parser, "Plan: " + json.dumps(OBJECT), 4)
+    keys = list(OBJECT)
+    # One call per comma between top-level members, then the whole object
+    assert [list(v) for v in seen] == [keys[:1], keys[:2], keys[:3], keys]
+    assert seen[-1] == OBJECT
+
+
+def test_on_member_ignores_nested_commas():
+    seen = []
+    parser = IncrementalJSONParser(on_member=seen.append)
+    parser.feed('{"must_see": ["Amer Fort", "City Palace", "Hawa Mahal"]')
+    assert seen == []
+    parser.feed(', "days": 2}')
+    must_see = ["Amer Fort", "City Palace", "Hawa Mahal"]
+    assert seen == [{"must_see": must_see}, {"must_see": must_see, "days": 2}]
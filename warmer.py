@@ -0,0 +1,171 @@
+"""
+Cache warmer for popular cities.
+
+For every target city it runs the same Places text searches an ItineraryPlanner request
+would (generate_poi_query with each interest tag and must-see landmark) and geocodes the
+landmarks, so peak-hour requests for those cities are served from the places_search and
+geocode caches.
+
+- Entries fresher than half their TTL are left alone, so repeat runs only top up.
+- Each run spends at most `budget` upstream calls; what does not fit is reported as skipped.
+- Calls go through the shared rate limiters at BACKGROUND priority, so interactive
+  requests in the same process go first.
+
+    python warmer.py                                   # one run over WARM_TARGETS
+    python warmer.py --targets targets.json --budget 300
+    python warmer.py --every 21600                     # every 6 hours until interrupted
+
+The server starts it in the background when CACHE_WARM_INTERVAL_S is set.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from apis.geocoder import normalize_address
+from core.rate_limit import BACKGROUND, priority
+from steps import (
+    generate_poi_query,
+    get_geocoder,
+    get_location_for_place,
+    get_places_cache,
+    search_places,
+)
+
+# Most requested first: when the budget runs out, the tail is what gets skipped
+WARM_TARGETS: List[Dict[str, Any]] = [
+    {"city": "Jaipur", "must_see": ["Amer Fort", "City Palace", "Hawa Mahal", "Jantar Mantar", "Nahargarh Fort"]},
+    {"city": "Delhi", "must_see": ["Red Fort", "Qutub Minar", "India Gate", "Humayun's Tomb", "Lotus Temple"]},
+    {"city": "Agra", "must_see": ["Taj Mahal", "Agra Fort", "Fatehpur Sikri", "Mehtab Bagh"]},
+    {"city": "Mumbai", "must_see": ["Gateway of India", "Marine Drive", "Elephanta Caves", "Chhatrapati Shivaji Terminus"]},
+    {"city": "Udaipur", "must_see": ["City Palace", "Lake Pichola", "Jag Mandir", "Sajjangarh Palace"]},
+    {"city": "Goa", "must_see": ["Basilica of Bom Jesus", "Fort Aguada", "Calangute Beach"]},
+]
+
+DEFAULT_INTERESTS = ["history", "local cuisine", "shopping", "nature", "nightlife", "art", "architecture"]
+
+WARM_API_BUDGET = int(os.getenv("CACHE_WARM_BUDGET", "200"))
+REFRESH_AFTER_FRACTION = 0.5
+
+
+def warm_items(target: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(kind, text) pairs to warm for one city: "search" queries, then "geocode" landmarks."""
+    city = target["city"]
+    queries = generate_poi_query({
+        "city": city,
+        "travel_duration": 1,
+        "pace": None,
+        "interests": target.get("interests") or DEFAULT_INTERESTS,
+        "must_see": target.get("must_see") or [],
+        "activity_type": None,
+    })
+    items = [("search", q) for q in queries]
+    # Same "<place>, <city>" form locate_start uses
+    items += [("geocode", f"{place}, {city}") for place in target.get("must_see") or []]
+    return items
+
+
+def is_fresh(kind: str, text: str) -> bool:
+    cache = get_places_cache() if kind == "search" else get_geocoder().cache
+    age = cache.age(normalize_address(text))
+    return age is not None and age < cache.ttl_seconds * REFRESH_AFTER_FRACTION
+
+
+def warm_once(targets: Optional[List[Dict[str, Any]]] = None, budget: int = WARM_API_BUDGET) -> Dict[str, Any]:
+    """
+    One warmup pass.
+
+    Returns:
+        {"cities": [{"city", "items", "fresh", "fetched", "skipped", "failed", "coverage"}],
+         "api_calls", "budget", "elapsed_s"}
+    """
+    targets = targets or WARM_TARGETS
+    started = time.perf_counter()
+    calls = 0
+    cities = []
+
+    with priority(BACKGROUND):
+        for target in targets:
+            row = {"city": target["city"], "items": 0, "fresh": 0, "fetched": 0, "skipped": 0, "failed": 0}
+            for kind, text in warm_items(target):
+                row["items"] += 1
+                if is_fresh(kind, text):
+                    row["fresh"] += 1
+                    continue
+                if calls >= budget:
+                    row["skipped"] += 1
+                    continue
+                calls += 1
+                try:
+                    if kind == "search":
+                        search_places(text, refresh=True)
+                    else:
+                        get_location_for_place(text, refresh=True)
+                    row["fetched"] += 1
+                except Exception as e:
+                    row["failed"] += 1
+                    print(f"[Warmer] {kind} '{text}' failed: {e}")
+            row["coverage"] = (row["fresh"] + row["fetched"]) / row["items"] if row["items"] else 1.0
+            cities.append(row)
+
+    return {"cities": cities, "api_calls": calls, "budget": budget,
+            "elapsed_s": round(time.perf_counter() - started, 2)}
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{'city':<14}{'items':>7}{'fresh':>7}{'fetched':>9}{'skipped':>9}{'failed':>8}{'coverage':>10}")
+    for row in report["cities"]:
+        print(f"{row['city']:<14}{row['items']:>7}{row['fresh']:>7}{row['fetched']:>9}{row['skipped']:>9}"
+              f"{row['failed']:>8}{row['coverage']:>10.0%}")
+    print(f"\n[Warmer] {report['api_calls']}/{report['budget']} API calls in {report['elapsed_s']}s")
+
+
+def run_forever(interval_s: float, targets: Optional[List[Dict[str, Any]]] = None,
+                budget: int = WARM_API_BUDGET, stop: Optional[threading.Event] = None):
+    """Warm now, then every interval_s seconds until `stop` is set."""
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            report = warm_once(targets, budget)
+            covered = sum(r["fresh"] + r["fetched"] for r in report["cities"])
+            total = sum(r["items"] for r in report["cities"]) or 1
+            print(f"[Warmer] Coverage {covered / total:.0%}, {report['api_calls']} API calls.")
+        except Exception as e:
+            print(f"[Warmer] Run failed: {e}")
+        stop.wait(interval_s)
+
+
+def start_background(interval_s: float, targets: Optional[List[Dict[str, Any]]] = None,
+                     budget: int = WARM_API_BUDGET) -> threading.Event:
+    """Run run_forever on a daemon thread. Set the returned event to stop it."""
+    stop = threading.Event()
+    threading.Thread(target=run_forever, args=(interval_s, targets, budget, stop),
+                     name="cache-warmer", daemon=True).start()
+    return stop
+
+
+def load_targets(path: Optional[str]) -> List[Dict[str, Any]]:
+    """Targets from a JSON list like WARM_TARGETS, or the built-in list."""
+    if not path:
+        return WARM_TARGETS
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-fill the Places search and geocode caches for popular cities.")
+    parser.add_argument("--targets", default=os.getenv("WARM_TARGETS_FILE"), help="JSON list of {city, interests?, must_see?}.")
+    parser.add_argument("--budget", type=int, default=WARM_API_BUDGET, help="Max upstream API calls per run.")
+    parser.add_argument("--every", type=float, help="Repeat every N seconds instead of running once.")
+    args = parser.parse_args()
+
+    targets = load_targets(args.targets)
+    if args.every:
+        try:
+            run_forever(args.every, targets, args.budget)
+        except KeyboardInterrupt:
+            pass
+    else:
+        print_report(warm_once(targets, args.budget))